@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Checks that the NumPy and torch DEO backends produce the same embeddings.
+
+Random unit vectors stand in for the Vertex AI embeddings, so the check runs
+offline. Every trial runs once without early stopping and once with each
+--tol value, comparing the embeddings, losses, step counts and convergence
+flags. It needs torch, which the agent itself no longer requires:
+
+  pip install torch
+  python benchmark/check_backend_parity.py --trials 50
+"""
+import os
+import sys
+import zlib
+import argparse
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deo_rag_with_bigquery.deo_optimizer import DEOOptimizer
+
+
+class RandomEmbeddings:
+  """Embeds each text as a random vector seeded by the text."""
+
+  def __init__(self, dim: int):
+    self.dim = dim
+
+  def embed(self, texts: list[str], embeddings_task_type: str = "RETRIEVAL_QUERY") -> list[list[float]]:
+    return [
+      np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.dim).tolist()
+      for text in texts
+    ]
+
+
+def main():
+  parser = argparse.ArgumentParser(description="DEO NumPy/torch backend parity check")
+  parser.add_argument("--trials", type=int, default=50, help="Random (query, positives, negatives) triples")
+  parser.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+  parser.add_argument("--num_steps", type=int, default=20, help="Optimization steps")
+  parser.add_argument("--lr", type=float, default=0.01, help="Learning rate")
+  parser.add_argument(
+    "--tol", type=float, nargs="*", default=[1e-3, 1e-2],
+    help="Early-stopping tolerances checked in addition to tol=0",
+  )
+  parser.add_argument("--atol", type=float, default=1e-5, help="Largest allowed element difference")
+  args = parser.parse_args()
+
+  embeddings = RandomEmbeddings(args.dim)
+  backends = {name: DEOOptimizer(embeddings, backend=name) for name in ("numpy", "torch")}
+  rng = np.random.default_rng(0)
+  timings = {name: 0.0 for name in backends}
+  tolerances = [0.0] + args.tol
+  worst = 0.0
+  mismatches = 0
+  for trial in range(args.trials):
+    # Includes triples without positives or without negatives
+    positives = [f"positive {trial}.{i}" for i in range(rng.integers(0, 4))]
+    negatives = [f"negative {trial}.{i}" for i in range(rng.integers(0, 4))]
+    for tol in tolerances:
+      results = {}
+      for name, optimizer in backends.items():
+        start = time.perf_counter()
+        results[name] = optimizer.optimize(
+          f"query {trial}", positives, negatives, num_steps=args.num_steps, lr=args.lr, tol=tol,
+        )
+        timings[name] += time.perf_counter() - start
+      numpy_result, torch_result = results["numpy"], results["torch"]
+      worst = max(
+        worst,
+        float(np.abs(np.asarray(numpy_result.embedding) - np.asarray(torch_result.embedding)).max()),
+        abs(numpy_result.loss - torch_result.loss),
+      )
+      if (numpy_result.steps, numpy_result.converged) != (torch_result.steps, torch_result.converged):
+        mismatches += 1
+        print(
+          f"  query {trial}, tol={tol}: numpy stopped after {numpy_result.steps} steps "
+          f"(converged={numpy_result.converged}), torch after {torch_result.steps} "
+          f"(converged={torch_result.converged})"
+        )
+
+  runs = args.trials * len(tolerances)
+  for name, total in timings.items():
+    print(f"{name:>6}: {total * 1000.0 / runs:.2f} ms per query")
+  if worst > args.atol or mismatches:
+    print(f"✗ Backends differ by up to {worst:.2e} (atol {args.atol:.0e}); {mismatches} early-stop mismatches")
+    sys.exit(1)
+  print(f"✓ Backends agree on {runs} runs, tol in {tolerances} (max difference {worst:.2e})")
+
+
+if __name__ == "__main__":
+  main()
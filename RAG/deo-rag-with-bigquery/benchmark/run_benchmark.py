@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Negation-retrieval benchmark of the baseline search vs DEO search.
+
+Runs every query of a JSONL query set through the same retrieval code as
+`search_documents_in_bigquery` and `deo_search_documents_in_bigquery` and
+reports, per method:
+  - nDCG@k and recall@k against the query's relevance judgments (qrels),
+  - the negative-hit rate: the share of retrieved documents that contain an
+    excluded term of the query or are judged as negative hits,
+  - the latency of embedding, optimization and search.
+
+Each line of the query set is a JSON object like
+  {"_id": "q1", "query": "...", "positives": [...], "negatives": [...],
+   "excluded_terms": ["Moses"], "qrels": {"10000": 1}, "negative_ids": ["10001"]}
+where "excluded_terms", "qrels" and "negative_ids" are optional. Qrels can
+also be given as a BEIR TSV file (query-id, corpus-id, score) with --qrels.
+
+With --index=memory (the default) the corpus is embedded into a local
+in-memory index, so the benchmark runs offline and in CI with the built-in
+hashing embeddings:
+
+  python benchmark/run_benchmark.py --queries benchmark/queries.sample.jsonl
+
+Use --embeddings=vertex to embed with EMBEDDING_MODEL_NAME instead, and
+--index=bigquery to search the ingested BigQuery table.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import statistics
+import sys
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "data_ingestion"))
+
+_WORD_RE = re.compile(r"\w+")
+
+STAGES = ("embed", "optimize", "search")
+
+
+class HashingEmbeddings:
+  """Offline stand-in for VertexAIEmbeddings: signed hashing of words and word bigrams."""
+
+  model_name = "hashing"
+
+  def __init__(self, dim: int = 1024):
+    self.dim = dim
+
+  def _vector(self, text: str) -> list[float]:
+    words = _WORD_RE.findall(text.lower())
+    vector = np.zeros(self.dim, dtype=np.float32)
+    for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+      h = zlib.crc32(feature.encode("utf-8"))
+      vector[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+    return (vector / max(float(np.linalg.norm(vector)), 1e-12)).tolist()
+
+  def embed(self, texts: list[str], batch_size: int = 0, embeddings_task_type: str = "RETRIEVAL_DOCUMENT") -> list[list[float]]:
+    return [self._vector(text) for text in texts]
+
+  def embed_documents(self, texts: list[str]) -> list[list[float]]:
+    return self.embed(texts)
+
+  def embed_query(self, text: str) -> list[float]:
+    return self._vector(text)
+
+
+class InMemoryVectorStore:
+  """Brute-force cosine index with the search methods of BigQueryVectorStore the tools use."""
+
+  def __init__(self, docs, embedding, batch_size: int = 250):
+    self.docs = docs
+    self.embedding = embedding
+    vectors = []
+    for i in range(0, len(docs), batch_size):
+      vectors.extend(embedding.embed_documents([doc.page_content for doc in docs[i:i + batch_size]]))
+    vectors = np.asarray(vectors, dtype=np.float32)
+    self.vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+  def similarity_search_by_vectors(self, embeddings, k: int = 5, with_scores: bool = False, with_embeddings: bool = False, **kwargs):
+    queries = np.asarray(embeddings, dtype=np.float32)
+    scores = queries @ self.vectors.T  # (Q, N)
+    results = []
+    for row in scores:
+      top = np.argsort(-row, kind="stable")[:k]
+      if with_scores and with_embeddings:
+        results.append([(self.docs[i], float(row[i]), self.vectors[i].tolist()) for i in top])
+      elif with_scores:
+        results.append([(self.docs[i], float(row[i])) for i in top])
+      else:
+        results.append([self.docs[i] for i in top])
+    return results
+
+  def similarity_search_by_vector(self, embedding, k: int = 5, **kwargs):
+    return self.similarity_search_by_vectors([embedding], k=k)[0]
+
+  def similarity_search(self, query: str, k: int = 5, **kwargs):
+    return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k)
+
+
+def load_queries(path: str, qrels_path: str = None) -> list[dict]:
+  """Reads the query set, merging qrels from a BEIR TSV file if given."""
+  with open(path, "r", encoding="utf-8") as f:
+    queries = [json.loads(line) for line in f if line.strip()]
+  if qrels_path:
+    qrels = defaultdict(dict)
+    with open(qrels_path, "r", encoding="utf-8") as f:
+      for row in csv.DictReader(f, delimiter="\t"):
+        qrels[row["query-id"]][row["corpus-id"]] = int(row["score"])
+    for q in queries:
+      q.setdefault("qrels", {}).update(qrels.get(q["_id"], {}))
+  return queries
+
+
+def ndcg_at_k(retrieved_ids: list[str], qrels: dict, k: int) -> float:
+  """nDCG@k with graded relevance (2^rel - 1 gains)."""
+  dcg = sum((2 ** qrels.get(doc_id, 0) - 1) / math.log2(i + 2) for i, doc_id in enumerate(retrieved_ids[:k]))
+  ideal = sorted((rel for rel in qrels.values() if rel > 0), reverse=True)[:k]
+  idcg = sum((2 ** rel - 1) / math.log2(i + 2) for i, rel in enumerate(ideal))
+  return dcg / idcg if idcg > 0 else 0.0
+
+
+def recall_at_k(retrieved_ids: list[str], qrels: dict, k: int) -> float:
+  relevant = {doc_id for doc_id, rel in qrels.items() if rel > 0}
+  return len(relevant.intersection(retrieved_ids[:k])) / len(relevant) if relevant else 0.0
+
+
+def negative_hit_rate(docs, excluded_terms: list[str], negative_ids: list[str]) -> float:
+  """Share of retrieved documents that mention an excluded term or are judged negative."""
+  if not docs:
+    return 0.0
+  terms = [t.lower() for t in excluded_terms]
+  hits = sum(
+    1 for doc in docs
+    if doc.metadata.get("_id") in negative_ids or any(t in doc.page_content.lower() for t in terms)
+  )
+  return hits / len(docs)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark baseline vs DEO search on negation queries.")
+  parser.add_argument("--queries", default=os.path.join(SCRIPT_DIR, "queries.sample.jsonl"), help="JSONL query set.")
+  parser.add_argument("--qrels", help="Optional BEIR qrels TSV (query-id, corpus-id, score).")
+  parser.add_argument("--index", choices=["memory", "bigquery"], default="memory", help="Vector index to search. Defaults to memory.")
+  parser.add_argument("--embeddings", choices=["hashing", "vertex"], default="hashing", help="Embeddings of the in-memory index. Defaults to hashing (offline).")
+  parser.add_argument(
+    "--source_dir",
+    default=os.path.join(PROJECT_ROOT, "source_documents", "beir", "nsir"),
+    help="Directory with the JSONL corpus for the in-memory index.",
+  )
+  parser.add_argument("--k", type=int, default=5, help="Documents retrieved per query. Defaults to 5.")
+  parser.add_argument("--num_steps", type=int, default=20, help="DEO optimization steps. Defaults to 20.")
+  parser.add_argument("--lr", type=float, default=0.001, help="DEO learning rate. Defaults to 0.001.")
+  parser.add_argument("--output", help="Optional JSON file for the per-query results.")
+  args = parser.parse_args()
+
+  from deo_rag_with_bigquery import tools
+  from deo_rag_with_bigquery.deo_optimizer import DEOOptimizer
+
+  if args.index == "memory":
+    from ingest import load_documents_from_jsonl
+
+    if args.embeddings == "vertex":
+      from langchain_google_vertexai import VertexAIEmbeddings
+      embedding = VertexAIEmbeddings(model_name=os.environ.get("EMBEDDING_MODEL_NAME", "gemini-embedding-001"))
+    else:
+      embedding = HashingEmbeddings()
+    docs = load_documents_from_jsonl(args.source_dir)
+    print(f"Embedding {len(docs)} documents into the in-memory index...")
+    # Stand in for the BigQuery store and the optimizer the tools share
+    tools._vector_store = InMemoryVectorStore(docs, embedding)
+    tools._optimizer = DEOOptimizer(embedding, backend=os.environ.get("DEO_BACKEND", "numpy"))
+
+  queries = load_queries(args.queries, args.qrels)
+  print(f"Running {len(queries)} queries (k={args.k}, index={args.index})...")
+
+  methods = {
+    "baseline": lambda q, timings: tools._retrieve_documents(q["query"], args.k, timings),
+    "deo": lambda q, timings: tools._deo_retrieve_documents(
+      q["query"], q["positives"], q["negatives"], args.k, timings,
+      num_steps=args.num_steps, lr=args.lr,
+    ),
+  }
+  results = []
+  for q in queries:
+    row = {"_id": q.get("_id"), "query": q["query"]}
+    for name, retrieve in methods.items():
+      timings = {}
+      docs = retrieve(q, timings)
+      retrieved_ids = [doc.metadata.get("_id") for doc in docs]
+      row[name] = {
+        "retrieved_ids": retrieved_ids,
+        "negative_hit_rate": negative_hit_rate(docs, q.get("excluded_terms", []), q.get("negative_ids", [])),
+        "timings": timings,
+      }
+      if q.get("qrels"):
+        row[name]["ndcg"] = ndcg_at_k(retrieved_ids, q["qrels"], args.k)
+        row[name]["recall"] = recall_at_k(retrieved_ids, q["qrels"], args.k)
+    results.append(row)
+
+  judged = sum(1 for q in queries if q.get("qrels"))
+  print(f"\n{'method':>10} {f'nDCG@{args.k}':>8} {f'R@{args.k}':>6} {'neg-hit':>8}  "
+        + " ".join(f"{stage + ' p50/p95 ms':>22}" for stage in STAGES))
+  for name in methods:
+    rows = [r[name] for r in results]
+    ndcg = f"{statistics.mean(r['ndcg'] for r in rows if 'ndcg' in r):.3f}" if judged else "-"
+    recall = f"{statistics.mean(r['recall'] for r in rows if 'recall' in r):.3f}" if judged else "-"
+    neg = statistics.mean(r["negative_hit_rate"] for r in rows)
+    latency = " ".join(
+      f"{_percentile([r['timings'][stage] * 1000.0 for r in rows], 50):>12.1f}/"
+      f"{_percentile([r['timings'][stage] * 1000.0 for r in rows], 95):<9.1f}"
+      for stage in STAGES
+    )
+    print(f"{name:>10} {ndcg:>8} {recall:>6} {neg:>8.3f}  {latency}")
+  if not judged:
+    print("No qrels in the query set: nDCG and recall are not reported.")
+
+  if args.output:
+    with open(args.output, "w", encoding="utf-8") as f:
+      json.dump(results, f, ensure_ascii=False, indent=1)
+    print(f"Wrote per-query results to {args.output}")
+
+
+if __name__ == "__main__":
+  main()
@@ -13,14 +13,91 @@ Reference: DEO: Training-Free Direct Embedding Optimization
 """
 
 import logging
-from typing import List
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple, Union
 
-import torch
-import torch.nn.functional as F
+import numpy as np
 from langchain_google_vertexai import VertexAIEmbeddings
 
+from .embedding_cache import EmbeddingCache
+
 logger = logging.getLogger(__name__)
 
+BACKENDS = ("numpy", "torch")
+
+# torch.optim.Adam defaults, so that both backends take the same steps
+ADAM_BETAS = (0.9, 0.999)
+ADAM_EPS = 1e-8
+
+# A loss weight shared by all queries of a batch, or one weight per query
+Weight = Union[float, Sequence[float], np.ndarray]
+
+
+@dataclass
+class DEOResult:
+  """An optimized query embedding and how its optimization went."""
+  embedding: List[float]
+  steps: int  # optimization steps taken
+  loss: float  # loss of the returned embedding
+  converged: bool  # stopped before num_steps because of the tolerance
+  embed_seconds: float = 0.0  # time spent embedding (the whole batch's)
+  optimize_seconds: float = 0.0  # time spent in the optimization loop (the whole batch's)
+  negative_embeddings: Optional[np.ndarray] = None  # normalized negative sub-query embeddings (M, dim)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+  """L2-normalizes the last axis, like torch.nn.functional.normalize."""
+  norms = np.linalg.norm(x, axis=-1, keepdims=True)
+  return x / np.maximum(norms, 1e-12)
+
+
+def _distances(emb: np.ndarray, targets: np.ndarray):
+  """Returns ||emb - t|| for each target and its gradient with respect to emb.
+
+  The gradient of ||emb - t|| is the unit vector (emb - t) / ||emb - t||. Like
+  torch.norm, the gradient at a zero distance is taken to be zero.
+
+  Args:
+    emb: Query embeddings, (B, dim).
+    targets: Target embeddings, (B, dim) or (B, N, dim).
+
+  Returns:
+    The distances, (B,) or (B, N), and the gradients, shaped like targets.
+  """
+  if targets.ndim == 3:
+    emb = emb[:, None, :]
+  diff = emb - targets
+  dist = np.linalg.norm(diff, axis=-1)
+  safe = np.where(dist > 0, dist, 1.0).astype(diff.dtype)
+  return dist, diff / safe[..., None]
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+  """Means over axis 1 of the entries where mask is 1; zero for empty rows."""
+  counts = np.maximum(mask.sum(axis=1), 1.0)
+  if values.ndim == 3:
+    return (values * mask[..., None]).sum(axis=1) / counts[:, None]
+  return (values * mask).sum(axis=1) / counts
+
+
+def _pad(groups: List[np.ndarray], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+  """Stacks (n_i, dim) arrays into a zero-padded (B, N, dim) array and a (B, N) mask."""
+  width = max((len(g) for g in groups), default=0)
+  padded = np.zeros((len(groups), width, dim), dtype=np.float32)
+  mask = np.zeros((len(groups), width), dtype=np.float32)
+  for i, group in enumerate(groups):
+    padded[i, :len(group)] = group
+    mask[i, :len(group)] = 1.0
+  return padded, mask
+
+
+def _batch_weight(weight: Weight, batch_size: int) -> np.ndarray:
+  """Broadcasts a loss weight to a (B,) float32 array."""
+  return np.broadcast_to(np.asarray(weight, dtype=np.float32), (batch_size,))
+
 
 class DEOOptimizer:
   """Optimizes query embeddings using DEO's contrastive loss.
@@ -28,22 +105,83 @@ class DEOOptimizer:
   Takes a query and its positive/negative sub-query decomposition,
   then applies gradient descent to move the query embedding closer to
   positive intents and away from negative intents.
+
+  The default "numpy" backend computes the gradient of the loss analytically
+  and runs Adam by hand. The "torch" backend runs the same loss with autograd
+  and torch.optim.Adam, and needs torch to be installed. Both backends
+  optimize a batch of query embeddings at once as one (B, dim) array.
+
+  With an EmbeddingCache, texts embedded before are not sent to Vertex AI again.
   """
 
-  def __init__(self, embedding_model: VertexAIEmbeddings):
+  def __init__(
+    self,
+    embedding_model: VertexAIEmbeddings,
+    backend: str = "numpy",
+    cache: Optional[EmbeddingCache] = None,
+  ):
+    if backend not in BACKENDS:
+      raise ValueError(f"Unknown DEO backend '{backend}', expected one of {BACKENDS}")
     self.embedding_model = embedding_model
+    self.backend = backend
+    self.cache = cache
+    self.model_name = getattr(embedding_model, "model_name", None) or type(embedding_model).__name__
+
+  def _embed_queries(self, texts: List[str]) -> np.ndarray:
+    """Embeds texts with Vertex AI as queries, returned as normalized array.
+
+    All texts are sent in a single batch request with the RETRIEVAL_QUERY task
+    type, the same task type `embed_query()` uses. Embedding models without a
+    batch `embed()` method fall back to concurrent `embed_query()` calls.
+    """
+    if hasattr(self.embedding_model, "embed"):
+      vectors = self.embedding_model.embed(texts, embeddings_task_type="RETRIEVAL_QUERY")
+    else:
+      with ThreadPoolExecutor(max_workers=min(len(texts), 8)) as pool:
+        vectors = list(pool.map(self.embedding_model.embed_query, texts))
+    embs = np.asarray(vectors, dtype=np.float32)  # (N, dim)
+    return _normalize(embs)
+
+  def _get_embeddings(self, texts: List[str]) -> np.ndarray:
+    """Get query embeddings for many texts, from the cache or Vertex AI, as normalized array."""
+    if self.cache is None:
+      return self._embed_queries(texts)
+
+    cached = self.cache.get_many(self.model_name, texts)
+    missing = list(dict.fromkeys(text for text in texts if text not in cached))
+    if missing:
+      embedded = dict(zip(missing, self._embed_queries(missing)))
+      self.cache.put_many(self.model_name, embedded)
+      cached.update(embedded)
+    logger.debug(f"  DEO embeddings: {len(texts) - len(missing)}/{len(texts)} from cache")
+    return np.stack([cached[text] for text in texts])  # (N, dim)
+
+  def embed_batch(
+    self, triples: Sequence[Tuple[str, List[str], List[str]]],
+  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Embeds many (query, positives, negatives) triples in one batch request.
+
+    Texts shared by several triples (e.g. a common negative) are embedded once.
+
+    Args:
+      triples: (query, positives, negatives) triples.
 
-  def _get_embedding(self, text: str) -> torch.Tensor:
-    """Get a single query embedding from Vertex AI, returned as normalized tensor."""
-    vector = self.embedding_model.embed_query(text)
-    emb = torch.tensor([vector], dtype=torch.float32)  # (1, dim)
-    return F.normalize(emb, p=2, dim=1)
+    Returns:
+      (orig_embs, pos_embs, pos_mask, neg_embs, neg_mask): query embeddings
+      (B, dim), zero-padded sub-query embeddings (B, K, dim) and (B, M, dim),
+      and masks (B, K) and (B, M) marking the real sub-queries.
+    """
+    texts = list(dict.fromkeys(
+      text for query, positives, negatives in triples for text in (query, *positives, *negatives)
+    ))
+    embs = self._get_embeddings(texts)
+    row = {text: i for i, text in enumerate(texts)}
+    dim = embs.shape[1]
 
-  def _get_embeddings(self, texts: List[str]) -> torch.Tensor:
-    """Get multiple query embeddings from Vertex AI, returned as normalized tensors."""
-    vectors = [self.embedding_model.embed_query(t) for t in texts]
-    embs = torch.tensor(vectors, dtype=torch.float32)  # (N, dim)
-    return F.normalize(embs, p=2, dim=1)
+    orig_embs = embs[[row[query] for query, _, _ in triples]]
+    pos_embs, pos_mask = _pad([embs[[row[t] for t in positives]] for _, positives, _ in triples], dim)
+    neg_embs, neg_mask = _pad([embs[[row[t] for t in negatives]] for _, _, negatives in triples], dim)
+    return orig_embs, pos_embs, pos_mask, neg_embs, neg_mask
 
   def optimize(
     self,
@@ -55,7 +193,8 @@ class DEOOptimizer:
     pos_weight: float = 1.0,
     neg_weight: float = 1.0,
     reg_weight: float = 0.2,
-  ) -> List[float]:
+    tol: float = 0.0,
+  ) -> DEOResult:
     """Optimize query embedding using DEO's contrastive loss.
 
     Loss function (DEO paper Eq. 4):
@@ -65,63 +204,309 @@ class DEOOptimizer:
       query: Original user query.
       positives: Positive sub-queries (aspects to include).
       negatives: Negative sub-queries (aspects to exclude).
-      num_steps: Number of optimization steps (paper default: 20).
+      num_steps: Maximum number of optimization steps (paper default: 20).
       lr: Learning rate for Adam optimizer.
       pos_weight: Weight for positive attraction loss (λp).
       neg_weight: Weight for negative repulsion loss (λn).
       reg_weight: Weight for consistency regularization loss (λo).
+      tol: Stop early once a step moves the embedding, or improves the loss,
+        by less than this. 0 always runs num_steps steps.
 
     Returns:
-      Optimized embedding as list[float], compatible with
+      DEOResult whose embedding is a list[float], compatible with
       BigQueryVectorStore.similarity_search_by_vector().
     """
-    # Phase 1: Get all embeddings from Vertex AI
-    orig_emb = self._get_embedding(query)  # (1, dim)
+    return self.optimize_batch(
+      [(query, positives, negatives)],
+      num_steps=num_steps,
+      lr=lr,
+      pos_weight=pos_weight,
+      neg_weight=neg_weight,
+      reg_weight=reg_weight,
+      tol=tol,
+    )[0]
+
+  def optimize_batch(
+    self,
+    triples: Sequence[Tuple[str, List[str], List[str]]],
+    num_steps: int = 20,
+    lr: float = 0.001,
+    pos_weight: Weight = 1.0,
+    neg_weight: Weight = 1.0,
+    reg_weight: Weight = 0.2,
+    tol: float = 0.0,
+  ) -> List[DEOResult]:
+    """Optimize many query embeddings at once using DEO's contrastive loss.
+
+    Each query is optimized exactly as `optimize()` would, but all texts are
+    embedded in one request and all queries are updated as one (B, dim) array.
+
+    Args:
+      triples: (query, positives, negatives) triples.
+      num_steps: Maximum number of optimization steps (paper default: 20).
+      lr: Learning rate for Adam optimizer.
+      pos_weight: Weight for positive attraction loss (λp), or one per query.
+      neg_weight: Weight for negative repulsion loss (λn), or one per query.
+      reg_weight: Weight for consistency regularization loss (λo), or one per query.
+      tol: Early-stopping tolerance, applied to each query separately.
+
+    Returns:
+      One DEOResult per triple.
+    """
+    if not triples:
+      return []
+    # Phase 1: Get all embeddings from Vertex AI in one batch request
+    started = time.perf_counter()
+    embeddings = self.embed_batch(triples)
+    embedded = time.perf_counter()
+    # Phases 2-3: Optimize only the query vectors — the encoder is never touched
+    updated_embs, steps, losses, converged = self.optimize_embeddings(
+      *embeddings,
+      num_steps=num_steps,
+      lr=lr,
+      pos_weight=pos_weight,
+      neg_weight=neg_weight,
+      reg_weight=reg_weight,
+      tol=tol,
+    )
+    optimized = time.perf_counter()
+    # Phase 4: Return as list[float] for BigQuery compatibility
+    neg_embs = embeddings[3]
+    return [
+      DEOResult(
+        embedding=emb,
+        steps=int(n),
+        loss=float(loss),
+        converged=bool(done),
+        embed_seconds=embedded - started,
+        optimize_seconds=optimized - embedded,
+        # Reused e.g. to rerank candidates without embedding the negatives again
+        negative_embeddings=neg_embs[i, :len(negatives)],
+      )
+      for i, (emb, n, loss, done, (_, _, negatives)) in enumerate(
+        zip(updated_embs.tolist(), steps, losses, converged, triples)
+      )
+    ]
 
-    pos_embs = None
-    if positives:
-      pos_embs = self._get_embeddings(positives)  # (K, dim)
+  def optimize_embeddings(
+    self,
+    orig_embs: np.ndarray,
+    pos_embs: np.ndarray,
+    pos_mask: np.ndarray,
+    neg_embs: np.ndarray,
+    neg_mask: np.ndarray,
+    num_steps: int = 20,
+    lr: float = 0.001,
+    pos_weight: Weight = 1.0,
+    neg_weight: Weight = 1.0,
+    reg_weight: Weight = 0.2,
+    tol: float = 0.0,
+  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Optimizes already embedded queries, e.g. the output of `embed_batch()`.
 
-    neg_embs = None
-    if negatives:
-      neg_embs = self._get_embeddings(negatives)  # (M, dim)
+    Useful to tune the loss weights offline without embedding the queries again.
+    With tol > 0, a query stops (and keeps its embedding) as soon as a step
+    moves its embedding, or improves its loss, by less than tol; a step that
+    made the loss worse is undone. The loop ends once every query has stopped.
 
-    # Phase 2: Initialize learnable embedding
-    # Only this single vector is optimized — the encoder is never touched.
-    updated_emb = orig_emb.clone().detach().requires_grad_(True)
-    optimizer = torch.optim.Adam([updated_emb], lr=lr)
+    Returns:
+      (embeddings, steps, losses, converged): the optimized, normalized query
+      embeddings (B, dim), the steps taken by each query (B,), the loss of each
+      returned embedding (B,), and whether each query stopped early (B,).
+    """
+    batch_size = len(orig_embs)
+    optimize_fn = self._optimize_torch if self.backend == "torch" else self._optimize_numpy
+    return optimize_fn(
+      orig_embs, pos_embs, pos_mask, neg_embs, neg_mask, num_steps, lr,
+      _batch_weight(pos_weight, batch_size),
+      _batch_weight(neg_weight, batch_size),
+      _batch_weight(reg_weight, batch_size),
+      tol,
+    )
+
+  def _optimize_numpy(
+    self,
+    orig_embs: np.ndarray,
+    pos_embs: np.ndarray,
+    pos_mask: np.ndarray,
+    neg_embs: np.ndarray,
+    neg_mask: np.ndarray,
+    num_steps: int,
+    lr: float,
+    pos_weight: np.ndarray,
+    neg_weight: np.ndarray,
+    reg_weight: np.ndarray,
+    tol: float,
+  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Runs the optimization loop with an analytic gradient and a hand-rolled Adam."""
+    beta1, beta2 = ADAM_BETAS
+    batch_size = len(orig_embs)
+    updated_embs = orig_embs.copy()
+    exp_avg = np.zeros_like(updated_embs)
+    exp_avg_sq = np.zeros_like(updated_embs)
+    active = np.ones(batch_size, dtype=bool)
+    steps = np.zeros(batch_size, dtype=np.int64)
+    losses = np.zeros(batch_size, dtype=np.float32)
+    previous_embs = updated_embs
 
-    # Phase 3: Optimization loop
     for step in range(num_steps):
-      optimizer.zero_grad()
+      # Consistency regularization: don't drift too far from original
+      dev_loss, dev_grad = _distances(updated_embs, orig_embs)  # (B,), (B, dim)
 
       # Positive attraction: pull toward positive sub-query embeddings
-      pos_loss = torch.tensor(0.0)
-      if pos_embs is not None and len(pos_embs) > 0:
-        pos_loss = torch.norm(updated_emb - pos_embs, dim=1).mean()
+      pos_dist, pos_grad = _distances(updated_embs, pos_embs)  # (B, K), (B, K, dim)
+      pos_loss = _masked_mean(pos_dist, pos_mask)
+
+      # Negative repulsion: push away from negative sub-query embeddings
+      neg_dist, neg_grad = _distances(updated_embs, neg_embs)  # (B, M), (B, M, dim)
+      neg_loss = _masked_mean(neg_dist, neg_mask)
+
+      loss = pos_weight * pos_loss + reg_weight * dev_loss - neg_weight * neg_loss  # (B,)
+
+      # Stop queries whose loss no longer improves. A query whose last step
+      # made the loss worse goes back to its embedding before that step.
+      record = active
+      if tol > 0 and step > 0:
+        stopped = active & ((losses - loss) < tol)
+        regressed = stopped & (loss > losses)
+        updated_embs = np.where(regressed[:, None], previous_embs, updated_embs)
+        steps -= regressed
+        record = active & ~regressed
+        active = active & ~stopped
+      losses = np.where(record, loss, losses)
+      if not active.any():
+        break
+
+      grad = (
+        pos_weight[:, None] * _masked_mean(pos_grad, pos_mask)
+        + reg_weight[:, None] * dev_grad
+        - neg_weight[:, None] * _masked_mean(neg_grad, neg_mask)
+      )
+
+      # Adam update, as in torch.optim.Adam
+      t = step + 1
+      exp_avg = beta1 * exp_avg + (1 - beta1) * grad
+      exp_avg_sq = beta2 * exp_avg_sq + (1 - beta2) * grad * grad
+      step_size = lr / (1 - beta1 ** t)
+      denom = np.sqrt(exp_avg_sq) / math.sqrt(1 - beta2 ** t) + ADAM_EPS
+      new_embs = updated_embs - step_size * exp_avg / denom
+
+      # Re-project onto unit sphere (maintains cosine similarity compatibility)
+      new_embs = _normalize(new_embs).astype(np.float32)
+
+      # Stopped queries keep their embedding
+      moved = np.linalg.norm(new_embs - updated_embs, axis=1)
+      previous_embs = updated_embs
+      updated_embs = np.where(active[:, None], new_embs, updated_embs)
+      steps += active
+
+      # Stop queries whose embedding barely moved
+      if tol > 0:
+        active &= moved >= tol
+        if not active.any():
+          break
+
+    # The losses above belong to the embeddings before the last update;
+    # report the loss of the embeddings that are returned
+    dev_loss, _ = _distances(updated_embs, orig_embs)
+    pos_loss = _masked_mean(_distances(updated_embs, pos_embs)[0], pos_mask)
+    neg_loss = _masked_mean(_distances(updated_embs, neg_embs)[0], neg_mask)
+    losses = pos_weight * pos_loss + reg_weight * dev_loss - neg_weight * neg_loss
+    return updated_embs, steps, losses, ~active
+
+  def _optimize_torch(
+    self,
+    orig_embs: np.ndarray,
+    pos_embs: np.ndarray,
+    pos_mask: np.ndarray,
+    neg_embs: np.ndarray,
+    neg_mask: np.ndarray,
+    num_steps: int,
+    lr: float,
+    pos_weight: np.ndarray,
+    neg_weight: np.ndarray,
+    reg_weight: np.ndarray,
+    tol: float,
+  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Runs the optimization loop with torch autograd and torch.optim.Adam."""
+    import torch
+    import torch.nn.functional as F
+
+    orig_embs, pos_embs, pos_mask, neg_embs, neg_mask = (
+      torch.from_numpy(np.ascontiguousarray(a))
+      for a in (orig_embs, pos_embs, pos_mask, neg_embs, neg_mask)
+    )
+    pos_weight, neg_weight, reg_weight = (
+      torch.from_numpy(np.array(w)) for w in (pos_weight, neg_weight, reg_weight)
+    )
+    pos_count = pos_mask.sum(dim=1).clamp(min=1.0)
+    neg_count = neg_mask.sum(dim=1).clamp(min=1.0)
+    batch_size = len(orig_embs)
+    active = torch.ones(batch_size, dtype=torch.bool)
+    steps = torch.zeros(batch_size, dtype=torch.int64)
+    losses = torch.zeros(batch_size)
+
+    updated_embs = orig_embs.clone().detach().requires_grad_(True)
+    optimizer = torch.optim.Adam([updated_embs], lr=lr, betas=ADAM_BETAS, eps=ADAM_EPS)
+    previous_embs = orig_embs.clone()
+
+    def compute_loss(embs):
+      # Positive attraction: pull toward positive sub-query embeddings
+      pos_dist = torch.norm(embs[:, None, :] - pos_embs, dim=2)  # (B, K)
+      pos_loss = (pos_dist * pos_mask).sum(dim=1) / pos_count
 
       # Consistency regularization: don't drift too far from original
-      dev_loss = torch.norm(updated_emb - orig_emb)
+      dev_loss = torch.norm(embs - orig_embs, dim=1)  # (B,)
 
       # Negative repulsion: push away from negative sub-query embeddings
-      neg_loss = torch.tensor(0.0)
-      if neg_embs is not None and len(neg_embs) > 0:
-        neg_loss = torch.norm(updated_emb - neg_embs, dim=1).mean()
+      neg_dist = torch.norm(embs[:, None, :] - neg_embs, dim=2)  # (B, M)
+      neg_loss = (neg_dist * neg_mask).sum(dim=1) / neg_count
 
-      # Combined loss: minimize pos_loss and dev_loss, maximize neg_loss
-      loss = pos_weight * pos_loss + reg_weight * dev_loss - neg_weight * neg_loss
-      loss.backward()
+      # Combined loss: minimize pos_loss and dev_loss, maximize neg_loss.
+      # Queries don't interact, so summing gives each its own gradient.
+      return pos_weight * pos_loss + reg_weight * dev_loss - neg_weight * neg_loss
+
+    for step in range(num_steps):
+      optimizer.zero_grad()
+      loss = compute_loss(updated_embs)
+
+      # Stop queries whose loss no longer improves; those made worse by the
+      # last step go back to their embedding before it
+      with torch.no_grad():
+        record = active
+        if tol > 0 and step > 0:
+          stopped = active & ((losses - loss) < tol)
+          regressed = stopped & (loss > losses)
+          updated_embs.data = torch.where(regressed[:, None], previous_embs, updated_embs.data)
+          steps -= regressed.long()
+          record = active & ~regressed
+          active = active & ~stopped
+        losses = torch.where(record, loss, losses)
+        if not active.any():
+          break
+
+      loss.sum().backward()
+      previous_embs = updated_embs.detach().clone()
       optimizer.step()
 
-      # Re-project onto unit sphere (maintains cosine similarity compatibility)
       with torch.no_grad():
-        updated_emb.data = F.normalize(updated_emb.data, p=2, dim=-1)
+        # Re-project onto unit sphere (maintains cosine similarity compatibility)
+        new_embs = F.normalize(updated_embs.data, p=2, dim=-1)
 
-      if step == 0 or step == num_steps - 1:
-        logger.info(
-          f"  DEO step {step:3d} | loss={loss.item():.4f} "
-          f"pos={pos_loss.item():.4f} reg={dev_loss.item():.4f} neg={neg_loss.item():.4f}"
-        )
+        # Stopped queries keep their embedding
+        moved = torch.norm(new_embs - previous_embs, dim=1)
+        updated_embs.data = torch.where(active[:, None], new_embs, previous_embs)
+        steps += active
 
-    # Phase 4: Return as list[float] for BigQuery compatibility
-    return updated_emb.detach().squeeze().tolist()
+        # Stop queries whose embedding barely moved
+        if tol > 0:
+          active &= moved >= tol
+          if not active.any():
+            break
+
+    # The losses above belong to the embeddings before the last update;
+    # report the loss of the embeddings that are returned
+    with torch.no_grad():
+      losses = compute_loss(updated_embs.detach())
+
+    return updated_embs.detach().numpy(), steps.numpy(), losses.numpy(), (~active).numpy()
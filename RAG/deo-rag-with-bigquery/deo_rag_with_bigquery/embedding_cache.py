@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""
+Embedding cache for DEO sub-queries.
+
+Negative and positive sub-queries such as "no meat" or "Christianity" repeat
+across users, so their embeddings are kept in an in-memory LRU keyed by
+(model name, text), optionally backed by a SQLite file that survives restarts
+and can be shared by the workers of one host.
+"""
+
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Texts looked up per SQLite query, below SQLite's limit on bound parameters
+_SQLITE_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+  """Thread-safe LRU cache of embeddings, optionally persisted to SQLite.
+
+  Vectors are stored as float32. A vector found only in SQLite is promoted
+  into the in-memory LRU.
+  """
+
+  def __init__(self, maxsize: int = 10000, path: Optional[str] = None):
+    """
+    Args:
+      maxsize: Maximum number of embeddings held in memory.
+      path: SQLite file to persist embeddings to. In memory only if None.
+    """
+    self.maxsize = maxsize
+    self.path = path
+    self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+    self._lock = threading.Lock()
+    self._db = None
+    if path:
+      self._db = sqlite3.connect(path, check_same_thread=False)
+      self._db.execute("PRAGMA journal_mode=WAL")
+      self._db.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        " model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL,"
+        " PRIMARY KEY (model, text))"
+      )
+      self._db.commit()
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def _remember(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+    self._entries[key] = vector
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.maxsize:
+      self._entries.popitem(last=False)
+
+  def get_many(self, model: str, texts: List[str]) -> Dict[str, np.ndarray]:
+    """Returns the cached embeddings of the texts that are in the cache."""
+    found = {}
+    with self._lock:
+      for text in texts:
+        vector = self._entries.get((model, text))
+        if vector is not None:
+          self._entries.move_to_end((model, text))
+          found[text] = vector
+
+      missing = [text for text in texts if text not in found]
+      if self._db is not None and missing:
+        try:
+          for start in range(0, len(missing), _SQLITE_BATCH_SIZE):
+            batch = missing[start:start + _SQLITE_BATCH_SIZE]
+            for text, blob in self._db.execute(
+              f"SELECT text, vector FROM embeddings WHERE model = ? AND text IN ({','.join('?' * len(batch))})",
+              [model, *batch],
+            ):
+              vector = np.frombuffer(blob, dtype=np.float32)
+              self._remember((model, text), vector)
+              found[text] = vector
+        except sqlite3.Error as e:
+          logger.warning(f"Reading the embedding cache {self.path} failed: {e}")
+    return found
+
+  def put_many(self, model: str, embeddings: Dict[str, np.ndarray]) -> None:
+    """Adds embeddings to the cache, keyed by their text."""
+    with self._lock:
+      for text, vector in embeddings.items():
+        self._remember((model, text), np.asarray(vector, dtype=np.float32))
+
+      if self._db is not None and embeddings:
+        try:
+          self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+            [
+              (model, text, np.asarray(vector, dtype=np.float32).tobytes())
+              for text, vector in embeddings.items()
+            ],
+          )
+          self._db.commit()
+        except sqlite3.Error as e:
+          logger.warning(f"Writing the embedding cache {self.path} failed: {e}")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""
+Local reranking of DEO search candidates.
+
+The vector search only sees the optimized query vector. The reranker scores
+the over-fetched candidates again with an explicit penalty for documents that
+are closer to one of the negative sub-queries than to the query itself.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def margin_scores(
+  query_emb: np.ndarray,
+  candidate_embs: np.ndarray,
+  neg_embs: np.ndarray,
+  neg_penalty: float = 1.0,
+  margin: float = 0.05,
+) -> np.ndarray:
+  """Scores candidates by query similarity minus a hinge penalty on negative similarity.
+
+    score(d) = cos(d, q) - λ · max(0, max_j cos(d, n_j) - cos(d, q) + margin)
+
+  A document is only penalized when its similarity to some negative comes
+  within `margin` of (or exceeds) its similarity to the query.
+
+  Args:
+    query_emb: The (optimized) query embedding, (dim,).
+    candidate_embs: Candidate document embeddings, (N, dim).
+    neg_embs: Negative sub-query embeddings, (M, dim).
+    neg_penalty: Weight of the penalty (λ).
+    margin: Margin of the hinge.
+
+  Returns:
+    The scores of the candidates, (N,).
+  """
+  candidate_embs = candidate_embs / np.maximum(np.linalg.norm(candidate_embs, axis=1, keepdims=True), 1e-12)
+  query_emb = query_emb / max(np.linalg.norm(query_emb), 1e-12)
+  query_sim = candidate_embs @ query_emb  # (N,)
+  if len(neg_embs) == 0:
+    return query_sim
+  neg_embs = neg_embs / np.maximum(np.linalg.norm(neg_embs, axis=1, keepdims=True), 1e-12)
+  neg_sim = (candidate_embs @ neg_embs.T).max(axis=1)  # (N,)
+  return query_sim - neg_penalty * np.maximum(0.0, neg_sim - query_sim + margin)
+
+
+def rerank(
+  query_emb: np.ndarray,
+  candidate_embs: np.ndarray,
+  neg_embs: np.ndarray,
+  k: int,
+  neg_penalty: float = 1.0,
+  margin: float = 0.05,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Returns the indices and scores of the top-k candidates by `margin_scores()`."""
+  scores = margin_scores(query_emb, candidate_embs, neg_embs, neg_penalty, margin)
+  top = np.argsort(-scores, kind="stable")[:k]
+  return top, scores[top]
@@ -3,27 +3,157 @@
 # vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
 
 import os
+import time
 import logging
-from typing import List
+import threading
+from typing import Dict, List, Optional
 
+import numpy as np
+from langchain_core.documents import Document
 from langchain_google_vertexai import VertexAIEmbeddings
 from langchain_google_community import BigQueryVectorStore
 from google.adk.tools import LongRunningFunctionTool
 
-from .deo_optimizer import DEOOptimizer
+from .deo_optimizer import DEOOptimizer, DEOResult
+from .embedding_cache import EmbeddingCache
+from .rerank import rerank
 
 logger = logging.getLogger(__name__)
 
+# The vector store (with its BigQuery and Vertex AI clients) and the optimizer
+# (with its sub-query embedding cache) are created on first use and shared by
+# all tool calls of this process.
+_init_lock = threading.Lock()
+_vector_store: Optional[BigQueryVectorStore] = None
+_optimizer: Optional[DEOOptimizer] = None
+
 
 def _get_vector_store() -> BigQueryVectorStore:
-  """Initialize BigQuery Vector Store with Vertex AI embeddings."""
-  return BigQueryVectorStore(
-    project_id=os.environ["GOOGLE_CLOUD_PROJECT"],
-    location=os.environ["BIGQUERY_LOCATION"],
-    dataset_name=os.environ["BIGQUERY_DATASET"],
-    table_name=os.environ["BIGQUERY_TABLE"],
-    embedding=VertexAIEmbeddings(model_name=os.environ.get("EMBEDDING_MODEL_NAME", "gemini-embedding-001")),
+  """Returns the process-wide BigQuery Vector Store with Vertex AI embeddings."""
+  global _vector_store
+  if _vector_store is None:
+    with _init_lock:
+      if _vector_store is None:
+        _vector_store = BigQueryVectorStore(
+          project_id=os.environ["GOOGLE_CLOUD_PROJECT"],
+          location=os.environ["BIGQUERY_LOCATION"],
+          dataset_name=os.environ["BIGQUERY_DATASET"],
+          table_name=os.environ["BIGQUERY_TABLE"],
+          embedding=VertexAIEmbeddings(model_name=os.environ.get("EMBEDDING_MODEL_NAME", "gemini-embedding-001")),
+        )
+  return _vector_store
+
+
+def _get_optimizer() -> DEOOptimizer:
+  """Returns the process-wide DEO optimizer, sharing the vector store's embedding model."""
+  global _optimizer
+  if _optimizer is None:
+    embedding_model = _get_vector_store().embedding
+    with _init_lock:
+      if _optimizer is None:
+        _optimizer = DEOOptimizer(
+          embedding_model,
+          backend=os.environ.get("DEO_BACKEND", "numpy"),
+          cache=EmbeddingCache(
+            maxsize=int(os.environ.get("DEO_EMBEDDING_CACHE_SIZE", "10000")),
+            path=os.environ.get("DEO_EMBEDDING_CACHE_PATH") or None,
+          ),
+        )
+  return _optimizer
+
+
+def _rerank_candidates() -> int:
+  """Candidates over-fetched from BigQuery for the local margin rerank (0 = off).
+
+  Read on each call, like the settings in `_get_optimizer()`, because this
+  module is imported before agent.py loads the .env file.
+  """
+  return int(os.environ.get("DEO_RERANK_CANDIDATES", "0"))
+
+
+def _search_and_rerank(
+  vector_store: BigQueryVectorStore,
+  result: DEOResult,
+  k: int,
+) -> List[Document]:
+  """Over-fetches candidates with their embeddings and keeps the top-k by margin score.
+
+  The candidates and their stored embeddings come back from the same single
+  BigQuery vector search; the negatives were embedded by the optimization.
+  """
+  candidates = vector_store.similarity_search_by_vectors(
+    [result.embedding],
+    k=max(_rerank_candidates(), k),
+    with_scores=True,
+    with_embeddings=True,
+  )[0]
+  if not candidates:
+    return []
+  docs = [doc for doc, _, _ in candidates]
+  candidate_embs = np.asarray([emb for _, _, emb in candidates], dtype=np.float32)
+  top, _ = rerank(
+    np.asarray(result.embedding, dtype=np.float32),
+    candidate_embs,
+    result.negative_embeddings,
+    k,
+    neg_penalty=float(os.environ.get("DEO_RERANK_NEG_PENALTY", "1.0")),
+    margin=float(os.environ.get("DEO_RERANK_MARGIN", "0.05")),
+  )
+  logger.info(f"[DEO] Reranked {len(docs)} candidates")
+  return [docs[i] for i in top]
+
+
+def _retrieve_documents(query: str, k: int, timings: Optional[Dict[str, float]] = None) -> List[Document]:
+  """Standard similarity search; records the embed and search seconds in timings."""
+  vector_store = _get_vector_store()
+  started = time.perf_counter()
+  query_embedding = vector_store.embedding.embed_query(query)
+  embedded = time.perf_counter()
+  docs = vector_store.similarity_search_by_vector(query_embedding, k=k)
+  if timings is not None:
+    timings.update(embed=embedded - started, optimize=0.0, search=time.perf_counter() - embedded)
+  return docs
+
+
+def _deo_retrieve_documents(
+  query: str,
+  positives: List[str],
+  negatives: List[str],
+  k: int,
+  timings: Optional[Dict[str, float]] = None,
+  **optimize_kwargs,
+) -> List[Document]:
+  """DEO search; records the embed, optimize and search seconds in timings."""
+  vector_store = _get_vector_store()
+  optimizer = _get_optimizer()
+
+  # DEO: Optimize query embedding
+  result = optimizer.optimize(
+    query=query,
+    positives=positives,
+    negatives=negatives,
+    # Stop once a step moves the embedding, or improves the loss, by less than this (0 = off)
+    tol=float(os.environ.get("DEO_TOLERANCE", "0")),
+    **optimize_kwargs,
   )
+  logger.info(
+    f"[DEO] Optimized in {result.steps} steps (loss={result.loss:.4f}"
+    f"{', converged' if result.converged else ''})"
+  )
+
+  # Search BigQuery with the optimized embedding vector
+  started = time.perf_counter()
+  if _rerank_candidates() > k and negatives:
+    docs = _search_and_rerank(vector_store, result, k)
+  else:
+    docs = vector_store.similarity_search_by_vector(result.embedding, k=k)
+  if timings is not None:
+    timings.update(
+      embed=result.embed_seconds,
+      optimize=result.optimize_seconds,
+      search=time.perf_counter() - started,
+    )
+  return docs
 
 
 def search_documents_in_bigquery(query: str, k: int = 4) -> str:
@@ -40,14 +170,7 @@ def search_documents_in_bigquery(query: str, k: int = 4) -> str:
   """
   try:
     logger.info(f"[Baseline] Searching for: '{query}'")
-    vector_store = _get_vector_store()
-
-    retriever = vector_store.as_retriever(
-      search_type="similarity",
-      search_kwargs={"k": k},
-    )
-
-    docs = retriever.invoke(query)
+    docs = _retrieve_documents(query, k)
 
     logger.info(f"[Baseline] Found {len(docs)} documents")
     return "\n\n".join(doc.page_content for doc in docs)
@@ -96,15 +219,11 @@ def deo_search_documents_in_bigquery(
     logger.info(f"[DEO] Positives: {positives}")
     logger.info(f"[DEO] Negatives: {negatives}")
 
-    vector_store = _get_vector_store()
-    embedding_model = vector_store.embedding
-
-    # DEO: Optimize query embedding
-    optimizer = DEOOptimizer(embedding_model)
-    optimized_embedding = optimizer.optimize(
-      query=query,
-      positives=positives,
-      negatives=negatives,
+    docs = _deo_retrieve_documents(
+      query,
+      positives,
+      negatives,
+      k,
       num_steps=num_steps,
       lr=lr,
       pos_weight=pos_weight,
@@ -112,9 +231,6 @@ def deo_search_documents_in_bigquery(
       reg_weight=reg_weight,
     )
 
-    # Search BigQuery with the optimized embedding vector
-    docs = vector_store.similarity_search_by_vector(optimized_embedding, k=k)
-
     logger.info(f"[DEO] Found {len(docs)} documents")
     return "\n\n".join(doc.page_content for doc in docs)
   except Exception as e:
@@ -12,6 +12,10 @@ import sys
 # Add parent directory to path to import the agent module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Do not open an AlloyDB pool from this machine when the agent module is
+# imported; the deployed agent still reads ALLOYDB_WARM_UP from its .env
+os.environ["ALLOYDB_WARM_UP"] = "false"
+
 try:
   import vertexai
   from dotenv import load_dotenv
@@ -80,6 +84,8 @@ def create_agent(project_id, location, bucket):
       "langchain-core>=0.3.72",
       "langchain-google-vertexai>=2.0.27",
       "langchain-google-alloydb-pg>=0.12.0",
+      "google-cloud-alloydb-connector[asyncpg]>=1.2.0",
+      "SQLAlchemy[asyncio]>=2.0.25",
       "langgraph==0.5.4",
       "google-auth>=2.40.3",
       "google-cloud-aiplatform[agent_engines]>=1.91.0,!=1.92.0",
@@ -2,6 +2,8 @@
 # -*- encoding: utf-8 -*-
 # vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
 
+import os
+
 from dotenv import load_dotenv
 from google.adk.agents import LlmAgent
 from .prompt import instruction
@@ -9,6 +11,10 @@ from . import tools
 
 load_dotenv()
 
+# Open the AlloyDB connection pool now rather than on the first query
+if os.environ.get("ALLOYDB_WARM_UP", "true").lower() == "true":
+  tools.warm_up()
+
 root_agent = LlmAgent(
   model='gemini-2.5-flash',
   name='alloydb_rag_agent',
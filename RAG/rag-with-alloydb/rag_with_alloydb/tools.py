@@ -3,14 +3,130 @@
 # vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
 
 import os
+import atexit
+import asyncio
 import logging
+import threading
+from typing import Optional
+
 from langchain_core.documents import Document
 from langchain_google_vertexai import VertexAIEmbeddings
 from langchain_google_alloydb_pg import AlloyDBEngine, AlloyDBVectorStore
 from google.adk.tools import LongRunningFunctionTool
+from google.cloud.alloydb.connector import AsyncConnector, IPTypes
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 logger = logging.getLogger(__name__)
 
+# The engine (AlloyDB connector and connection pool) and the vector store are
+# created once, by warm_up() or the first query, and shared by all tool calls
+# of this process. close() releases them and runs at interpreter exit.
+_init_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_connector: Optional[AsyncConnector] = None
+_pool: Optional[AsyncEngine] = None
+_engine: Optional[AlloyDBEngine] = None
+_vector_store: Optional[AlloyDBVectorStore] = None
+
+
+def _create_engine() -> AlloyDBEngine:
+  """Creates an AlloyDBEngine with a connection pool sized by ALLOYDB_POOL_SIZE.
+
+  AlloyDBEngine.from_instance() does not expose the pool settings, so the
+  SQLAlchemy engine is built here with the AlloyDB connector, on a background
+  event loop that the AlloyDBEngine then runs its sync methods on.
+  """
+  global _loop, _connector, _pool
+  instance_uri = (
+    f"projects/{os.environ['GOOGLE_CLOUD_PROJECT']}/locations/{os.environ['ALLOYDB_REGION']}"
+    f"/clusters/{os.environ['ALLOYDB_CLUSTER']}/instances/{os.environ['ALLOYDB_INSTANCE']}"
+  )
+
+  async def create_pool():
+    connector = AsyncConnector()
+
+    async def getconn():
+      return await connector.connect(
+        instance_uri,
+        "asyncpg",
+        user=os.environ["ALLOYDB_USER"],
+        password=os.environ["ALLOYDB_PASS"],
+        db=os.environ["ALLOYDB_DATABASE"],
+        ip_type=IPTypes.PUBLIC,
+      )
+
+    pool = create_async_engine(
+      "postgresql+asyncpg://",
+      async_creator=getconn,
+      pool_size=int(os.environ.get("ALLOYDB_POOL_SIZE", "5")),
+      max_overflow=int(os.environ.get("ALLOYDB_MAX_OVERFLOW", "5")),
+      pool_pre_ping=True,
+    )
+    return connector, pool
+
+  loop = asyncio.new_event_loop()
+  threading.Thread(target=loop.run_forever, name="alloydb-engine", daemon=True).start()
+  try:
+    _connector, _pool = asyncio.run_coroutine_threadsafe(create_pool(), loop).result()
+  except Exception:
+    loop.call_soon_threadsafe(loop.stop)
+    raise
+  _loop = loop
+  return AlloyDBEngine.from_engine(_pool, loop=loop)
+
+
+def _get_vector_store() -> AlloyDBVectorStore:
+  """Returns the process-wide AlloyDB vector store with Vertex AI embeddings."""
+  global _engine, _vector_store
+  if _vector_store is None:
+    with _init_lock:
+      if _engine is None:
+        logger.info("Connecting to AlloyDB...")
+        _engine = _create_engine()
+      if _vector_store is None:
+        logger.info("Initializing vector store...")
+        _vector_store = AlloyDBVectorStore.create_sync(
+          engine=_engine,
+          table_name=os.environ["ALLOYDB_TABLE_NAME"],
+          embedding_service=VertexAIEmbeddings(model_name="text-embedding-005"),
+        )
+  return _vector_store
+
+
+def warm_up() -> None:
+  """Connects to AlloyDB and loads the vector store ahead of the first query."""
+  try:
+    _get_vector_store()
+    logger.info("AlloyDB engine and vector store are ready.")
+  except Exception as e:
+    logger.warning(f"Warming up AlloyDB failed, retrying on the first query: {e}")
+
+
+def close() -> None:
+  """Closes the connection pool and the connector, and stops their event loop."""
+  global _loop, _connector, _pool, _engine, _vector_store
+  with _init_lock:
+    loop, connector, pool = _loop, _connector, _pool
+    _loop = _connector = _pool = _engine = _vector_store = None
+  if loop is None:
+    return
+
+  async def shutdown():
+    await pool.dispose()
+    await connector.close()
+
+  try:
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=10)
+    logger.info("Closed the AlloyDB connection pool.")
+  except Exception as e:
+    logger.warning(f"Closing the AlloyDB connection pool failed: {e}")
+  finally:
+    loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(close)
+
+
 def search_documents_in_alloydb(query: str, k: int = 4) -> str:
   """
   Searches for relevant documents in AlloyDB based on a query.
@@ -23,31 +139,10 @@ def search_documents_in_alloydb(query: str, k: int = 4) -> str:
       A formatted string of the retrieved documents.
   """
   try:
-    logger.info("Connecting to AlloyDB...")
-    engine = AlloyDBEngine.from_instance(
-      project_id=os.environ["GOOGLE_CLOUD_PROJECT"],
-      region=os.environ["ALLOYDB_REGION"],
-      cluster=os.environ["ALLOYDB_CLUSTER"],
-      instance=os.environ["ALLOYDB_INSTANCE"],
-      database=os.environ["ALLOYDB_DATABASE"],
-      user=os.environ["ALLOYDB_USER"],
-      password=os.environ["ALLOYDB_PASS"],
-    )
-
-    logger.info("Initializing vector store...")
-    vector_store = AlloyDBVectorStore.create_sync(
-        engine=engine,
-        table_name=os.environ["ALLOYDB_TABLE_NAME"],
-        embedding_service=VertexAIEmbeddings(model_name="text-embedding-005"),
-    )
-
-    retriever = vector_store.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": k},
-    )
+    vector_store = _get_vector_store()
 
     logger.info(f"Searching for documents related to '{query}'...")
-    docs = retriever.invoke(query)
+    docs = vector_store.similarity_search(query, k=k)
 
     logger.info("Processing results...")
     return "\n\n".join(doc.page_content for doc in docs)
@@ -4,13 +4,18 @@
 
 """BigQuery Data Agent with Agent Engine Memory Bank integration."""
 
+import asyncio
 import logging
 import os
+from typing import Any, Optional
 
 
+import numpy as np
 from dotenv import load_dotenv
 from google.adk.agents.llm_agent import Agent
 from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models import LlmRequest
 from google.adk.tools.preload_memory_tool import preload_memory_tool
 from google.adk.tools.load_memory_tool import load_memory_tool
 from google.genai import types
@@ -22,8 +27,16 @@ load_dotenv()
 
 
 from .prompts import get_system_instruction
+from .cache import MISSING, TTLCache
+from .schema import SchemaLoader
+from .schema_index import SchemaIndex, document_hash
+from .semantic_cache import genai_embed_fn
 from .tools import (
   bigquery_toolset,
+  cache_query_result,
+  load_query_results,
+  lookup_cached_query_result,
+  save_queries_to_memory,
   save_query_to_memory,
   search_query_history,
   set_user_property,
@@ -35,23 +48,171 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def get_schema_info() -> str:
+# Maximum number of tables rendered into the system instruction
+SCHEMA_MAX_TABLES = int(os.environ.get("SCHEMA_MAX_TABLES", "30"))
+
+schema_loader = SchemaLoader(
+  project_id=os.environ.get("GOOGLE_CLOUD_PROJECT", ""),
+  dataset_id=os.environ["BIGQUERY_DATASET"],
+  cache_path=os.environ.get("SCHEMA_CACHE_PATH"),
+  ttl=float(os.environ.get("SCHEMA_CACHE_TTL_SECONDS", "3600")),
+) if os.environ.get("BIGQUERY_DATASET") else None
+
+# Precomputed table embeddings (see utils/build_schema_index.py). When the
+# index is available, the schema is pruned to the top-k tables per turn by
+# the inject_relevant_schema before-model callback.
+SCHEMA_INDEX_PATH = os.environ.get("SCHEMA_INDEX_PATH") or (
+  os.path.splitext(schema_loader.cache_path)[0] + ".index.npz" if schema_loader else None
+)
+SCHEMA_INDEX_TOP_K = int(os.environ.get("SCHEMA_INDEX_TOP_K", "8"))
+RELEVANT_SCHEMA_PLACEHOLDER = "<RELEVANT_SCHEMA/>"
+
+
+def _load_schema_index() -> Optional[SchemaIndex]:
+  """Loads the schema embedding index of BIGQUERY_DATASET, if one was built."""
+  if schema_loader is None or not os.path.exists(SCHEMA_INDEX_PATH):
+    return None
+  try:
+    index = SchemaIndex.load(SCHEMA_INDEX_PATH)
+  except Exception as e:
+    logger.warning("Failed to load schema index %s: %s", SCHEMA_INDEX_PATH, e)
+    return None
+  if index.dataset != f"{schema_loader.project_id}.{schema_loader.dataset_id}":
+    logger.warning("Ignoring schema index %s built for %s", SCHEMA_INDEX_PATH, index.dataset)
+    return None
+  logger.info("Loaded schema index with %d tables", len(index.tables))
+  return index
+
+
+schema_index = _load_schema_index()
+_schema_index_embed = genai_embed_fn(schema_index.model) if schema_index else None
+# Question embeddings, reused by every model call of a turn
+_question_vectors = TTLCache(maxsize=256, ttl=600)
+# Tables of the loaded schema the index was last found to be out of date for
+_stale_schema_tables: frozenset[str] = frozenset()
+
+
+def _question_text(content: Optional[types.Content]) -> str:
+  """Returns the text of the user message that started the invocation."""
+  if content is None:
+    return ""
+  return " ".join(part.text for part in (content.parts or []) if part.text)
+
+
+def get_schema_info(question: Optional[str] = None) -> str:
   """Retrieve schema information for the configured BigQuery dataset.
 
+  The schema is loaded from INFORMATION_SCHEMA once and cached on disk. For
+  datasets with more than SCHEMA_MAX_TABLES tables, only the tables most
+  relevant to the question are included.
+
+  Args:
+    question: The current user question, if any.
+
   Returns:
     A string containing schema information for the agent's context.
   """
-  # TODO: Implement dynamic schema retrieval from BigQuery
-  # For now, return a placeholder that should be configured
+  if schema_loader is not None:
+    try:
+      return schema_loader.render(
+        schema_loader.select_tables(question or "", SCHEMA_MAX_TABLES)
+      )
+    except Exception as e:
+      logger.warning("Failed to load schema of %s: %s", os.environ.get("BIGQUERY_DATASET"), e)
+
   schema_placeholder = """
 <SCHEMA>
-(Schema information will be loaded dynamically.
-Configure BIGQUERY_DATASET in .env or implement schema retrieval.)
+(Schema information is not available.
+Configure BIGQUERY_DATASET in .env or query INFORMATION_SCHEMA to discover tables.)
 </SCHEMA>
 """
   return schema_placeholder
 
 
+async def build_instruction(readonly_context: ReadonlyContext) -> str:
+  """Builds the system instruction with the schema relevant to the current turn."""
+  if schema_index is not None:
+    schema_info = RELEVANT_SCHEMA_PLACEHOLDER
+  else:
+    question = _question_text(readonly_context.user_content)
+    schema_info = await asyncio.to_thread(get_schema_info, question)
+  return f"""
+ENVIRONMENT CONTEXT:
+
+- Project ID: {os.environ.get("GOOGLE_CLOUD_PROJECT", "")}
+- Dataset ID: {os.environ.get("BIGQUERY_DATASET", "")}
+
+{get_system_instruction()}
+
+### DATABASE SCHEMA
+{schema_info}
+"""
+
+
+def _schema_index_is_current(schema: dict[str, Any]) -> bool:
+  """Returns whether the schema index covers every table as it is described now.
+
+  Tables are compared by the hash of their embedded document (name,
+  description and columns), so data loads do not invalidate the index while
+  added tables or changed columns and descriptions do.
+  """
+  global _stale_schema_tables
+  stale = frozenset(
+    name for name, table in schema["tables"].items()
+    if schema_index.hashes.get(name) != document_hash(name, table)
+  )
+  if stale and stale != _stale_schema_tables:
+    logger.warning(
+      "Schema index %s is out of date for %d table(s) (e.g. %s); falling back "
+      "to keyword selection. Re-run utils/build_schema_index.py.",
+      SCHEMA_INDEX_PATH,
+      len(stale),
+      ", ".join(sorted(stale)[:5]),
+    )
+  _stale_schema_tables = stale
+  return not stale
+
+
+def _relevant_schema_info(question: str) -> str:
+  """Renders the top-k tables of the schema index for a question (blocking)."""
+  if not question:
+    return get_schema_info()
+  try:
+    schema = schema_loader.load()
+    tables = schema["tables"]
+    if not _schema_index_is_current(schema):
+      return get_schema_info(question)
+    vector = _question_vectors.get(question)
+    if vector is MISSING:
+      vector = np.asarray(_schema_index_embed([question])[0], dtype=np.float32)
+      vector /= np.linalg.norm(vector) or 1.0
+      _question_vectors.set(question, vector)
+    names = [
+      name for name in schema_index.top_k(vector, SCHEMA_INDEX_TOP_K)
+      if name in tables
+    ]
+    return schema_loader.render(names)
+  except Exception as e:
+    logger.warning("Schema index lookup failed, falling back to keyword selection: %s", e)
+    return get_schema_info(question)
+
+
+async def inject_relevant_schema(
+  callback_context: CallbackContext,
+  llm_request: LlmRequest,
+) -> None:
+  """Before-model callback injecting the tables most relevant to the question."""
+  instruction = llm_request.config.system_instruction
+  if not isinstance(instruction, str) or RELEVANT_SCHEMA_PLACEHOLDER not in instruction:
+    return None
+  question = _question_text(callback_context.user_content)
+  schema_info = await asyncio.to_thread(_relevant_schema_info, question)
+  llm_request.config.system_instruction = instruction.replace(
+    RELEVANT_SCHEMA_PLACEHOLDER, schema_info
+  )
+  return None
+
+
 async def auto_save_session_to_memory_callback(
   callback_context: CallbackContext,
 ) -> None:
@@ -74,29 +235,23 @@ root_agent = Agent(
   model=os.environ.get("AGENT_MODEL", "gemini-2.5-flash"),
   name="bigquery_data_agent",
   description="A self-learning BigQuery agent that converts natural language to SQL and learns from past queries.",
-  instruction=f"""
-ENVIRONMENT CONTEXT:
-
-- Project ID: {os.environ.get("GOOGLE_CLOUD_PROJECT", "")}
-- Dataset ID: {os.environ.get("BIGQUERY_DATASET", "")}
-
-{get_system_instruction()}
-
-### DATABASE SCHEMA
-{get_schema_info()}
-""",
+  instruction=build_instruction,
   tools=[
     bigquery_toolset,  # ADK BigQueryToolset with execute_sql
     save_query_to_memory,
+    save_queries_to_memory,
     search_query_history,
     set_user_property,
+    load_query_results,
     preload_memory_tool,  # ADK built-in tool for memory preloading
     load_memory_tool,     # ADK built-in tool for selective memory loading
   ],
   # Use these callbacks for detailed logging of system instructions and tool calls
-  # before_model_callback=[log_system_instructions],
-  # after_tool_callback=[log_tool_call, store_query_result_in_state],
-  after_tool_callback=[store_query_result_in_state],
+  # before_model_callback=[inject_relevant_schema, log_system_instructions],
+  before_model_callback=[inject_relevant_schema],
+  # after_tool_callback=[log_tool_call, store_query_result_in_state, cache_query_result],
+  before_tool_callback=[lookup_cached_query_result],
+  after_tool_callback=[store_query_result_in_state, cache_query_result],
   after_agent_callback=[auto_save_session_to_memory_callback],
   generate_content_config=types.GenerateContentConfig(
     temperature=0.01,  # Low temperature for consistent SQL generation
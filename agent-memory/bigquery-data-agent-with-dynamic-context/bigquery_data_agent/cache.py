@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""In-process caches shared by the BigQuery Data Agent tools."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# Sentinel returned by TTLCache.get() on a miss, so that None can be cached
+MISSING = object()
+
+
+class TTLCache:
+  """A small thread-safe LRU cache whose entries expire after a TTL."""
+
+  def __init__(self, maxsize: int = 1024, ttl: float = 600.0):
+    """Initializes a TTLCache.
+
+    Args:
+      maxsize: The maximum number of entries before the least recently used
+        one is evicted.
+      ttl: The default time-to-live of an entry in seconds.
+    """
+    self._maxsize = maxsize
+    self._ttl = ttl
+    self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key: Hashable, default: Any = MISSING) -> Any:
+    """Returns the cached value for key, or default if missing or expired."""
+    with self._lock:
+      item = self._data.get(key)
+      if item is None:
+        return default
+      value, expires_at = item
+      if expires_at <= time.monotonic():
+        del self._data[key]
+        return default
+      self._data.move_to_end(key)
+      return value
+
+  def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+    """Caches value for key, optionally with a custom TTL in seconds."""
+    expires_at = time.monotonic() + (self._ttl if ttl is None else ttl)
+    with self._lock:
+      self._data[key] = (value, expires_at)
+      self._data.move_to_end(key)
+      while len(self._data) > self._maxsize:
+        self._data.popitem(last=False)
+
+  def pop(self, key: Hashable) -> None:
+    """Removes key from the cache if present."""
+    with self._lock:
+      self._data.pop(key, None)
+
+  def clear(self) -> None:
+    """Removes all entries."""
+    with self._lock:
+      self._data.clear()
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._data)
@@ -66,6 +66,8 @@ If you need to query the database, you MUST follow these steps in order:
    "Would you like to save this query to memory for future use? (Scope: User only / Team shared)"
    - Only save if the user explicitly agrees.
    - Use `save_query_to_memory` with the appropriate scope.
+   - When saving several queries at once, use `save_queries_to_memory` with all of them in a single call.
+   - If a save returns status "duplicate", tell the user the query is already saved under the returned title.
 
 ––––––––––––––––––––
 GLOBAL RULES
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Exact-match cache of execute_sql results keyed by normalized SQL."""
+
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from google.cloud import bigquery
+
+from .cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Whitespace and comments outside of string literals and quoted identifiers
+_SQL_TOKEN_RE = re.compile(
+  r"""(?P<literal>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)"""
+  r"""|(?P<gap>(?:\s+|--[^\n]*|#[^\n]*|/\*.*?\*/)+)""",
+  re.DOTALL,
+)
+
+# Queries whose result may change without any table being modified.
+# BigQuery does not cache the results of these queries either.
+_NONDETERMINISTIC_RE = re.compile(
+  r"\b(?:current_(?:date|datetime|time|timestamp)|now|rand|generate_uuid|"
+  r"session_user)\s*\(",
+  re.IGNORECASE,
+)
+
+
+def normalize_sql(sql: str) -> str:
+  """Normalizes a SQL query for use as a cache key.
+
+  Comments are removed and whitespace runs are collapsed, except inside
+  string literals and quoted identifiers. Trailing semicolons are dropped.
+  Case is preserved, since BigQuery table names are case-sensitive.
+
+  Args:
+    sql: The SQL query string.
+
+  Returns:
+    The normalized SQL query.
+  """
+  normalized = _SQL_TOKEN_RE.sub(lambda m: m.group("literal") or " ", sql)
+  return normalized.strip().rstrip(";").strip()
+
+
+class QueryResultCache:
+  """An in-process cache of successful execute_sql results.
+
+  Entries are keyed by project, dataset and normalized SQL text, kept in an
+  LRU of at most `maxsize` entries and expire after `ttl` seconds. Before a
+  cached result is served, the tables the query reads (resolved once with a
+  free dry run) are checked: if any of them was modified since the query ran,
+  is a view or external table, or has a streaming buffer, the entry is
+  dropped and the query runs again.
+  """
+
+  def __init__(
+    self,
+    maxsize: int = 256,
+    ttl: float = 900.0,
+    clock_skew_seconds: float = 5.0,
+  ):
+    """Initializes a QueryResultCache.
+
+    Args:
+      maxsize: The maximum number of cached query results.
+      ttl: The time-to-live of a cached result in seconds.
+      clock_skew_seconds: Safety margin when comparing the local query start
+        time with the last-modified time reported by BigQuery.
+    """
+    self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+    self._clock_skew = timedelta(seconds=clock_skew_seconds)
+    self._clients: dict[str, bigquery.Client] = {}
+    self._clients_lock = threading.Lock()
+
+  def _client(self, project_id: str) -> bigquery.Client:
+    with self._clients_lock:
+      client = self._clients.get(project_id)
+      if client is None:
+        client = bigquery.Client(project=project_id)
+        self._clients[project_id] = client
+      return client
+
+  @staticmethod
+  def make_key(project_id: str, dataset_id: str, sql: str) -> Optional[tuple]:
+    """Returns the cache key of a query, or None if it must not be cached."""
+    normalized = normalize_sql(sql)
+    if not normalized or not re.match(r"(?i)(select|with)\b", normalized):
+      return None
+    if _NONDETERMINISTIC_RE.search(_SQL_TOKEN_RE.sub(" ", normalized)):
+      return None
+    return (project_id, dataset_id, normalized)
+
+  def _referenced_tables(self, project_id: str, sql: str) -> list[Any]:
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    job = self._client(project_id).query(sql, job_config=job_config)
+    return list(job.referenced_tables)
+
+  def _is_fresh(self, project_id: str, tables: list[Any], started_at: datetime) -> bool:
+    client = self._client(project_id)
+    for ref in tables:
+      table = client.get_table(ref)
+      if table.table_type != "TABLE" or table.streaming_buffer is not None:
+        return False
+      if table.modified is None or table.modified >= started_at - self._clock_skew:
+        return False
+    return True
+
+  def get(self, key: tuple) -> Optional[dict[str, Any]]:
+    """Returns a cached result that is still valid, or None (blocking).
+
+    Args:
+      key: A key returned by make_key().
+
+    Returns:
+      A copy of the cached tool response, or None on a miss.
+    """
+    entry = self._entries.get(key)
+    if entry is MISSING:
+      return None
+
+    project_id, _, sql = key
+    try:
+      if entry["tables"] is None:
+        entry["tables"] = self._referenced_tables(project_id, sql)
+      if not entry["tables"] or not self._is_fresh(
+        project_id, entry["tables"], entry["started_at"]
+      ):
+        self._entries.pop(key)
+        return None
+    except Exception as e:
+      logger.debug("Failed to validate cached query result: %s", e)
+      self._entries.pop(key)
+      return None
+
+    return dict(entry["response"])
+
+  def put(self, key: tuple, response: dict[str, Any], started_at: datetime) -> None:
+    """Caches the response of a query that started at `started_at` (UTC)."""
+    self._entries.set(
+      key,
+      {"response": dict(response), "started_at": started_at, "tables": None},
+    )
+
+  def clear(self) -> None:
+    """Removes all cached results."""
+    self._entries.clear()
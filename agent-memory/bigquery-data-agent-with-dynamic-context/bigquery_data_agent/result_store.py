@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Columnar storage of full query results outside of the session state."""
+
+import io
+import os
+import tempfile
+from typing import Any, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PARQUET_MIME_TYPE = "application/vnd.apache.parquet"
+
+# Rows read at a time when streaming a stored result back
+_READ_BATCH_ROWS = 1024
+
+
+def _type_name(value: Any) -> str:
+  if isinstance(value, bool):
+    return "BOOLEAN"
+  if isinstance(value, int):
+    return "INTEGER"
+  if isinstance(value, float):
+    return "FLOAT"
+  if isinstance(value, (list, tuple)):
+    return "ARRAY"
+  if isinstance(value, dict):
+    return "STRUCT"
+  return "STRING"
+
+
+def infer_schema(rows: list[dict[str, Any]]) -> list[dict[str, str]]:
+  """Infers column names and types from JSON-serializable result rows.
+
+  Args:
+    rows: The rows returned by execute_sql.
+
+  Returns:
+    A list of {'name', 'type'} dicts, in column order.
+  """
+  if not rows:
+    return []
+  schema = []
+  for name in rows[0]:
+    value = next((row.get(name) for row in rows if row.get(name) is not None), None)
+    schema.append({"name": name, "type": _type_name(value) if value is not None else "NULL"})
+  return schema
+
+
+def rows_to_parquet(rows: list[dict[str, Any]]) -> bytes:
+  """Serializes result rows to Parquet bytes.
+
+  Columns whose values do not share a single Arrow type are stored as strings.
+  """
+  names = list(rows[0]) if rows else []
+  columns = []
+  for name in names:
+    values = [row.get(name) for row in rows]
+    try:
+      columns.append(pa.array(values))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+      columns.append(pa.array([None if v is None else str(v) for v in values]))
+  table = pa.table(columns, names=names)
+  sink = io.BytesIO()
+  pq.write_table(table, sink, compression="zstd")
+  return sink.getvalue()
+
+
+def read_parquet_rows(
+  source: Union[bytes, str],
+  offset: int = 0,
+  limit: int = 100,
+) -> list[dict[str, Any]]:
+  """Reads a window of rows from Parquet bytes or a Parquet file path.
+
+  Only the record batches overlapping [offset, offset + limit) are decoded.
+
+  Args:
+    source: Parquet bytes or the path of a Parquet file.
+    offset: The index of the first row to return.
+    limit: The maximum number of rows to return.
+
+  Returns:
+    The rows as a list of dicts.
+  """
+  if isinstance(source, bytes):
+    source = pa.BufferReader(source)
+  parquet_file = pq.ParquetFile(source)
+
+  rows: list[dict[str, Any]] = []
+  position = 0
+  for batch in parquet_file.iter_batches(batch_size=_READ_BATCH_ROWS):
+    if position + batch.num_rows <= offset:
+      position += batch.num_rows
+      continue
+    start = max(0, offset - position)
+    rows.extend(batch.slice(start, limit - len(rows)).to_pylist())
+    position += batch.num_rows
+    if len(rows) >= limit:
+      break
+  return rows
+
+
+class LocalResultStore:
+  """Stores Parquet results in a local directory, one file per session.
+
+  Used when the runner has no artifact service configured.
+  """
+
+  def __init__(self, directory: str | None = None):
+    """Initializes a LocalResultStore.
+
+    Args:
+      directory: The directory for result files. Defaults to a directory
+        under the system temp directory.
+    """
+    self.directory = directory or os.path.join(
+      tempfile.gettempdir(), "bigquery_data_agent_results"
+    )
+
+  def save(self, name: str, data: bytes) -> str:
+    """Atomically writes a result file and returns its path."""
+    os.makedirs(self.directory, exist_ok=True)
+    path = os.path.join(self.directory, f"{name}.parquet")
+    fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+    try:
+      with os.fdopen(fd, "wb") as f:
+        f.write(data)
+      os.replace(tmp_path, path)
+    except BaseException:
+      os.unlink(tmp_path)
+      raise
+    return path
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Cached BigQuery dataset schema for the agent's system instruction."""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+# Columns (with descriptions) and table descriptions of a dataset in one query
+_COLUMNS_QUERY = """
+SELECT
+  c.table_name,
+  c.column_name,
+  c.data_type,
+  p.description AS column_description,
+  t.option_value AS table_description
+FROM `{dataset}.INFORMATION_SCHEMA.COLUMNS` AS c
+LEFT JOIN `{dataset}.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS` AS p
+  ON p.table_name = c.table_name AND p.field_path = c.column_name
+LEFT JOIN `{dataset}.INFORMATION_SCHEMA.TABLE_OPTIONS` AS t
+  ON t.table_name = c.table_name AND t.option_name = 'description'
+ORDER BY c.table_name, c.ordinal_position
+"""
+
+# Last-modified time (ms since epoch) of every table, used as an ETag
+_TABLES_QUERY = "SELECT table_id, last_modified_time FROM `{dataset}.__TABLES__`"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> set[str]:
+  """Returns the lowercase words of a text, splitting snake_case names."""
+  return set(_WORD_RE.findall(text.lower().replace("_", " ")))
+
+
+class SchemaLoader:
+  """Loads a dataset schema from INFORMATION_SCHEMA and caches it on disk.
+
+  The schema is fetched once and kept in memory and in a local JSON file.
+  After `ttl` seconds the table last-modified times are compared with the
+  ones stored alongside the schema; the columns are only fetched again when
+  a table was added, dropped or modified.
+  """
+
+  def __init__(
+    self,
+    project_id: str,
+    dataset_id: str,
+    cache_path: Optional[str] = None,
+    ttl: float = 3600.0,
+  ):
+    """Initializes a SchemaLoader.
+
+    Args:
+      project_id: The project of the dataset (and of the metadata queries).
+      dataset_id: The dataset to describe.
+      cache_path: The local JSON file caching the schema.
+      ttl: How long the cached schema is used without revalidation, in seconds.
+    """
+    self.project_id = project_id
+    self.dataset_id = dataset_id
+    self.cache_path = cache_path or os.path.join(
+      os.path.dirname(os.path.abspath(__file__)),
+      ".schema_cache",
+      f"{project_id}.{dataset_id}.json",
+    )
+    self.ttl = ttl
+    self.retry_interval = 60.0
+    self._retry_at = 0.0
+    self._schema: Optional[dict[str, Any]] = None
+    self._client: Optional[bigquery.Client] = None
+    self._lock = threading.Lock()
+
+  @property
+  def _dataset(self) -> str:
+    return f"{self.project_id}.{self.dataset_id}"
+
+  def _query(self, sql: str) -> list[Any]:
+    if self._client is None:
+      self._client = bigquery.Client(project=self.project_id)
+    return list(self._client.query_and_wait(sql.format(dataset=self._dataset)))
+
+  def _fetch_versions(self) -> dict[str, int]:
+    return {
+      row["table_id"]: int(row["last_modified_time"])
+      for row in self._query(_TABLES_QUERY)
+    }
+
+  def _fetch_tables(self) -> dict[str, dict[str, Any]]:
+    tables: dict[str, dict[str, Any]] = {}
+    for row in self._query(_COLUMNS_QUERY):
+      table = tables.get(row["table_name"])
+      if table is None:
+        description = row["table_description"]
+        table = tables[row["table_name"]] = {
+          # Option values are stored as SQL string literals, e.g. '"Orders"'
+          "description": json.loads(description) if description else "",
+          "columns": [],
+        }
+      table["columns"].append({
+        "name": row["column_name"],
+        "type": row["data_type"],
+        "description": row["column_description"] or "",
+      })
+    return tables
+
+  def _read_cache_file(self) -> Optional[dict[str, Any]]:
+    try:
+      with open(self.cache_path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    except FileNotFoundError:
+      return None
+    except (OSError, ValueError) as e:
+      logger.warning("Ignoring unreadable schema cache %s: %s", self.cache_path, e)
+      return None
+    return schema if schema.get("dataset") == self._dataset else None
+
+  def _write_cache_file(self, schema: dict[str, Any]) -> None:
+    directory = os.path.dirname(self.cache_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+      with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(schema, f)
+      os.replace(tmp_path, self.cache_path)
+    except BaseException:
+      os.unlink(tmp_path)
+      raise
+
+  def load(self, force: bool = False) -> dict[str, Any]:
+    """Returns the dataset schema, refreshing it if needed (blocking).
+
+    Args:
+      force: Ignore the TTL and revalidate against BigQuery.
+
+    Returns:
+      A dict with 'dataset', 'fetched_at', 'versions' (table -> last-modified
+      time) and 'tables' (table -> {'description', 'columns'}).
+    """
+    with self._lock:
+      if self._schema is None:
+        self._schema = self._read_cache_file()
+
+      schema = self._schema
+      if schema is not None and not force and time.time() - schema["fetched_at"] < self.ttl:
+        return schema
+
+      if schema is None and time.time() < self._retry_at:
+        raise RuntimeError(f"Schema of {self._dataset} is unavailable, retrying later.")
+
+      try:
+        versions = self._fetch_versions()
+        if schema is not None and versions == schema["versions"]:
+          logger.info("Schema of %s is unchanged", self._dataset)
+        else:
+          logger.info("Loading schema of %s from INFORMATION_SCHEMA", self._dataset)
+          schema = {"dataset": self._dataset, "versions": versions, "tables": self._fetch_tables()}
+        schema["fetched_at"] = time.time()
+      except Exception:
+        self._retry_at = time.time() + self.retry_interval
+        if schema is None:
+          raise
+        logger.warning("Failed to revalidate schema of %s, using cached copy", self._dataset, exc_info=True)
+        return schema
+
+      self._schema = schema
+      try:
+        self._write_cache_file(schema)
+      except OSError as e:
+        logger.warning("Failed to write schema cache %s: %s", self.cache_path, e)
+      return schema
+
+  def select_tables(self, question: str, max_tables: int) -> list[str]:
+    """Returns the names of the tables most relevant to a question.
+
+    Tables are scored by the words they share with the question: matches in
+    the table name and description count more than matches in column names
+    and descriptions. Ties keep the alphabetical order.
+    """
+    tables = self.load()["tables"]
+    if len(tables) <= max_tables:
+      return list(tables)
+
+    question_words = _words(question)
+    scores = {}
+    for name, table in tables.items():
+      table_words = _words(f"{name} {table['description']}")
+      column_words = set()
+      for column in table["columns"]:
+        column_words |= _words(f"{column['name']} {column['description']}")
+      scores[name] = 3 * len(question_words & table_words) + len(question_words & column_words)
+    return sorted(tables, key=lambda name: -scores[name])[:max_tables]
+
+  def render(self, table_names: Optional[list[str]] = None) -> str:
+    """Renders a compact schema description.
+
+    Args:
+      table_names: The tables to include. Defaults to all tables.
+
+    Returns:
+      One block per table: the table name and description, followed by a
+      single line of 'column TYPE' pairs (column descriptions in brackets).
+    """
+    schema = self.load()
+    tables = schema["tables"]
+    lines = [f"<SCHEMA dataset=\"{schema['dataset']}\">"]
+    for name in table_names if table_names is not None else tables:
+      table = tables[name]
+      lines.append(f"{name} -- {table['description']}" if table["description"] else name)
+      lines.append("  " + ", ".join(
+        f"{c['name']} {c['type']}" + (f" [{c['description']}]" if c["description"] else "")
+        for c in table["columns"]
+      ))
+    if table_names is not None and len(table_names) < len(tables):
+      omitted = len(tables) - len(table_names)
+      lines.append(f"({omitted} less relevant tables omitted; query INFORMATION_SCHEMA for them if needed)")
+    lines.append("</SCHEMA>")
+    return "\n".join(lines)
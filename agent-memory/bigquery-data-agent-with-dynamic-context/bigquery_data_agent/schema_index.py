@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Embedding index over table and column descriptions of a dataset."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def table_document(name: str, table: dict[str, Any]) -> str:
+  """Returns the text embedded for a table: its name, description and columns."""
+  columns = "; ".join(
+    f"{c['name']} ({c['description']})" if c["description"] else c["name"]
+    for c in table["columns"]
+  )
+  description = f" {table['description']}" if table["description"] else ""
+  return f"Table {name}.{description} Columns: {columns}"
+
+
+def document_hash(name: str, table: dict[str, Any]) -> str:
+  """Returns a hash of the embedded table document, used to detect schema changes."""
+  return hashlib.sha256(table_document(name, table).encode("utf-8")).hexdigest()[:16]
+
+
+class SchemaIndex:
+  """A matrix of L2-normalized table embeddings, built offline and loaded from disk.
+
+  One row per table of the dataset schema (see SchemaLoader). At serving
+  time only the question is embedded, and the most similar tables are found
+  with a single matrix-vector product.
+  """
+
+  def __init__(
+    self,
+    dataset: str,
+    model: str,
+    tables: list[str],
+    vectors: np.ndarray,
+    hashes: Optional[dict[str, str]] = None,
+  ):
+    """Initializes a SchemaIndex.
+
+    Args:
+      dataset: The 'project.dataset' the index describes.
+      model: The embedding model used for the table documents.
+      tables: The table names, one per row of `vectors`.
+      vectors: The L2-normalized table embeddings.
+      hashes: The document_hash() of each table when the index was built.
+    """
+    self.dataset = dataset
+    self.model = model
+    self.tables = tables
+    self.vectors = vectors.astype(np.float32, copy=False)
+    self.hashes = hashes or {}
+
+  @classmethod
+  def build(
+    cls,
+    schema: dict[str, Any],
+    embed_fn: Callable[[Sequence[str]], list[list[float]]],
+    model: str,
+    batch_size: int = 64,
+  ) -> "SchemaIndex":
+    """Embeds every table of a schema returned by SchemaLoader.load().
+
+    Args:
+      schema: The dataset schema.
+      embed_fn: A blocking function returning one embedding per input text.
+      model: The name of the embedding model behind `embed_fn`.
+      batch_size: The number of tables embedded per request.
+
+    Returns:
+      The new index.
+    """
+    names = list(schema["tables"])
+    documents = [table_document(name, schema["tables"][name]) for name in names]
+    embeddings: list[list[float]] = []
+    for start in range(0, len(documents), batch_size):
+      embeddings.extend(embed_fn(documents[start:start + batch_size]))
+      logger.info("Embedded %d/%d tables", len(embeddings), len(documents))
+
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(names), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms > 0, norms, 1.0)
+    hashes = {name: document_hash(name, schema["tables"][name]) for name in names}
+    return cls(schema["dataset"], model, names, vectors, hashes)
+
+  def save(self, path: str) -> None:
+    """Atomically writes the index to a .npz file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    meta = {"dataset": self.dataset, "model": self.model, "tables": self.tables, "hashes": self.hashes}
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npz")
+    try:
+      with os.fdopen(fd, "wb") as f:
+        np.savez(f, vectors=self.vectors, meta=np.array(json.dumps(meta)))
+      os.replace(tmp_path, path)
+    except BaseException:
+      os.unlink(tmp_path)
+      raise
+
+  @classmethod
+  def load(cls, path: str) -> "SchemaIndex":
+    """Reads an index written by save()."""
+    with np.load(path, allow_pickle=False) as data:
+      meta = json.loads(str(data["meta"]))
+      return cls(meta["dataset"], meta["model"], meta["tables"], data["vectors"], meta.get("hashes"))
+
+  def top_k(self, vector: np.ndarray, k: int) -> list[str]:
+    """Returns the k tables most similar to an L2-normalized query vector."""
+    if not self.tables:
+      return []
+    scores = self.vectors @ vector.astype(np.float32, copy=False)
+    k = min(k, len(self.tables))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return [self.tables[i] for i in top[np.argsort(-scores[top])]]
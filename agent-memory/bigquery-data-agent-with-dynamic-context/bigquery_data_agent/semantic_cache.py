@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Local semantic cache of SQL memories in front of the Memory Bank."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+from google import genai
+
+
+def _normalize_text(text: str) -> str:
+  return " ".join(text.split()).lower()
+
+
+class _ScopeIndex:
+  """A fixed-capacity NumPy matrix of question embeddings with LRU eviction."""
+
+  def __init__(self, capacity: int):
+    self.capacity = capacity
+    self.matrix: Optional[np.ndarray] = None
+    self.expires_at = np.zeros(capacity, dtype=np.float64)
+    self.valid = np.zeros(capacity, dtype=bool)
+    self.payloads: list[Any] = [None] * capacity
+    self.slot_keys: list[Optional[str]] = [None] * capacity
+    # Normalized question -> slot, in least-recently-used order
+    self.slots: OrderedDict[str, int] = OrderedDict()
+    self.free_slots = list(range(capacity - 1, -1, -1))
+
+  def put(self, key: str, vector: np.ndarray, payload: Any, expires_at: float) -> None:
+    if self.matrix is None:
+      self.matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+
+    if key in self.slots:
+      slot = self.slots[key]
+      self.slots.move_to_end(key)
+    else:
+      if self.free_slots:
+        slot = self.free_slots.pop()
+      else:
+        _, slot = self.slots.popitem(last=False)
+      self.slots[key] = slot
+
+    self.matrix[slot] = vector
+    self.valid[slot] = True
+    self.expires_at[slot] = expires_at
+    self.payloads[slot] = payload
+    self.slot_keys[slot] = key
+
+  def _evict(self, slot: int) -> None:
+    key = self.slot_keys[slot]
+    self.slots.pop(key, None)
+    self.valid[slot] = False
+    self.payloads[slot] = None
+    self.slot_keys[slot] = None
+    self.free_slots.append(slot)
+
+  def get_exact(self, key: str, now: float) -> Any:
+    slot = self.slots.get(key)
+    if slot is None:
+      return None
+    if self.expires_at[slot] <= now:
+      self._evict(slot)
+      return None
+    self.slots.move_to_end(key)
+    return self.payloads[slot]
+
+  def search(self, vector: np.ndarray, threshold: float, now: float) -> Any:
+    if self.matrix is None or not self.slots:
+      return None
+    live = self.valid & (self.expires_at > now)
+    if not live.any():
+      return None
+    # Rows and query are L2-normalized, so the dot product is the cosine similarity
+    scores = self.matrix @ vector
+    scores[~live] = -np.inf
+    slot = int(np.argmax(scores))
+    if scores[slot] < threshold:
+      return None
+    self.slots.move_to_end(self.slot_keys[slot])
+    return self.payloads[slot]
+
+
+class SemanticQueryCache:
+  """An in-process vector cache of SQL memory search results.
+
+  Entries are kept per scope key (e.g. '<app_name>/user:<user_id>') as rows
+  of a NumPy matrix of L2-normalized question embeddings. A question is
+  answered locally when it matches a cached question exactly, or when the
+  cosine similarity to a cached question reaches `similarity_threshold`.
+  Each scope keeps at most `capacity_per_scope` entries (LRU), and entries
+  expire after `ttl` seconds.
+  """
+
+  def __init__(
+    self,
+    embed_fn: Callable[[Sequence[str]], list[list[float]]],
+    capacity_per_scope: int = 256,
+    similarity_threshold: float = 0.92,
+    ttl: float = 3600.0,
+    max_scopes: int = 1024,
+  ):
+    """Initializes a SemanticQueryCache.
+
+    Args:
+      embed_fn: A blocking function returning one embedding per input text.
+      capacity_per_scope: The maximum number of cached questions per scope.
+      similarity_threshold: The minimum cosine similarity for a semantic hit.
+      ttl: The time-to-live of a cached entry in seconds.
+      max_scopes: The maximum number of scopes kept in memory (LRU).
+    """
+    self._embed_fn = embed_fn
+    self._capacity = capacity_per_scope
+    self._threshold = similarity_threshold
+    self._ttl = ttl
+    self._max_scopes = max_scopes
+    self._scopes: OrderedDict[str, _ScopeIndex] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def embed(self, text: str) -> np.ndarray:
+    """Returns the L2-normalized embedding of a question (blocking)."""
+    vector = np.asarray(self._embed_fn([text])[0], dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+  def _scope(self, scope_key: str, create: bool = False) -> Optional[_ScopeIndex]:
+    index = self._scopes.get(scope_key)
+    if index is None and create:
+      index = _ScopeIndex(self._capacity)
+      self._scopes[scope_key] = index
+      while len(self._scopes) > self._max_scopes:
+        self._scopes.popitem(last=False)
+    if index is not None:
+      self._scopes.move_to_end(scope_key)
+    return index
+
+  def get(
+    self,
+    scope_key: str,
+    nl_query: str,
+    vector: Optional[np.ndarray] = None,
+  ) -> Optional[list[dict[str, Any]]]:
+    """Returns cached matches for a question, or None on a miss.
+
+    Without a vector only exact (normalized) question matches are found.
+    """
+    now = time.monotonic()
+    with self._lock:
+      index = self._scope(scope_key)
+      if index is None:
+        return None
+      payload = index.get_exact(_normalize_text(nl_query), now)
+      if payload is None and vector is not None:
+        payload = index.search(vector, self._threshold, now)
+    return [dict(m) for m in payload] if payload is not None else None
+
+  def has_entries(self, scope_key: str) -> bool:
+    """Returns whether a scope has any cached question that could match."""
+    now = time.monotonic()
+    with self._lock:
+      index = self._scopes.get(scope_key)
+      return index is not None and bool((index.valid & (index.expires_at > now)).any())
+
+  def put(
+    self,
+    scope_key: str,
+    nl_query: str,
+    vector: np.ndarray,
+    matches: list[dict[str, Any]],
+  ) -> None:
+    """Caches the matches of a question in a scope."""
+    expires_at = time.monotonic() + self._ttl
+    with self._lock:
+      index = self._scope(scope_key, create=True)
+      index.put(
+        _normalize_text(nl_query),
+        vector,
+        [dict(m) for m in matches],
+        expires_at,
+      )
+
+  def invalidate(self, scope_key: str) -> None:
+    """Drops all cached entries of a scope (e.g. after a new save)."""
+    with self._lock:
+      self._scopes.pop(scope_key, None)
+
+
+def genai_embed_fn(model: str) -> Callable[[Sequence[str]], list[list[float]]]:
+  """Returns an embedding function backed by the Google Gen AI SDK."""
+  client_holder: dict[str, genai.Client] = {}
+
+  def embed(texts: Sequence[str]) -> list[list[float]]:
+    client = client_holder.get("client")
+    if client is None:
+      client = client_holder.setdefault("client", genai.Client())
+    response = client.models.embed_content(model=model, contents=list(texts))
+    return [embedding.values for embedding in response.embeddings]
+
+  return embed
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Canonical form and fingerprint of SQL queries, used to deduplicate memories."""
+
+import hashlib
+import re
+
+_TOKEN_RE = re.compile(
+  r"""
+    (?P<gap>\s+|--[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>[rRbB]{0,2}(?:'''.*?'''|\"\"\".*?\"\"\"|'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"))
+  | (?P<quoted>`[^`]*`)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<other>.)
+  """,
+  re.VERBOSE | re.DOTALL,
+)
+
+# A parenthesized list of placeholders, e.g. the values of an IN list
+_PLACEHOLDER_LIST_RE = re.compile(r"\( \?(?: , \?)* \)")
+
+# Words that can follow a table reference but are not an implicit alias
+_CLAUSE_KEYWORDS = frozenset({
+  "as", "cross", "except", "for", "from", "full", "group", "having", "inner",
+  "intersect", "join", "left", "limit", "natural", "on", "order", "qualify",
+  "right", "select", "tablesample", "union", "using", "where", "window", "with",
+})
+
+
+def _tokenize(sql: str) -> list[tuple[str, str]]:
+  """Returns (kind, text) tokens: lowercased words, '?' literals and symbols."""
+  tokens = []
+  for match in _TOKEN_RE.finditer(sql):
+    kind = match.lastgroup
+    if kind == "gap":
+      continue
+    if kind in ("string", "number"):
+      tokens.append(("literal", "?"))
+    elif kind == "quoted":
+      # `project.dataset.table` and project.dataset.table are the same name
+      for i, part in enumerate(match.group()[1:-1].lower().split(".")):
+        if i:
+          tokens.append(("other", "."))
+        tokens.append(("word", part))
+    else:
+      tokens.append((kind, match.group().lower()))
+  return tokens
+
+
+def _matching_parens(tokens: list[tuple[str, str]]) -> dict[int, int]:
+  """Maps the position of each '(' to the position of its ')'."""
+  matches, stack = {}, []
+  for i, (_, text) in enumerate(tokens):
+    if text == "(":
+      stack.append(i)
+    elif text == ")" and stack:
+      matches[stack.pop()] = i
+  return matches
+
+
+def _find_aliases(tokens: list[tuple[str, str]]) -> tuple[list[str], set[str], set[int], set[int], set[int]]:
+  """Returns the table aliases and CTE names a query defines.
+
+  Table aliases follow a table name, subquery or UNNEST in FROM or JOIN
+  (with or without AS); CTE names come before 'AS (' in a WITH clause.
+  Column aliases are not returned: a bare identifier can't be told apart
+  from a column of the same name, so they are never renamed.
+
+  Returns:
+    (names, ctes, definitions, table_positions, table_refs): the alias and
+    CTE names in order of definition, the CTE names, the token positions of
+    the definitions, the token positions of dotted table names in FROM and
+    JOIN, which must not be renamed, and the token positions of undotted
+    table names in FROM and JOIN, which may read a CTE.
+  """
+  names: list[str] = []
+  ctes: set[str] = set()
+  definitions: set[int] = set()
+  table_positions: set[int] = set()
+  table_refs: set[int] = set()
+  parens = _matching_parens(tokens)
+  n = len(tokens)
+
+  def define(i: int) -> None:
+    names.append(tokens[i][1])
+    definitions.add(i)
+
+  for i, (kind, text) in enumerate(tokens):
+    if (
+      text == "as" and 1 < i < n - 1 and tokens[i + 1][1] == "("
+      and tokens[i - 1][0] == "word" and tokens[i - 2][1] in ("with", "recursive", ",")
+    ):
+      define(i - 1)
+      ctes.add(tokens[i - 1][1])
+    elif kind == "word" and text in ("from", "join"):
+      # A FROM clause may list several comma-separated table references
+      j = i + 1
+      while j < n:
+        if tokens[j][1] == "unnest" and j + 1 < n and tokens[j + 1][1] == "(":
+          j = parens.get(j + 1, n - 1) + 1
+        elif tokens[j][1] == "(":
+          j = parens.get(j, n - 1) + 1
+        elif tokens[j][0] == "word":
+          start = j
+          j += 1
+          while j + 1 < n and tokens[j][1] == "." and tokens[j + 1][0] == "word":
+            j += 2
+          if j > start + 1:
+            table_positions.update(range(start, j))
+          else:
+            table_refs.add(start)
+        else:
+          break
+        if j < n and tokens[j][1] == "as":
+          j += 1
+        if j < n and tokens[j][0] == "word" and tokens[j][1] not in _CLAUSE_KEYWORDS:
+          define(j)
+          j += 1
+        if not (text == "from" and j < n and tokens[j][1] == ","):
+          break
+        j += 1
+  return list(dict.fromkeys(names)), ctes, definitions, table_positions, table_refs
+
+
+def _drops_as(tokens: list[tuple[str, str]], i: int, cast_depth: list[bool]) -> bool:
+  """Whether the AS at position i is optional, i.e. it introduces an alias."""
+  return (
+    not (cast_depth and cast_depth[-1])
+    and i + 1 < len(tokens)
+    and tokens[i + 1][0] == "word"
+  )
+
+
+def canonicalize_sql(sql: str) -> str:
+  """Returns a canonical form of a query for duplicate detection.
+
+  Comments are dropped, whitespace is normalized, keywords and identifiers
+  are lowercased (quoted identifiers are unquoted), and string and numeric
+  literals become '?' placeholders. Lists of literals collapse to '(?)',
+  the optional AS before an alias is dropped, and a trailing semicolon is
+  ignored. Table aliases and CTE names are renamed to _a1, _a2, ... in order
+  of definition, but only where they are defined, where they qualify a name
+  (t.col) and where a CTE is read in FROM or JOIN; a bare identifier that
+  happens to share an alias's name is kept. The result is not meant to be
+  executed.
+
+  Args:
+    sql: The SQL query string.
+
+  Returns:
+    The canonical query, with tokens separated by single spaces.
+  """
+  tokens = _tokenize(sql)
+  while tokens and tokens[-1][1] == ";":
+    tokens.pop()
+
+  names, ctes, definitions, table_positions, table_refs = _find_aliases(tokens)
+  renames = {name: f"_a{i}" for i, name in enumerate(names, 1)}
+  words = []
+  cast_depth: list[bool] = []
+  for i, (kind, text) in enumerate(tokens):
+    if text == "(":
+      cast_depth.append(i > 0 and tokens[i - 1][1] in ("cast", "safe_cast"))
+    elif text == ")" and cast_depth:
+      cast_depth.pop()
+
+    if kind != "word" or text not in renames or i in table_positions or (i > 0 and tokens[i - 1][1] == "."):
+      if text == "as" and _drops_as(tokens, i, cast_depth):
+        continue
+      words.append(text)
+    elif (
+      i in definitions
+      or (i + 1 < len(tokens) and tokens[i + 1][1] == ".")
+      or (text in ctes and i in table_refs)
+    ):
+      words.append(renames[text])
+    else:
+      words.append(text)
+  canonical = " ".join(words)
+  return _PLACEHOLDER_LIST_RE.sub("(?)", canonical)
+
+
+def sql_fingerprint(sql: str) -> str:
+  """Returns a short stable hash of the canonical form of a query."""
+  return hashlib.sha256(canonicalize_sql(sql).encode("utf-8")).hexdigest()[:16]
@@ -4,23 +4,106 @@
 
 """Tools for BigQuery Data Agent with Agent Engine Memory Bank."""
 
+import asyncio
 import logging
 import os
 import re
+import threading
 import traceback
-from datetime import datetime
-from typing import Any, Literal, Optional
+from datetime import datetime, timezone
+from typing import Any, Callable, Literal, Optional
 
+import numpy as np
 from dotenv import load_dotenv
 from google.adk.tools import BaseTool, ToolContext
 from google.adk.tools.bigquery import BigQueryToolset
 from google.adk.tools.bigquery.config import BigQueryToolConfig, WriteMode
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from .cache import MISSING, TTLCache
+from .result_cache import QueryResultCache
+from .result_store import (
+  PARQUET_MIME_TYPE,
+  LocalResultStore,
+  infer_schema,
+  read_parquet_rows,
+  rows_to_parquet,
+)
+from .semantic_cache import SemanticQueryCache, genai_embed_fn
+from .sql_fingerprint import canonicalize_sql, sql_fingerprint
 
 # Load .env file (auto-discovers from current directory or parents)
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of past queries returned by search_query_history
+MAX_HISTORY_MATCHES = 5
+
+# How long a resolved (or missing) team_id is trusted before re-reading memory
+TEAM_ID_CACHE_TTL_SECONDS = float(os.environ.get("TEAM_ID_CACHE_TTL_SECONDS", "600"))
+TEAM_ID_NEGATIVE_CACHE_TTL_SECONDS = float(
+  os.environ.get("TEAM_ID_NEGATIVE_CACHE_TTL_SECONDS", "60")
+)
+
+# Local semantic cache of SQL memories in front of the Memory Bank
+SQL_MEMORY_CACHE_ENABLED = os.environ.get("SQL_MEMORY_CACHE_ENABLED", "true").lower() == "true"
+sql_memory_cache = SemanticQueryCache(
+  embed_fn=genai_embed_fn(
+    os.environ.get("SQL_MEMORY_CACHE_EMBEDDING_MODEL", "text-embedding-005")
+  ),
+  capacity_per_scope=int(os.environ.get("SQL_MEMORY_CACHE_MAX_ENTRIES", "256")),
+  similarity_threshold=float(
+    os.environ.get("SQL_MEMORY_CACHE_SIMILARITY_THRESHOLD", "0.92")
+  ),
+  ttl=float(os.environ.get("SQL_MEMORY_CACHE_TTL_SECONDS", "3600")),
+) if SQL_MEMORY_CACHE_ENABLED else None
+
+# Exact-match cache of execute_sql results, validated against table
+# last-modified times before a cached result is served
+QUERY_RESULT_CACHE_ENABLED = os.environ.get("QUERY_RESULT_CACHE_ENABLED", "true").lower() == "true"
+query_result_cache = QueryResultCache(
+  maxsize=int(os.environ.get("QUERY_RESULT_CACHE_MAX_ENTRIES", "256")),
+  ttl=float(os.environ.get("QUERY_RESULT_CACHE_TTL_SECONDS", "900")),
+) if QUERY_RESULT_CACHE_ENABLED else None
+
+# Cache keys and start times of execute_sql calls that missed the result
+# cache, keyed by function call id until their after-tool callback runs
+_pending_query_results = TTLCache(maxsize=1024, ttl=3600)
+
+# Number of result rows kept in session state; larger results are spilled to
+# a Parquet artifact (or a local file without an artifact service)
+QUERY_RESULT_PREVIEW_ROWS = int(os.environ.get("QUERY_RESULT_PREVIEW_ROWS", "20"))
+QUERY_RESULT_ARTIFACT_NAME = "last_query_results.parquet"
+local_result_store = LocalResultStore(os.environ.get("QUERY_RESULT_SPILL_DIR"))
+
+# The Memory Bank accepts at most 5 direct memories per generate request
+MAX_DIRECT_MEMORIES_PER_REQUEST = 5
+# Number of generate requests a batch save keeps in flight
+MEMORY_WRITE_CONCURRENCY = int(os.environ.get("MEMORY_WRITE_CONCURRENCY", "8"))
+
+# Near-duplicate suppression for team memories: a query is not saved again
+# when an existing team memory has the same SQL fingerprint, or when the
+# embeddings of both canonical queries are at least this similar
+SQL_DEDUP_ENABLED = os.environ.get("SQL_DEDUP_ENABLED", "true").lower() == "true"
+SQL_DEDUP_SIMILARITY_THRESHOLD = float(os.environ.get("SQL_DEDUP_SIMILARITY_THRESHOLD", "0.97"))
+# Existing memories compared with a new query
+SQL_DEDUP_CANDIDATES = 10
+# Canonical queries embedded per request when checking a batch for duplicates
+SQL_DEDUP_EMBED_BATCH_SIZE = 100
+_dedup_embed_fn = genai_embed_fn(
+  os.environ.get("SQL_DEDUP_EMBEDDING_MODEL", "text-embedding-005")
+)
+
+# Per-process cache of Memory Bank API clients, keyed by agent engine
+_api_clients: dict[tuple, Any] = {}
+_api_clients_lock = threading.Lock()
+
+# team_id stored in each user's profile, keyed by (app_name, user_id).
+# None is cached (with a shorter TTL) when the profile has no team_id.
+_team_id_cache = TTLCache(maxsize=4096, ttl=TEAM_ID_CACHE_TTL_SECONDS)
+
 
 # BigQuery Toolset configuration
 # WriteMode.BLOCKED prevents destructive operations (INSERT, UPDATE, DELETE, DROP)
@@ -59,7 +142,38 @@ def _extract_dataset_id(sql: str) -> str:
   return "unknown"
 
 
-def store_query_result_in_state(
+async def _spill_query_results(
+  rows: list[dict[str, Any]],
+  tool_context: ToolContext,
+) -> dict[str, Any] | None:
+  """Stores the full result rows outside of the session state.
+
+  Args:
+    rows: The rows returned by execute_sql.
+    tool_context: The ADK tool context.
+
+  Returns:
+    A reference to the stored result, or None if it could not be stored.
+  """
+  try:
+    data = await asyncio.to_thread(rows_to_parquet, rows)
+    try:
+      version = await tool_context.save_artifact(
+        QUERY_RESULT_ARTIFACT_NAME,
+        types.Part.from_bytes(data=data, mime_type=PARQUET_MIME_TYPE),
+      )
+      return {"artifact": QUERY_RESULT_ARTIFACT_NAME, "version": version}
+    except ValueError:
+      # No artifact service is configured for this runner
+      session_id = re.sub(r"[^a-zA-Z0-9_-]", "_", tool_context._invocation_context.session.id)
+      path = await asyncio.to_thread(local_result_store.save, session_id, data)
+      return {"path": path}
+  except Exception as e:
+    logger.warning("Failed to store full query results: %s", e)
+    return None
+
+
+async def store_query_result_in_state(
   tool: BaseTool,
   args: dict[str, Any],
   tool_context: ToolContext,
@@ -67,6 +181,10 @@ def store_query_result_in_state(
 ) -> dict | None:
   """After-tool callback to store BigQuery results in state for potential saving.
 
+  Only a preview of at most QUERY_RESULT_PREVIEW_ROWS rows and the result
+  schema are kept in state. Larger results are stored in full as Parquet and
+  can be paged back with load_query_results.
+
   Args:
     tool: The tool that was executed.
     args: The arguments passed to the tool.
@@ -77,20 +195,164 @@ def store_query_result_in_state(
     None (does not modify the response).
   """
   if tool.name == "execute_sql":
-    if tool_response.get("status") == "SUCCESS":
-      sql = args.get("sql", "")
+    if tool_response.get("status") == "SUCCESS" and not args.get("dry_run"):
+      sql = args.get("query") or args.get("sql", "")
+      rows = tool_response.get("rows", [])
       tool_context.state["last_executed_query"] = sql
-      tool_context.state["last_query_results"] = tool_response.get("rows", [])
+      tool_context.state["last_query_results"] = rows[:QUERY_RESULT_PREVIEW_ROWS]
+      tool_context.state["last_query_schema"] = infer_schema(rows)
+      tool_context.state["last_query_row_count"] = len(rows)
+      tool_context.state["last_query_results_ref"] = (
+        await _spill_query_results(rows, tool_context)
+        if len(rows) > QUERY_RESULT_PREVIEW_ROWS
+        else None
+      )
       tool_context.state["last_dataset_id"] = _extract_dataset_id(sql)
 
   return None
 
 
+async def load_query_results(
+  tool_context: ToolContext,
+  offset: int = 0,
+  limit: int = 50,
+) -> dict[str, Any]:
+  """Loads a page of rows from the full result of the last executed query.
+
+  Use this when the user asks for rows beyond the preview of the last result.
+
+  Args:
+    tool_context: The ADK tool context.
+    offset: The index of the first row to return.
+    limit: The maximum number of rows to return.
+
+  Returns:
+    A dictionary with the requested rows, the schema and the total row count.
+  """
+  offset = max(0, offset)
+  limit = max(1, min(limit, 500))
+  ref = tool_context.state.get("last_query_results_ref")
+  try:
+    if not ref:
+      rows = (tool_context.state.get("last_query_results") or [])[offset:offset + limit]
+    elif "artifact" in ref:
+      part = await tool_context.load_artifact(ref["artifact"], version=ref.get("version"))
+      if part is None or part.inline_data is None:
+        raise ValueError(f"Artifact '{ref['artifact']}' not found.")
+      rows = await asyncio.to_thread(read_parquet_rows, part.inline_data.data, offset, limit)
+    else:
+      rows = await asyncio.to_thread(read_parquet_rows, ref["path"], offset, limit)
+  except Exception as e:
+    logger.error("Failed to load query results: %s", e)
+    return {"status": "error", "message": str(e), "rows": []}
+
+  return {
+    "status": "success",
+    "offset": offset,
+    "rows": rows,
+    "total_row_count": tool_context.state.get("last_query_row_count", len(rows)),
+    "schema": tool_context.state.get("last_query_schema", []),
+  }
+
+
+def _query_result_cache_key(args: dict[str, Any]) -> Optional[tuple]:
+  """Returns the result cache key of an execute_sql call, or None."""
+  if query_result_cache is None or args.get("dry_run"):
+    return None
+  sql = args.get("query") or args.get("sql") or ""
+  return QueryResultCache.make_key(
+    args.get("project_id", ""),
+    _extract_dataset_id(sql),
+    sql,
+  )
+
+
+async def lookup_cached_query_result(
+  tool: BaseTool,
+  args: dict[str, Any],
+  tool_context: ToolContext,
+) -> dict | None:
+  """Before-tool callback serving execute_sql from the query result cache.
+
+  Args:
+    tool: The tool about to be executed.
+    args: The arguments passed to the tool.
+    tool_context: The ADK tool context.
+
+  Returns:
+    The cached tool response, or None to run the query.
+  """
+  if tool.name != "execute_sql":
+    return None
+
+  key = _query_result_cache_key(args)
+  if key is None:
+    return None
+
+  cached = await asyncio.to_thread(query_result_cache.get, key)
+  if cached is not None:
+    logger.info("Serving execute_sql from the query result cache")
+    cached["cache_hit"] = True
+    return cached
+
+  _pending_query_results.set(
+    tool_context.function_call_id,
+    (key, datetime.now(timezone.utc)),
+  )
+  return None
+
+
+def cache_query_result(
+  tool: BaseTool,
+  args: dict[str, Any],
+  tool_context: ToolContext,
+  tool_response: dict,
+) -> dict | None:
+  """After-tool callback caching successful execute_sql results.
+
+  Args:
+    tool: The tool that was executed.
+    args: The arguments passed to the tool.
+    tool_context: The ADK tool context.
+    tool_response: The response from the tool.
+
+  Returns:
+    None (does not modify the response).
+  """
+  if tool.name != "execute_sql" or query_result_cache is None:
+    return None
+
+  pending = _pending_query_results.get(tool_context.function_call_id)
+  if pending is MISSING:
+    return None
+  _pending_query_results.pop(tool_context.function_call_id)
+
+  if tool_response.get("status") == "SUCCESS" and "rows" in tool_response:
+    key, started_at = pending
+    query_result_cache.put(key, tool_response, started_at)
+  return None
+
+
+# Field lines of a stored memory fact, e.g. 'NL Query: ...'. The lookahead
+# lets the scanner reject most line starts on their first character.
+_FACT_FIELD_RE = re.compile(
+  r"^(?=[tdns])(title|description|nl query|sql):",
+  re.IGNORECASE | re.MULTILINE,
+)
+_FACT_FIELD_KEYS = {
+  "title": "title",
+  "description": "description",
+  "nl query": "nl_query",
+  "sql": "sql_query",
+}
+
+
 def _parse_memory_fact(fact: str) -> dict[str, Any]:
   """Parses a structured memory fact string into a dictionary.
 
   The fact string is expected to have fields like 'Title:', 'Description:',
-  'NL Query:', and 'SQL:'. Multi-line values are supported.
+  'NL Query:', and 'SQL:'. Multi-line values are supported: a value runs
+  until the next field line, and only its first line is stripped.
 
   Args:
     fact: The raw fact string from memory.
@@ -98,36 +360,532 @@ def _parse_memory_fact(fact: str) -> dict[str, Any]:
   Returns:
     A dictionary containing the parsed fields.
   """
-
   parsed = {"fact": fact}
 
-  # Mapping of prefixes to match_entry keys
-  key_map = {
-    "title:": "title",
-    "description:": "description",
-    "nl query:": "nl_query",
-    "sql:": "sql_query",
-  }
-
-  current_key = None
-  for line in fact.split("\n"):
-    line_lower = line.lower()
-    # Check if line starts with any of our known prefixes
-    matched = False
-    for prefix, entry_key in key_map.items():
-      if line_lower.startswith(prefix):
-        current_key = entry_key
-        parsed[current_key] = line.split(":", 1)[1].strip()
-        matched = True
-        break
-
-    if not matched and current_key:
-      # Append multi-line content for the last found key
-      parsed[current_key] += "\n" + line
+  # Each value is a single slice of the fact between two field lines
+  fields = list(_FACT_FIELD_RE.finditer(fact))
+  for i, match in enumerate(fields):
+    end = fields[i + 1].start() - 1 if i + 1 < len(fields) else len(fact)
+    first_line, newline, rest = fact[match.end():end].partition("\n")
+    parsed[_FACT_FIELD_KEYS[match.group(1).lower()]] = first_line.strip() + newline + rest
 
   return parsed
 
 
+def _get_memory_bank(memory_service: Any) -> tuple[Any, str]:
+  """Returns a cached API client and the agent engine name of a memory service.
+
+  Args:
+    memory_service: The Vertex AI Memory Bank service from the invocation context.
+
+  Returns:
+    A tuple of (API client, 'reasoningEngines/<id>').
+  """
+  agent_engine_id = memory_service._agent_engine_id
+  key = (
+    getattr(memory_service, "_project", None),
+    getattr(memory_service, "_location", None),
+    agent_engine_id,
+  )
+  with _api_clients_lock:
+    client = _api_clients.get(key)
+    if client is None:
+      client = memory_service._get_api_client()
+      _api_clients[key] = client
+  return client, f"reasoningEngines/{agent_engine_id}"
+
+
+def _user_key(tool_context: ToolContext) -> tuple[str, str]:
+  """Returns the (app_name, user_id) key of the current user."""
+  return (
+    tool_context._invocation_context.session.app_name,
+    tool_context._invocation_context.user_id,
+  )
+
+
+async def _resolve_team_id(
+  tool_context: ToolContext,
+  team_id: Optional[str] = None,
+) -> Optional[str]:
+  """Resolves the team_id: parameter > state > cache > user memory profile.
+
+  Args:
+    tool_context: The ADK tool context.
+    team_id: An explicitly provided team_id, if any.
+
+  Returns:
+    The resolved team_id or None if it is unknown.
+  """
+  if team_id:
+    return team_id
+
+  team_id = tool_context.state.get("team_id")
+  if team_id:
+    return team_id
+
+  key = _user_key(tool_context)
+  team_id = _team_id_cache.get(key)
+  if team_id is MISSING:
+    team_id = await get_team_id_from_user_memory(tool_context)
+    _team_id_cache.set(
+      key,
+      team_id,
+      ttl=None if team_id else TEAM_ID_NEGATIVE_CACHE_TTL_SECONDS,
+    )
+
+  if team_id:
+    tool_context.state["team_id"] = team_id
+  return team_id
+
+
+def _memory_cache_key(memory_scope: dict[str, str]) -> str:
+  """Returns the local cache key of a Memory Bank scope."""
+  if "user_id" in memory_scope:
+    return f"{memory_scope['app_name']}/user:{memory_scope['user_id']}"
+  return f"{memory_scope['app_name']}/team:{memory_scope['team_id']}"
+
+
+async def _embed_for_cache(nl_query: str) -> Any:
+  """Embeds a question for the local SQL memory cache, or returns None."""
+  try:
+    return await asyncio.to_thread(sql_memory_cache.embed, nl_query)
+  except Exception as e:
+    logger.debug("Failed to embed query for the local cache: %s", e)
+    return None
+
+
+def _retrieve_sql_memories(
+  client: Any,
+  agent_engine_name: str,
+  memory_scope: dict[str, str],
+  nl_query: str,
+  top_k: Optional[int] = None,
+) -> list[Any]:
+  """Runs a blocking similarity search for SQL memories in a single scope.
+
+  Args:
+    client: The Agent Engine API client.
+    agent_engine_name: The reasoning engine resource name.
+    memory_scope: The memory scope to search.
+    nl_query: The natural language query to search for.
+    top_k: The maximum number of memories to return (service default if None).
+
+  Returns:
+    The retrieved memories, fully materialized.
+  """
+  # Filter for SQL-type memories only
+  filter_groups = [
+    {
+      "filters": [
+        {
+          "key": "content_type",
+          "value": {"string_value": "sql"},
+          "op": "EQUAL",
+        }
+      ]
+    }
+  ]
+
+  similarity_search_params: dict[str, Any] = {"search_query": nl_query}
+  if top_k:
+    similarity_search_params["top_k"] = top_k
+
+  response = client.agent_engines.memories.retrieve(
+    name=agent_engine_name,
+    scope=memory_scope,
+    similarity_search_params=similarity_search_params,
+    config={"filter_groups": filter_groups},
+  )
+  return list(response)
+
+
+def _rank_matches(matches: list[dict[str, Any]], limit: int) -> list[dict[str, Any]]:
+  """Merges matches from several scopes by similarity distance.
+
+  Matches with the same SQL are de-duplicated, keeping the closest one.
+  Matches without a distance are ranked last.
+
+  Args:
+    matches: Parsed matches, each with an optional 'distance' key.
+    limit: The maximum number of matches to return.
+
+  Returns:
+    The closest matches, ordered by ascending distance.
+  """
+  ranked = sorted(
+    matches,
+    key=lambda m: m["distance"] if m.get("distance") is not None else float("inf"),
+  )
+  seen = set()
+  unique = []
+  for match in ranked:
+    key = " ".join(match.get("sql_query", match["fact"]).split()).lower()
+    if key in seen:
+      continue
+    seen.add(key)
+    unique.append(match)
+  return unique[:limit]
+
+
+def format_query_fact(title: str, description: str, nl_query: str, sql_query: str) -> str:
+  """Returns the structured memory fact stored for a query."""
+  return f"""Title: {title}
+Description: {description}
+NL Query: {nl_query}
+SQL: {sql_query}"""
+
+
+def _generate_sql_memories(
+  client: Any,
+  agent_engine_name: str,
+  memory_scope: dict[str, str],
+  facts: list[str],
+  dataset_id: str,
+) -> None:
+  """Stores up to MAX_DIRECT_MEMORIES_PER_REQUEST SQL facts in one blocking call."""
+  client.agent_engines.memories.generate(
+    name=agent_engine_name,
+    scope=memory_scope,
+    direct_memories_source={
+      "direct_memories": [{"fact": fact} for fact in facts]
+    },
+    config={
+      "wait_for_completion": False,
+      "metadata": {
+        "dataset_id": {"string_value": dataset_id},
+        "content_type": {"string_value": "sql"},
+      },
+    },
+  )
+
+
+async def write_query_memories(
+  client: Any,
+  agent_engine_name: str,
+  memory_scope: dict[str, str],
+  records: list[dict[str, str]],
+  concurrency: int = MEMORY_WRITE_CONCURRENCY,
+  on_chunk_saved: Optional[Callable[[list[dict[str, str]]], None]] = None,
+) -> list[tuple[dict[str, str], BaseException]]:
+  """Stores many queries in one scope with as few generate requests as possible.
+
+  Metadata applies to a whole request, so records are grouped by dataset_id
+  and each group is split into chunks of MAX_DIRECT_MEMORIES_PER_REQUEST
+  facts. The chunks are sent concurrently, at most `concurrency` at a time.
+
+  Args:
+    client: The Agent Engine API client.
+    agent_engine_name: The reasoning engine resource name.
+    memory_scope: The memory scope to write to.
+    records: Dicts with title, description, nl_query, sql_query and dataset_id.
+    concurrency: The maximum number of requests in flight.
+    on_chunk_saved: Optional callback invoked with the records of each chunk
+      as soon as it is stored, e.g. to checkpoint progress.
+
+  Returns:
+    The (record, error) pairs of the records that could not be stored.
+  """
+  groups: dict[str, list[dict[str, str]]] = {}
+  for record in records:
+    groups.setdefault(record["dataset_id"], []).append(record)
+
+  chunks = [
+    (dataset_id, group[i:i + MAX_DIRECT_MEMORIES_PER_REQUEST])
+    for dataset_id, group in groups.items()
+    for i in range(0, len(group), MAX_DIRECT_MEMORIES_PER_REQUEST)
+  ]
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def write_chunk(dataset_id: str, chunk: list[dict[str, str]]) -> None:
+    facts = [
+      format_query_fact(r["title"], r["description"], r["nl_query"], r["sql_query"])
+      for r in chunk
+    ]
+    async with semaphore:
+      await asyncio.to_thread(
+        _generate_sql_memories, client, agent_engine_name, memory_scope, facts, dataset_id
+      )
+    if on_chunk_saved is not None:
+      on_chunk_saved(chunk)
+
+  results = await asyncio.gather(
+    *[write_chunk(dataset_id, chunk) for dataset_id, chunk in chunks],
+    return_exceptions=True,
+  )
+  failed = []
+  for (_, chunk), result in zip(chunks, results):
+    if isinstance(result, BaseException):
+      failed.extend((record, result) for record in chunk)
+  return failed
+
+
+def _list_sql_memories(
+  client: Any,
+  agent_engine_name: str,
+  memory_scope: dict[str, str],
+  dataset_id: str,
+) -> list[dict[str, Any]]:
+  """Returns the parsed SQL memories of one dataset in a scope (blocking)."""
+  filter_groups = [
+    {
+      "filters": [
+        {"key": "content_type", "value": {"string_value": "sql"}, "op": "EQUAL"},
+        {"key": "dataset_id", "value": {"string_value": dataset_id}, "op": "EQUAL"},
+      ]
+    }
+  ]
+  response = client.agent_engines.memories.retrieve(
+    name=agent_engine_name,
+    scope=memory_scope,
+    config={"filter_groups": filter_groups},
+  )
+  entries = []
+  for memory in response:
+    fact = memory.memory.fact if hasattr(memory, "memory") else str(memory)
+    entry = _parse_memory_fact(fact)
+    if entry.get("sql_query"):
+      entries.append(entry)
+  return entries
+
+
+def _find_duplicate_queries(
+  client: Any,
+  agent_engine_name: str,
+  memory_scope: dict[str, str],
+  records: list[dict[str, str]],
+) -> list[Optional[dict[str, Any]]]:
+  """Returns the existing memory each record duplicates, or None (blocking).
+
+  Unlike _find_duplicate_query, the saved memories are listed once per
+  dataset_id group instead of searched once per record. Records are matched
+  by SQL fingerprint first; the rest are compared by cosine similarity of
+  their canonical queries, embedded in batches together with the memories.
+
+  Args:
+    client: The Agent Engine API client.
+    agent_engine_name: The reasoning engine resource name.
+    memory_scope: The memory scope to check.
+    records: Dicts with at least sql_query and dataset_id.
+
+  Returns:
+    One parsed existing memory or None per record.
+  """
+  groups: dict[str, list[int]] = {}
+  for i, record in enumerate(records):
+    groups.setdefault(record["dataset_id"], []).append(i)
+
+  duplicates: list[Optional[dict[str, Any]]] = [None] * len(records)
+  for dataset_id, indices in groups.items():
+    candidates = _list_sql_memories(client, agent_engine_name, memory_scope, dataset_id)
+    if not candidates:
+      continue
+
+    by_fingerprint = {sql_fingerprint(c["sql_query"]): c for c in candidates}
+    unmatched = []
+    for i in indices:
+      duplicates[i] = by_fingerprint.get(sql_fingerprint(records[i]["sql_query"]))
+      if duplicates[i] is None:
+        unmatched.append(i)
+    if not unmatched:
+      continue
+
+    texts = [canonicalize_sql(records[i]["sql_query"]) for i in unmatched]
+    texts += [canonicalize_sql(c["sql_query"]) for c in candidates]
+    try:
+      embeddings: list[list[float]] = []
+      for start in range(0, len(texts), SQL_DEDUP_EMBED_BATCH_SIZE):
+        embeddings.extend(_dedup_embed_fn(texts[start:start + SQL_DEDUP_EMBED_BATCH_SIZE]))
+    except Exception as e:
+      logger.debug("Failed to embed queries for duplicate detection: %s", e)
+      continue
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarities = vectors[:len(unmatched)] @ vectors[len(unmatched):].T
+    best = np.argmax(similarities, axis=1)
+    for row, i in enumerate(unmatched):
+      if similarities[row, best[row]] >= SQL_DEDUP_SIMILARITY_THRESHOLD:
+        duplicates[i] = candidates[int(best[row])]
+  return duplicates
+
+
+async def filter_duplicate_queries(
+  client: Any,
+  agent_engine_name: str,
+  memory_scope: dict[str, str],
+  records: list[dict[str, str]],
+) -> tuple[list[dict[str, str]], list[tuple[dict[str, str], str]]]:
+  """Drops records that repeat another record of the batch or a saved team memory.
+
+  Shared by save_queries_to_memory and utils/save_queries_to_memory.py.
+  Saved memories are only checked for team scopes with SQL_DEDUP_ENABLED;
+  failures of that check never block a save.
+
+  Args:
+    client: The Agent Engine API client.
+    agent_engine_name: The reasoning engine resource name.
+    memory_scope: The memory scope the records are saved to.
+    records: Dicts with title, sql_query and dataset_id.
+
+  Returns:
+    The records to save, and (record, reason) pairs of the dropped ones.
+  """
+  unique = []
+  dropped = []
+  fingerprints = set()
+  for record in records:
+    fingerprint = sql_fingerprint(record["sql_query"])
+    if fingerprint in fingerprints:
+      dropped.append((record, "Duplicate of another query in this batch."))
+    else:
+      fingerprints.add(fingerprint)
+      unique.append(record)
+
+  if not unique or not SQL_DEDUP_ENABLED or "team_id" not in memory_scope:
+    return unique, dropped
+  try:
+    duplicates = await asyncio.to_thread(
+      _find_duplicate_queries, client, agent_engine_name, memory_scope, unique
+    )
+  except Exception as e:
+    logger.warning("Duplicate check failed, saving anyway: %s", e)
+    return unique, dropped
+
+  new_records = []
+  for record, duplicate in zip(unique, duplicates):
+    if duplicate is None:
+      new_records.append(record)
+    else:
+      dropped.append((record, f"Equivalent to saved query '{duplicate.get('title', '')}'."))
+  return new_records, dropped
+
+
+def _find_duplicate_query(
+  client: Any,
+  agent_engine_name: str,
+  memory_scope: dict[str, str],
+  nl_query: str,
+  sql_query: str,
+) -> Optional[dict[str, Any]]:
+  """Returns an existing memory in the scope that holds the same query (blocking).
+
+  The closest SQL memories are compared by SQL fingerprint first; only if
+  none matches, the canonical queries are embedded in a single request and
+  compared by cosine similarity against SQL_DEDUP_SIMILARITY_THRESHOLD.
+
+  Args:
+    client: The Agent Engine API client.
+    agent_engine_name: The reasoning engine resource name.
+    memory_scope: The memory scope to check.
+    nl_query: The natural language question of the new query.
+    sql_query: The SQL of the new query.
+
+  Returns:
+    The parsed existing memory, or None if the query is new.
+  """
+  memories = _retrieve_sql_memories(
+    client,
+    agent_engine_name,
+    memory_scope,
+    f"{nl_query}\n{sql_query}",
+    top_k=SQL_DEDUP_CANDIDATES,
+  )
+  candidates = []
+  for memory in memories:
+    fact = memory.memory.fact if hasattr(memory, "memory") else str(memory)
+    entry = _parse_memory_fact(fact)
+    if entry.get("sql_query"):
+      candidates.append(entry)
+  if not candidates:
+    return None
+
+  fingerprint = sql_fingerprint(sql_query)
+  for entry in candidates:
+    if sql_fingerprint(entry["sql_query"]) == fingerprint:
+      return entry
+
+  try:
+    vectors = np.asarray(
+      _dedup_embed_fn([canonicalize_sql(sql_query)] + [canonicalize_sql(c["sql_query"]) for c in candidates]),
+      dtype=np.float32,
+    )
+  except Exception as e:
+    logger.debug("Failed to embed queries for duplicate detection: %s", e)
+    return None
+  vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+  similarities = vectors[1:] @ vectors[0]
+  best = int(np.argmax(similarities))
+  if similarities[best] >= SQL_DEDUP_SIMILARITY_THRESHOLD:
+    return candidates[best]
+  return None
+
+
+async def _check_duplicate_query(
+  client: Any,
+  agent_engine_name: str,
+  memory_scope: dict[str, str],
+  nl_query: str,
+  sql_query: str,
+) -> Optional[dict[str, Any]]:
+  """Runs _find_duplicate_query for team scopes; failures never block a save."""
+  if not SQL_DEDUP_ENABLED or "team_id" not in memory_scope:
+    return None
+  try:
+    return await asyncio.to_thread(
+      _find_duplicate_query, client, agent_engine_name, memory_scope, nl_query, sql_query
+    )
+  except Exception as e:
+    logger.warning("Duplicate check failed, saving anyway: %s", e)
+    return None
+
+
+async def _resolve_save_scope(
+  scope: Literal["user", "team"],
+  tool_context: ToolContext,
+  team_id: Optional[str] = None,
+) -> Optional[dict[str, str]]:
+  """Returns the memory scope to save queries to, or None without a team_id.
+
+  For the team scope, a newly used team_id is also registered in the
+  user's profile for future sessions.
+  """
+  app_name = tool_context._invocation_context.session.app_name
+  if scope == "user":
+    return {"app_name": app_name, "user_id": tool_context._invocation_context.user_id}
+
+  # Resolve team_id only when needed for team scope: parameter > state > cache > user memory profile
+  team_id = await _resolve_team_id(tool_context, team_id)
+  if not team_id:
+    return None
+
+  # Auto-register team_id to user profile for future sessions,
+  # only when it differs from the value stored there
+  key = _user_key(tool_context)
+  stored_team_id = _team_id_cache.get(key)
+  if stored_team_id is MISSING:
+    # New process or expired entry: read the profile instead of re-writing it
+    stored_team_id = await get_team_id_from_user_memory(tool_context)
+    _team_id_cache.set(
+      key,
+      stored_team_id,
+      ttl=None if stored_team_id else TEAM_ID_NEGATIVE_CACHE_TTL_SECONDS,
+    )
+  if stored_team_id != team_id:
+    try:
+      await _save_user_property("team_id", team_id, tool_context)
+    except Exception as pe:
+      logger.debug("Minor failure during team_id auto-registration: %s", pe)
+
+  return {"app_name": app_name, "team_id": team_id}
+
+
+def _default_dataset_id(sql_query: str) -> str:
+  """Returns the dataset_id of a query, falling back to BIGQUERY_DATASET."""
+  dataset_id = _extract_dataset_id(sql_query)
+  if dataset_id == "unknown":
+    dataset_id = os.environ.get("BIGQUERY_DATASET", "unknown")
+  return dataset_id
+
+
 async def _save_user_property(
   key: str,
   value: str,
@@ -138,9 +896,7 @@ async def _save_user_property(
   if not memory_service:
     return
 
-  client = memory_service._get_api_client()
-  agent_engine_id = memory_service._agent_engine_id
-  agent_engine_name = f"reasoningEngines/{agent_engine_id}"
+  client, agent_engine_name = _get_memory_bank(memory_service)
   user_id = tool_context._invocation_context.user_id
   app_name = tool_context._invocation_context.session.app_name
 
@@ -162,6 +918,8 @@ async def _save_user_property(
   logger.info("Auto-registered user property '%s' = '%s'", key, value)
   # Update state for immediate session use
   tool_context.state[key] = value
+  if key == "team_id":
+    _team_id_cache.set(_user_key(tool_context), value)
 
 
 async def set_user_property(
@@ -209,9 +967,7 @@ async def get_team_id_from_user_memory(tool_context: ToolContext) -> str | None:
     if not memory_service:
       return None
 
-    client = memory_service._get_api_client()
-    agent_engine_id = memory_service._agent_engine_id
-    agent_engine_name = f"reasoningEngines/{agent_engine_id}"
+    client, agent_engine_name = _get_memory_bank(memory_service)
     user_id = tool_context._invocation_context.user_id
     app_name = tool_context._invocation_context.session.app_name
 
@@ -318,76 +1074,47 @@ async def save_query_to_memory(
         "message": "Memory service not available in context.",
       }
 
-    client = memory_service._get_api_client()
-    agent_engine_id = memory_service._agent_engine_id
-    agent_engine_name = f"reasoningEngines/{agent_engine_id}"
+    client, agent_engine_name = _get_memory_bank(memory_service)
     user_id = tool_context._invocation_context.user_id
-    app_name = tool_context._invocation_context.session.app_name
-    
-    # Determine scope dict based on scope parameter
-    if scope == "user":
-      memory_scope = {"app_name": app_name, "user_id": user_id}
-    else:  # team
-      # Resolve team_id only when needed for team scope: parameter > state > user memory profile
-      if not team_id:
-        team_id = tool_context.state.get("team_id")
-
-      if not team_id:
-        team_id = await get_team_id_from_user_memory(tool_context)
-        if team_id:
-          tool_context.state["team_id"] = team_id
-
-      if not team_id:
-        return {
-          "status": "error",
-          "message": "Team ID is required for team scope. Please provide it or save it in your profile first.",
-        }
-      
-      # Auto-register team_id to user profile for future sessions
-      try:
-        await _save_user_property("team_id", team_id, tool_context)
-      except Exception as pe:
-        logger.debug("Minor failure during team_id auto-registration: %s", pe)
 
-      memory_scope = {"app_name": app_name, "team_id": team_id}
+    memory_scope = await _resolve_save_scope(scope, tool_context, team_id)
+    if memory_scope is None:
+      return {
+        "status": "error",
+        "message": "Team ID is required for team scope. Please provide it or save it in your profile first.",
+      }
 
-    # Create structured memory fact with title, description, and query
-    fact = f"""Title: {title}
-Description: {description}
-NL Query: {nl_query}
-SQL: {sql_query}"""
+    duplicate = await _check_duplicate_query(
+      client, agent_engine_name, memory_scope, nl_query, sql_query
+    )
+    if duplicate is not None:
+      logger.info("Skipping near-duplicate of '%s' in %s scope", duplicate.get("title"), scope)
+      return {
+        "status": "duplicate",
+        "message": f"An equivalent query is already saved in {scope} memory as '{duplicate.get('title', '')}'. It was not saved again.",
+        "existing": {
+          "title": duplicate.get("title", ""),
+          "sql_query": duplicate["sql_query"],
+        },
+      }
+
+    fact = format_query_fact(title, description, nl_query, sql_query)
 
     # Try to get dataset_id from state (stored during execution)
     # Fallback to extracting from current query, then to environment variable
     dataset_id = tool_context.state.get("last_dataset_id")
     if not dataset_id or dataset_id == "unknown":
-      dataset_id = _extract_dataset_id(sql_query)
-
-    if dataset_id == "unknown":
-      dataset_id = os.environ.get("BIGQUERY_DATASET", "unknown")
+      dataset_id = _default_dataset_id(sql_query)
 
     # Store directly to the appropriate scope using Agent Engine SDK
-    client.agent_engines.memories.generate(
-      name=agent_engine_name,
-      scope=memory_scope,
-      direct_memories_source={
-        "direct_memories": [
-          {
-            "fact": fact,
-          }
-        ]
-      },
-      config={
-        "wait_for_completion": False,
-        "metadata": {
-          "dataset_id": {"string_value": dataset_id},
-          "content_type": {"string_value": "sql"},
-        },
-      },
-    )
+    _generate_sql_memories(client, agent_engine_name, memory_scope, [fact], dataset_id)
 
     logger.info("Memory saved to %s scope: %s", scope, title)
 
+    # Cached search results of this scope no longer include the new query
+    if sql_memory_cache is not None:
+      sql_memory_cache.invalidate(_memory_cache_key(memory_scope))
+
     return {
       "status": "success",
       "message": f"Query '{title}' saved to {scope} memory.",
@@ -405,6 +1132,98 @@ SQL: {sql_query}"""
     }
 
 
+class SavedQuery(BaseModel):
+  """A validated query passed to save_queries_to_memory."""
+
+  title: str = Field(description="A concise name for the query.")
+  description: str = Field(description="What the query does and when to use it.")
+  nl_query: str = Field(description="The natural language question that the query answers.")
+  sql_query: str = Field(description="The SQL query that was validated as correct.")
+
+
+async def save_queries_to_memory(
+  queries: list[SavedQuery],
+  scope: Literal["user", "team"],
+  tool_context: ToolContext,
+  team_id: Optional[str] = None,
+) -> dict[str, Any]:
+  """Save many validated queries to the Memory Bank at once.
+
+  Use this instead of repeated save_query_to_memory calls when the user asks
+  to save several queries, e.g. to seed a team's query library.
+
+  Args:
+    queries: The queries to save, each with a title, description, nl_query
+      and sql_query.
+    scope: The sharing scope - 'user' for personal, 'team' for shared.
+    tool_context: The ADK tool context.
+    team_id: Optional team ID strings (e.g., "sales-team"). If provided, it overrides the default or state-cached team ID.
+
+  Returns:
+    A status message with the number of saved queries and any rejected ones.
+  """
+  logger.info("Saving %d queries to memory with scope: %s", len(queries), scope)
+
+  records = []
+  rejected = []
+  for query in queries:
+    # Function calls pass plain dicts; direct callers may pass SavedQuery models
+    query = query.model_dump() if isinstance(query, BaseModel) else dict(query)
+    missing = [k for k in ("title", "description", "nl_query", "sql_query") if not query.get(k)]
+    if missing:
+      rejected.append({"title": query.get("title", ""), "reason": f"Missing fields: {', '.join(missing)}"})
+    elif not query["sql_query"].strip().lower().startswith("select"):
+      rejected.append({"title": query["title"], "reason": "Only SELECT queries can be saved."})
+    else:
+      records.append({**query, "dataset_id": _default_dataset_id(query["sql_query"])})
+
+  try:
+    memory_service = tool_context._invocation_context.memory_service
+    if not memory_service:
+      return {
+        "status": "error",
+        "message": "Memory service not available in context.",
+      }
+
+    client, agent_engine_name = _get_memory_bank(memory_service)
+    memory_scope = await _resolve_save_scope(scope, tool_context, team_id)
+    if memory_scope is None:
+      return {
+        "status": "error",
+        "message": "Team ID is required for team scope. Please provide it or save it in your profile first.",
+      }
+
+    records, duplicates = await filter_duplicate_queries(
+      client, agent_engine_name, memory_scope, records
+    )
+    rejected.extend({"title": r["title"], "reason": reason} for r, reason in duplicates)
+
+    failed = await write_query_memories(client, agent_engine_name, memory_scope, records)
+    rejected.extend({"title": r["title"], "reason": str(e)} for r, e in failed)
+
+    # Cached search results of this scope no longer include the new queries
+    if sql_memory_cache is not None:
+      sql_memory_cache.invalidate(_memory_cache_key(memory_scope))
+
+    saved = len(records) - len(failed)
+    logger.info("Saved %d queries to %s scope", saved, scope)
+    return {
+      "status": "success" if saved or not failed else "error",
+      "message": f"Saved {saved} of {len(queries)} queries to {scope} memory.",
+      "saved_count": saved,
+      "rejected": rejected,
+      "scope": scope,
+    }
+
+  except Exception as e:
+    traceback.print_exc()
+    logger.error("Failed to save queries to memory: %s", e)
+    return {
+      "status": "error",
+      "message": f"Failed to save queries: {str(e)}",
+    }
+
+
 async def search_query_history(
   nl_query: str,
   scope: Literal["user", "team", "global"],
@@ -438,21 +1257,13 @@ async def search_query_history(
         "matches": [],
       }
 
-    client = memory_service._get_api_client()
-    agent_engine_id = memory_service._agent_engine_id
-    agent_engine_name = f"reasoningEngines/{agent_engine_id}"
+    client, agent_engine_name = _get_memory_bank(memory_service)
     user_id = tool_context._invocation_context.user_id
     app_name = tool_context._invocation_context.session.app_name
     
-    # Resolve team_id only for team or global scope: parameter > state > user memory profile
+    # Resolve team_id only for team or global scope: parameter > state > cache > user memory profile
     if scope in ["team", "global"]:
-      if not team_id:
-        team_id = tool_context.state.get("team_id")
-      
-      if not team_id:
-        team_id = await get_team_id_from_user_memory(tool_context)
-        if team_id:
-          tool_context.state["team_id"] = team_id
+      team_id = await _resolve_team_id(tool_context, team_id)
 
     matches = []
 
@@ -463,45 +1274,98 @@ async def search_query_history(
     elif scope == "team":
       scopes_to_search = [{"app_name": app_name, "team_id": team_id}]
     else:  # global - search both user and team
-      scopes_to_search = [
-        {"app_name": app_name, "user_id": user_id},
-        {"app_name": app_name, "team_id": team_id}
-      ]
+      scopes_to_search = [{"app_name": app_name, "user_id": user_id}]
+      if team_id:
+        scopes_to_search.append({"app_name": app_name, "team_id": team_id})
+
+    # Resolve scopes from the local cache first: exact question matches need
+    # no embedding, similar questions need a single embedding call.
+    scope_matches: dict[int, list[dict[str, Any]]] = {}
+    vector = None
+    if sql_memory_cache is not None:
+      for i, memory_scope in enumerate(scopes_to_search):
+        cached = sql_memory_cache.get(_memory_cache_key(memory_scope), nl_query)
+        if cached is not None:
+          scope_matches[i] = cached
+
+    # Remaining scopes without cached questions cannot be answered by a
+    # similar question, so their remote search starts right away and the
+    # question is embedded alongside it. Scopes with cached questions are
+    # only searched remotely if the semantic lookup misses.
+    def retrieve(i: int) -> asyncio.Future:
+      return asyncio.ensure_future(
+        asyncio.to_thread(
+          _retrieve_sql_memories,
+          client,
+          agent_engine_name,
+          scopes_to_search[i],
+          nl_query,
+        )
+      )
 
-    # Search each scope with similarity search
-    for memory_scope in scopes_to_search:
-      scope_name = "user" if "user_id" in memory_scope else "team"
+    pending = [i for i in range(len(scopes_to_search)) if i not in scope_matches]
+    if sql_memory_cache is None:
+      retrieve_tasks = {i: retrieve(i) for i in pending}
+    else:
+      retrieve_tasks = {
+        i: retrieve(i) for i in pending
+        if not sql_memory_cache.has_entries(_memory_cache_key(scopes_to_search[i]))
+      }
+      if pending:
+        vector = await _embed_for_cache(nl_query)
+      for i in pending:
+        if i in retrieve_tasks:
+          continue
+        cached = None
+        if vector is not None:
+          cached = sql_memory_cache.get(
+            _memory_cache_key(scopes_to_search[i]), nl_query, vector
+          )
+        if cached is not None:
+          scope_matches[i] = cached
+        else:
+          retrieve_tasks[i] = retrieve(i)
+
+    if scope_matches:
+      logger.info(
+        "Resolved %d of %d scope(s) from the local SQL memory cache",
+        len(scope_matches),
+        len(scopes_to_search),
+      )
 
-      # Filter for SQL-type memories only
-      filter_groups = [
-        {
-          "filters": [
-            {
-              "key": "content_type",
-              "value": {"string_value": "sql"},
-              "op": "EQUAL",
-            }
-          ]
-        }
-      ]
+    pending = list(retrieve_tasks)
+    results = await asyncio.gather(*retrieve_tasks.values(), return_exceptions=True)
 
-      response = client.agent_engines.memories.retrieve(
-        name=agent_engine_name,
-        scope=memory_scope,
-        similarity_search_params={"search_query": nl_query},
-        config={"filter_groups": filter_groups},
-      )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors and len(errors) == len(results) and not scope_matches:
+      raise errors[0]
 
-      for memory in list(response):
+    for i, memories in zip(pending, results):
+      memory_scope = scopes_to_search[i]
+      scope_name = "user" if "user_id" in memory_scope else "team"
+      if isinstance(memories, BaseException):
+        logger.warning("Failed to search %s scope: %s", scope_name, memories)
+        continue
+
+      entries = []
+      for memory in memories:
         fact = memory.memory.fact if hasattr(memory, "memory") else str(memory)
         match_entry = _parse_memory_fact(fact)
         match_entry["scope"] = scope_name
-        matches.append(match_entry)
+        match_entry["distance"] = getattr(memory, "distance", None)
+        entries.append(match_entry)
+      scope_matches[i] = entries
+
+      if vector is not None:
+        sql_memory_cache.put(_memory_cache_key(memory_scope), nl_query, vector, entries)
+
+    for entries in scope_matches.values():
+      matches.extend(entries)
 
     return {
       "status": "success",
       "match_count": len(matches),
-      "matches": matches[:5],  # Return top 5 matches
+      "matches": _rank_matches(matches, MAX_HISTORY_MATCHES),
     }
 
   except Exception as e:
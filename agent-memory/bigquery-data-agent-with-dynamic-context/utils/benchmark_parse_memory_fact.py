@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Benchmark of the memory fact parser used by search_query_history.
+
+Generates a reproducible set of stored query facts (with multi-line SQL of
+varying length), checks that the compiled parser returns exactly what the
+previous line-by-line parser returned, and reports the time of both.
+
+  python utils/benchmark_parse_memory_fact.py --facts 10000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bigquery_data_agent.tools import _parse_memory_fact
+
+COLUMNS = ["order_id", "user_id", "city", "revenue", "created_at", "search_term", "country", "status"]
+TABLES = ["orders", "users", "search_logs", "payments", "sessions"]
+
+
+def legacy_parse_memory_fact(fact: str) -> dict[str, Any]:
+  """The previous parser: lowercases each line and concatenates values."""
+  parsed = {"fact": fact}
+  key_map = {
+    "title:": "title",
+    "description:": "description",
+    "nl query:": "nl_query",
+    "sql:": "sql_query",
+  }
+  current_key = None
+  for line in fact.split("\n"):
+    line_lower = line.lower()
+    matched = False
+    for prefix, entry_key in key_map.items():
+      if line_lower.startswith(prefix):
+        current_key = entry_key
+        parsed[current_key] = line.split(":", 1)[1].strip()
+        matched = True
+        break
+    if not matched and current_key:
+      parsed[current_key] += "\n" + line
+  return parsed
+
+
+def build_facts(num_facts: int, seed: int = 42) -> list[str]:
+  """Returns facts in the stored format, some with long multi-line SQL."""
+  rng = random.Random(seed)
+  facts = []
+  for i in range(num_facts):
+    table = rng.choice(TABLES)
+    columns = rng.sample(COLUMNS, 3)
+    # Mostly short queries, with a tail of long generated ones
+    num_ctes = rng.choice([0, 0, 0, 1, 2, 20])
+    sql_lines = [f"WITH t{j} AS (SELECT {', '.join(columns)} FROM `proj.ds.{table}`)," for j in range(num_ctes)]
+    sql_lines += [
+      f"SELECT {columns[0]}, COUNT(*) AS cnt",
+      f"FROM `proj.ds.{table}`",
+      f"WHERE {columns[1]} IS NOT NULL",
+      f"GROUP BY {columns[0]}",
+      "ORDER BY cnt DESC",
+      f"LIMIT {rng.randint(5, 100)}",
+    ]
+    prefix = rng.choice(["", "", "Saved query\n"])
+    facts.append(
+      f"{prefix}Title: Query {i} on {table}\n"
+      f"Description: Counts rows by {columns[0]}.\n"
+      f"It ignores rows without {columns[1]}.\n"
+      f"{rng.choice(['NL Query', 'nl query'])}: How many {table} per {columns[0]}?\n"
+      f"SQL: {sql_lines[0]}\n" + "\n".join(sql_lines[1:])
+    )
+  return facts
+
+
+def _time(parser, facts: list[str], repeat: int) -> list[float]:
+  timings = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for fact in facts:
+      parser(fact)
+    timings.append((time.perf_counter() - start) * 1000.0)
+  return timings
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Memory fact parser benchmark")
+  parser.add_argument("--facts", type=int, default=10000, help="Number of stored facts to parse")
+  parser.add_argument("--repeat", type=int, default=5, help="Timed runs per parser")
+  args = parser.parse_args()
+
+  facts = build_facts(args.facts)
+  mismatches = sum(1 for fact in facts if _parse_memory_fact(fact) != legacy_parse_memory_fact(fact))
+  if mismatches:
+    print(f"✗ {mismatches} of {len(facts)} facts parse differently")
+    sys.exit(1)
+  print(f"✓ Both parsers agree on {len(facts)} facts "
+        f"({sum(len(f) for f in facts) / len(facts):.0f} chars on average)")
+
+  legacy = _time(legacy_parse_memory_fact, facts, args.repeat)
+  current = _time(_parse_memory_fact, facts, args.repeat)
+  print(f"{'parser':>10} {'median ms':>10} {'min ms':>8} {'us/fact':>8}")
+  for name, timings in (("legacy", legacy), ("compiled", current)):
+    print(f"{name:>10} {statistics.median(timings):>10.1f} {min(timings):>8.1f} "
+          f"{statistics.median(timings) * 1000.0 / len(facts):>8.2f}")
+  print(f"Speedup: {statistics.median(legacy) / statistics.median(current):.1f}x")
+
+
+if __name__ == "__main__":
+  main()
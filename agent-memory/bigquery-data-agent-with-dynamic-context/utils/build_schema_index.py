@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Builds the table embedding index used to prune the schema in the prompt.
+
+Run this offline whenever tables are added or their descriptions change:
+
+  python utils/build_schema_index.py --dataset=your_dataset_name
+"""
+import os
+import sys
+import argparse
+import logging
+
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+  # Load .env from the agent directory
+  script_dir = os.path.dirname(os.path.abspath(__file__))
+  project_root = os.path.dirname(script_dir)
+  env_path = os.path.join(project_root, "bigquery_data_agent", ".env")
+  load_dotenv(env_path)
+  sys.path.insert(0, project_root)
+
+  from bigquery_data_agent.schema import SchemaLoader
+  from bigquery_data_agent.schema_index import SchemaIndex
+  from bigquery_data_agent.semantic_cache import genai_embed_fn
+
+  parser = argparse.ArgumentParser(description="Build the schema embedding index of a BigQuery dataset.")
+  parser.add_argument(
+    "--project",
+    default=os.environ.get("GOOGLE_CLOUD_PROJECT"),
+    help="Google Cloud Project ID (default: GOOGLE_CLOUD_PROJECT env)"
+  )
+  parser.add_argument(
+    "--dataset",
+    default=os.environ.get("BIGQUERY_DATASET"),
+    help="BigQuery dataset to index (default: BIGQUERY_DATASET env)"
+  )
+  parser.add_argument(
+    "--model",
+    default=os.environ.get("SCHEMA_INDEX_EMBEDDING_MODEL", "text-embedding-005"),
+    help="Embedding model (default: SCHEMA_INDEX_EMBEDDING_MODEL env or 'text-embedding-005')"
+  )
+  parser.add_argument(
+    "--output",
+    default=os.environ.get("SCHEMA_INDEX_PATH"),
+    help="Index file (default: SCHEMA_INDEX_PATH env or next to the schema cache)"
+  )
+  parser.add_argument("--batch-size", type=int, default=64, help="Tables embedded per request")
+
+  args = parser.parse_args()
+
+  assert args.project, "Project ID not set. Please provide --project or set GOOGLE_CLOUD_PROJECT environment variable."
+  assert args.dataset, "Dataset not set. Please provide --dataset or set BIGQUERY_DATASET environment variable."
+
+  loader = SchemaLoader(
+    args.project,
+    args.dataset,
+    cache_path=os.environ.get("SCHEMA_CACHE_PATH"),
+  )
+  output = args.output or os.path.splitext(loader.cache_path)[0] + ".index.npz"
+
+  try:
+    schema = loader.load(force=True)
+    logger.info(f"Indexing {len(schema['tables'])} tables of {schema['dataset']} with {args.model}")
+    index = SchemaIndex.build(schema, genai_embed_fn(args.model), args.model, args.batch_size)
+    index.save(output)
+    logger.info(f"✓ Wrote schema index to {output}")
+  except Exception as e:
+    logger.error(f"Building the schema index failed: {e}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Regression cases for the SQL fingerprint used to deduplicate memories.
+
+Each case is a pair of queries that must, or must not, share a fingerprint.
+Different queries that collide would be dropped as duplicates when saved.
+
+  python utils/check_sql_fingerprint.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bigquery_data_agent.sql_fingerprint import canonicalize_sql, sql_fingerprint
+
+# Pairs that are the same query
+SAME = [
+  ("SELECT o.id FROM `p.d.orders` o WHERE o.x = 1",
+   "select X.id from p.d.orders as X where X.x = 2"),
+  ("SELECT a.x, b.y FROM s.t a JOIN s.u b ON a.k = b.k",
+   "SELECT p.x, q.y FROM s.t AS p JOIN s.u AS q ON p.k = q.k"),
+  ("SELECT a.x FROM s.t a, s.u b WHERE a.k = b.k",
+   "SELECT c.x FROM s.t c, s.u d WHERE c.k = d.k"),
+  ("SELECT sub.c FROM (SELECT c FROM s.t) sub",
+   "SELECT z.c FROM (SELECT c FROM s.t) AS z"),
+  ("WITH t AS (SELECT 1 AS x) SELECT x FROM t",
+   "with u as (select 1 x) select x from u"),
+  ("SELECT SUM(amount) AS total FROM s.o",
+   "SELECT SUM(amount) total FROM s.o;"),
+  ("SELECT CAST(x AS INT64) FROM s.t WHERE id IN (1, 2, 3) -- ids",
+   "select cast(x as int64) from s.t where id in (4)"),
+]
+
+# Pairs that are different queries
+DIFFERENT = [
+  # A column alias named like the aggregated column
+  ("SELECT SUM(amount) AS amount FROM sales.orders",
+   "SELECT SUM(price) AS price FROM sales.orders"),
+  # A column alias named like the grouped column
+  ("SELECT region, COUNT(*) AS region FROM sales.orders GROUP BY region",
+   "SELECT country, COUNT(*) AS country FROM sales.orders GROUP BY country"),
+  # A column named like a CTE
+  ("WITH totals AS (SELECT 1 AS a) SELECT a, totals FROM totals",
+   "WITH totals AS (SELECT 1 AS a) SELECT a, b FROM totals"),
+  ("SELECT COUNT(*) FROM sales.orders",
+   "SELECT COUNT(*) FROM sales.users"),
+]
+
+
+def main():
+  failures = 0
+  for expected, pairs in ((True, SAME), (False, DIFFERENT)):
+    for a, b in pairs:
+      if (sql_fingerprint(a) == sql_fingerprint(b)) != expected:
+        failures += 1
+        print(f"✗ Expected {'the same' if expected else 'different'} fingerprints:")
+        print(f"    {canonicalize_sql(a)}")
+        print(f"    {canonicalize_sql(b)}")
+  total = len(SAME) + len(DIFFERENT)
+  if failures:
+    print(f"✗ {failures} of {total} cases failed")
+    sys.exit(1)
+  print(f"✓ All {total} cases passed")
+
+
+if __name__ == "__main__":
+  main()
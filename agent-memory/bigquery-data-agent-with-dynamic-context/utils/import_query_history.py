@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Imports frequently run BigQuery queries from the job history into the Memory Bank.
+
+The pipeline:
+  1. Reads successful SELECT jobs from INFORMATION_SCHEMA.JOBS.
+  2. Deduplicates the SQL by fingerprint, keeping the most recent text of
+     each query and ranking queries by how often they ran.
+  3. Generates a title, description and natural-language question for each
+     query with batched LLM calls.
+  4. Writes the queries to a user or team scope with dataset_id and
+     content_type metadata.
+
+Progress is kept in a local checkpoint file, so an interrupted import can be
+re-run with the same arguments: described queries are not sent to the LLM
+again, and saved queries are not written twice.
+
+  python utils/import_query_history.py --scope=team --team_id=sales-team --days=30
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import logging
+import tempfile
+
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOBS_QUERY = """
+SELECT
+  query,
+  ARRAY(SELECT DISTINCT t.dataset_id FROM UNNEST(referenced_tables) AS t) AS dataset_ids,
+  creation_time
+FROM `{project}`.`region-{region}`.INFORMATION_SCHEMA.JOBS
+WHERE creation_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL @days DAY)
+  AND job_type = 'QUERY'
+  AND statement_type = 'SELECT'
+  AND state = 'DONE'
+  AND error_result IS NULL
+  AND ARRAY_LENGTH(referenced_tables) > 0
+  AND (@dataset = '' OR EXISTS(
+    SELECT 1 FROM UNNEST(referenced_tables) AS t WHERE t.dataset_id = @dataset))
+ORDER BY creation_time DESC
+LIMIT @max_jobs
+"""
+
+DESCRIBE_PROMPT = """\
+You document BigQuery queries for a query library used by a Text-to-SQL agent.
+For each query below, return an object with:
+- "id": the id of the query, unchanged.
+- "title": a concise name for the query (at most 8 words).
+- "description": what the query computes and when to use it (1-2 sentences).
+- "nl_query": a natural-language question a business user would ask that this query answers.
+
+{queries}
+"""
+
+
+def read_checkpoint(path: str) -> dict:
+  """Returns the checkpoint state, or an empty state if there is none."""
+  if not os.path.exists(path):
+    return {"queries": {}}
+  with open(path, "r", encoding="utf-8") as f:
+    return json.load(f)
+
+
+def write_checkpoint(path: str, state: dict) -> None:
+  """Atomically writes the checkpoint state."""
+  directory = os.path.dirname(os.path.abspath(path))
+  fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+  with os.fdopen(fd, "w", encoding="utf-8") as f:
+    json.dump(state, f, ensure_ascii=False, indent=1)
+  os.replace(tmp_path, path)
+
+
+def fetch_jobs(project: str, region: str, days: int, dataset: str, max_jobs: int) -> list:
+  """Reads successful SELECT jobs of the last `days` days."""
+  from google.cloud import bigquery
+
+  client = bigquery.Client(project=project)
+  job_config = bigquery.QueryJobConfig(query_parameters=[
+    bigquery.ScalarQueryParameter("days", "INT64", days),
+    bigquery.ScalarQueryParameter("dataset", "STRING", dataset or ""),
+    bigquery.ScalarQueryParameter("max_jobs", "INT64", max_jobs),
+  ])
+  sql = JOBS_QUERY.format(project=project, region=region.lower())
+  return list(client.query_and_wait(sql, job_config=job_config))
+
+
+def deduplicate(jobs: list, fingerprint) -> list[dict]:
+  """Groups jobs by SQL fingerprint, most frequently run queries first.
+
+  Jobs are ordered newest first, so the first text seen for a fingerprint
+  is its most recent version.
+  """
+  queries: dict[str, dict] = {}
+  for job in jobs:
+    fp = fingerprint(job["query"])
+    entry = queries.get(fp)
+    if entry is None:
+      queries[fp] = {
+        "fingerprint": fp,
+        "sql_query": job["query"].strip(),
+        "dataset_ids": list(job["dataset_ids"]),
+        "run_count": 1,
+      }
+    else:
+      entry["run_count"] += 1
+  return sorted(queries.values(), key=lambda q: -q["run_count"])
+
+
+def describe_batch(client, model: str, batch: list[dict]) -> dict[str, dict]:
+  """Generates title, description and nl_query for a batch in one LLM call."""
+  from google.genai import types
+  from pydantic import BaseModel
+
+  class QueryDescription(BaseModel):
+    id: str
+    title: str
+    description: str
+    nl_query: str
+
+  queries = "\n\n".join(f"### id: {q['fingerprint']}\n{q['sql_query']}" for q in batch)
+  response = client.models.generate_content(
+    model=model,
+    contents=DESCRIBE_PROMPT.format(queries=queries),
+    config=types.GenerateContentConfig(
+      temperature=0.2,
+      response_mime_type="application/json",
+      response_schema=list[QueryDescription],
+    ),
+  )
+  return {d.id: d.model_dump() for d in response.parsed or []}
+
+
+def main():
+  # Load .env from the agent directory
+  script_dir = os.path.dirname(os.path.abspath(__file__))
+  project_root = os.path.dirname(script_dir)
+  env_path = os.path.join(project_root, "bigquery_data_agent", ".env")
+  load_dotenv(env_path)
+  sys.path.insert(0, project_root)
+
+  import vertexai
+  from google import genai
+  from bigquery_data_agent.sql_fingerprint import sql_fingerprint
+  from bigquery_data_agent.tools import write_query_memories
+
+  parser = argparse.ArgumentParser(description="Import BigQuery job history into the Memory Bank.")
+  parser.add_argument("--scope", choices=["user", "team"], required=True, help="Memory scope to import into")
+  parser.add_argument("--user_id", help="User ID (required for --scope=user)")
+  parser.add_argument("--team_id", help="Team ID (required for --scope=team)")
+  parser.add_argument("--app_name", default="bigquery_data_agent", help="ADK app name (default: bigquery_data_agent)")
+  parser.add_argument(
+    "--project",
+    default=os.environ.get("GOOGLE_CLOUD_PROJECT"),
+    help="Google Cloud Project ID (default: GOOGLE_CLOUD_PROJECT env)"
+  )
+  parser.add_argument(
+    "--location",
+    default=os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1"),
+    help="Google Cloud Location (default: GOOGLE_CLOUD_LOCATION env or 'us-central1')"
+  )
+  parser.add_argument(
+    "--agent_engine_id",
+    default=os.environ.get("AGENT_ENGINE_ID"),
+    help="Agent Engine ID (default: AGENT_ENGINE_ID env)"
+  )
+  parser.add_argument("--bq_region", default="us", help="Region of the JOBS view, e.g. 'us' or 'asia-northeast3' (default: us)")
+  parser.add_argument(
+    "--dataset",
+    default=os.environ.get("BIGQUERY_DATASET", ""),
+    help="Only import jobs reading this dataset (default: BIGQUERY_DATASET env, empty for all)"
+  )
+  parser.add_argument("--days", type=int, default=30, help="How many days of job history to read")
+  parser.add_argument("--max_jobs", type=int, default=10000, help="Maximum number of jobs to read")
+  parser.add_argument("--min_runs", type=int, default=2, help="Only import queries run at least this many times")
+  parser.add_argument("--max_queries", type=int, default=500, help="Maximum number of distinct queries to import")
+  parser.add_argument("--model", default=os.environ.get("AGENT_MODEL", "gemini-2.5-flash"), help="Model used to describe queries")
+  parser.add_argument("--batch_size", type=int, default=20, help="Queries described per LLM call")
+  parser.add_argument("--checkpoint", default="import_query_history.checkpoint.json", help="Checkpoint file for resuming")
+
+  args = parser.parse_args()
+
+  assert args.project, "Project ID not set. Please provide --project or set GOOGLE_CLOUD_PROJECT environment variable."
+  assert args.agent_engine_id, "Agent Engine ID not set. Please provide --agent_engine_id or set AGENT_ENGINE_ID environment variable."
+  if args.scope == "user":
+    assert args.user_id, "--user_id is required for the user scope."
+    memory_scope = {"app_name": args.app_name, "user_id": args.user_id}
+  else:
+    assert args.team_id, "--team_id is required for the team scope."
+    memory_scope = {"app_name": args.app_name, "team_id": args.team_id}
+
+  state = read_checkpoint(args.checkpoint)
+  if state.get("scope", memory_scope) != memory_scope:
+    logger.error(f"Checkpoint {args.checkpoint} belongs to scope {state['scope']}; use another --checkpoint.")
+    sys.exit(1)
+  state["scope"] = memory_scope
+  checkpointed = state["queries"]
+
+  # 1-2. Read and deduplicate the job history (only on the first run)
+  if not checkpointed:
+    logger.info(f"Reading {args.days} days of SELECT jobs in region-{args.bq_region}...")
+    jobs = fetch_jobs(args.project, args.bq_region, args.days, args.dataset, args.max_jobs)
+    queries = [q for q in deduplicate(jobs, sql_fingerprint) if q["run_count"] >= args.min_runs]
+    queries = queries[:args.max_queries]
+    logger.info(f"{len(jobs)} jobs, {len(queries)} distinct queries to import")
+    for q in queries:
+      checkpointed[q["fingerprint"]] = {**q, "status": "pending"}
+    write_checkpoint(args.checkpoint, state)
+
+  # 3. Describe pending queries in batches
+  genai_client = genai.Client(vertexai=True, project=args.project, location=args.location)
+  pending = [q for q in checkpointed.values() if q["status"] == "pending"]
+  for start in range(0, len(pending), args.batch_size):
+    batch = pending[start:start + args.batch_size]
+    try:
+      descriptions = describe_batch(genai_client, args.model, batch)
+    except Exception as e:
+      logger.error(f"Describing queries failed, re-run to resume: {e}")
+      sys.exit(1)
+    for q in batch:
+      description = descriptions.get(q["fingerprint"])
+      if description:
+        q.update(title=description["title"], description=description["description"],
+                 nl_query=description["nl_query"], status="described")
+    write_checkpoint(args.checkpoint, state)
+    logger.info(f"Described {min(start + args.batch_size, len(pending))}/{len(pending)} queries")
+
+  # 4. Write described queries to the Memory Bank
+  described = [q for q in checkpointed.values() if q["status"] == "described"]
+  records = [
+    {
+      "title": q["title"],
+      "description": q["description"],
+      "nl_query": q["nl_query"],
+      "sql_query": q["sql_query"],
+      "dataset_id": (q["dataset_ids"] or [args.dataset or "unknown"])[0],
+      "fingerprint": q["fingerprint"],
+    }
+    for q in described
+  ]
+  client = vertexai.Client(project=args.project, location=args.location)
+  agent_engine_name = (
+    f"projects/{args.project}/locations/{args.location}/reasoningEngines/{args.agent_engine_id}"
+  )
+  logger.info(f"Saving {len(records)} queries to {memory_scope}...")
+
+  def mark_saved(chunk: list[dict[str, str]]) -> None:
+    # Checkpoint every stored chunk so an interrupted run does not re-write it
+    for record in chunk:
+      checkpointed[record["fingerprint"]]["status"] = "saved"
+    write_checkpoint(args.checkpoint, state)
+
+  failed = asyncio.run(
+    write_query_memories(
+      client, agent_engine_name, memory_scope, records, on_chunk_saved=mark_saved
+    )
+  )
+  for record, error in failed:
+    logger.error(f"Failed to save '{record['title']}': {error}")
+
+  remaining = sum(1 for q in checkpointed.values() if q["status"] != "saved")
+  logger.info(f"✓ Saved {len(records) - len(failed)} queries; {remaining} remaining.")
+  if remaining:
+    logger.info("Re-run the same command to retry the remaining queries.")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: tabstop=2 shiftwidth=2 softtabstop=2 expandtab
+
+"""Bulk-saves validated queries to the Memory Bank, e.g. to seed a team library.
+
+The input is a JSON list, a JSON Lines file or a CSV file of records with
+'title', 'description', 'nl_query' and 'sql_query' (and optionally
+'dataset_id') fields:
+
+  python utils/save_queries_to_memory.py --input=queries.csv --scope=team --team_id=sales-team
+"""
+import os
+import sys
+import csv
+import json
+import asyncio
+import argparse
+import logging
+
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("title", "description", "nl_query", "sql_query")
+
+
+def read_records(path: str) -> list[dict[str, str]]:
+  """Reads query records from a .json, .jsonl or .csv file."""
+  with open(path, "r", encoding="utf-8") as f:
+    if path.endswith(".csv"):
+      return list(csv.DictReader(f))
+    if path.endswith(".jsonl"):
+      return [json.loads(line) for line in f if line.strip()]
+    return json.load(f)
+
+
+def main():
+  # Load .env from the agent directory
+  script_dir = os.path.dirname(os.path.abspath(__file__))
+  project_root = os.path.dirname(script_dir)
+  env_path = os.path.join(project_root, "bigquery_data_agent", ".env")
+  load_dotenv(env_path)
+  sys.path.insert(0, project_root)
+
+  import vertexai
+  from bigquery_data_agent.tools import (
+    _default_dataset_id,
+    filter_duplicate_queries,
+    write_query_memories,
+  )
+
+  parser = argparse.ArgumentParser(description="Save many validated queries to the Memory Bank.")
+  parser.add_argument("--input", required=True, help="JSON, JSONL or CSV file of query records")
+  parser.add_argument("--scope", choices=["user", "team"], required=True, help="Memory scope to save to")
+  parser.add_argument("--user_id", help="User ID (required for --scope=user)")
+  parser.add_argument("--team_id", help="Team ID (required for --scope=team)")
+  parser.add_argument("--app_name", default="bigquery_data_agent", help="ADK app name (default: bigquery_data_agent)")
+  parser.add_argument(
+    "--project",
+    default=os.environ.get("GOOGLE_CLOUD_PROJECT"),
+    help="Google Cloud Project ID (default: GOOGLE_CLOUD_PROJECT env)"
+  )
+  parser.add_argument(
+    "--location",
+    default=os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1"),
+    help="Google Cloud Location (default: GOOGLE_CLOUD_LOCATION env or 'us-central1')"
+  )
+  parser.add_argument(
+    "--agent_engine_id",
+    default=os.environ.get("AGENT_ENGINE_ID"),
+    help="Agent Engine ID (default: AGENT_ENGINE_ID env)"
+  )
+  parser.add_argument("--concurrency", type=int, default=8, help="Generate requests kept in flight")
+
+  args = parser.parse_args()
+
+  assert args.project, "Project ID not set. Please provide --project or set GOOGLE_CLOUD_PROJECT environment variable."
+  assert args.agent_engine_id, "Agent Engine ID not set. Please provide --agent_engine_id or set AGENT_ENGINE_ID environment variable."
+  if args.scope == "user":
+    assert args.user_id, "--user_id is required for the user scope."
+    memory_scope = {"app_name": args.app_name, "user_id": args.user_id}
+  else:
+    assert args.team_id, "--team_id is required for the team scope."
+    memory_scope = {"app_name": args.app_name, "team_id": args.team_id}
+
+  records = []
+  for i, record in enumerate(read_records(args.input)):
+    missing = [k for k in REQUIRED_FIELDS if not record.get(k)]
+    if missing:
+      logger.warning(f"Skipping record {i}: missing {', '.join(missing)}")
+    elif not record["sql_query"].strip().lower().startswith("select"):
+      logger.warning(f"Skipping record {i} ('{record['title']}'): only SELECT queries can be saved")
+    else:
+      record["dataset_id"] = record.get("dataset_id") or _default_dataset_id(record["sql_query"])
+      records.append(record)
+
+  client = vertexai.Client(project=args.project, location=args.location)
+  agent_engine_name = (
+    f"projects/{args.project}/locations/{args.location}/reasoningEngines/{args.agent_engine_id}"
+  )
+
+  async def save() -> tuple:
+    # Same duplicate checks as the save_queries_to_memory tool
+    new_records, duplicates = await filter_duplicate_queries(
+      client, agent_engine_name, memory_scope, records
+    )
+    for record, reason in duplicates:
+      logger.warning(f"Skipping '{record['title']}': {reason}")
+    logger.info(f"Saving {len(new_records)} queries to {memory_scope}...")
+    failed = await write_query_memories(
+      client, agent_engine_name, memory_scope, new_records, args.concurrency
+    )
+    return new_records, failed
+
+  new_records, failed = asyncio.run(save())
+  for record, error in failed:
+    logger.error(f"Failed to save '{record['title']}': {error}")
+
+  logger.info(f"✓ Saved {len(new_records) - len(failed)} of {len(records)} queries.")
+  if failed:
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -4,11 +4,13 @@
 # This implementation is based on the source code and patterns described in the following article:
 # https://medium.com/google-cloud/implementing-anthropic-style-dynamic-tool-search-tool-f39d02a35139
 
+import os
 import logging
 from dotenv import load_dotenv
 from google.adk.agents import LlmAgent
 from .lib.registry import registry
-from .lib.tools import search_available_tools, load_tool, initialize_mcp_tools
+from .lib.session_toolset import SessionToolset, mark_tool_loaded, LOADED_TOOLS_STATE_KEY
+from .lib.tools import search_available_tools, load_tool, materialize_tool, initialize_mcp_tools, connection_pool
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -16,33 +18,36 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Maximum number of dynamically loaded tools kept per session (LRU)
+MAX_LOADED_TOOLS = int(os.getenv("MAX_LOADED_TOOLS", "8"))
+
 def dynamic_loader_callback(
   tool,
   args,
   tool_context,
   tool_response
 ):
-  """Callback to intercept 'load_tool' and inject the requested tool."""
-  # Use global root_agent to access tools list
-  global root_agent
-  
+  """Callback to intercept 'load_tool' and record the requested tool in the session."""
   # Get tool name as a string
   tool_name_str = getattr(tool, 'name', str(tool))
-  
+
+  # Keep the MCP connection of a used tool from being closed as idle
+  connection_pool.touch(registry.get_server_url(tool_name_str))
+
   if "load_tool" in tool_name_str:
     requested_name = args.get('tool_name')
     new_tool = registry.get_tool(requested_name)
-    
-    if new_tool:
-      # Access the agent tools list
-      current_names = [getattr(t, 'name', getattr(t, '__name__', '')) for t in root_agent.tools]
 
-      if requested_name not in current_names:
-        root_agent.tools.append(new_tool)
-        logger.info(f"[System] Dynamically injected tool: {requested_name}")
-        return tool_response
+    if new_tool:
+      # The session toolset injects the tool on the next LLM request
+      evicted = mark_tool_loaded(tool_context.state, requested_name, MAX_LOADED_TOOLS)
+      logger.info(f"[System] Dynamically injected tool: {requested_name}")
+      if evicted:
+        logger.info(f"[System] Evicted least recently used tools: {evicted}")
     else:
       logger.warning(f"[System] Requested tool not found in registry: {requested_name}")
+  elif tool_name_str in (tool_context.state.get(LOADED_TOOLS_STATE_KEY) or []):
+    mark_tool_loaded(tool_context.state, tool_name_str, MAX_LOADED_TOOLS)
 
   return tool_response
 
@@ -60,6 +65,6 @@ root_agent = LlmAgent(
   
   Always mention to the user that you are searching for and loading the necessary tools.
   """,
-  tools=[search_available_tools, load_tool],
+  tools=[search_available_tools, load_tool, SessionToolset(materialize_tool)],
   after_tool_callback=dynamic_loader_callback
 )
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+import datetime
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import google.auth
+import google.auth.transport.requests
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialCache:
+  """A thread-safe cache of Google credentials shared by all MCP connections.
+
+  Credentials are created once per set of OAuth scopes. The first token is
+  fetched by `get_headers`; after that, every token is refreshed ahead of its
+  expiry on a background timer thread, so `get_cached_headers` can serve
+  callers on an event loop without a blocking refresh. When a refresh is
+  due, only one caller performs the blocking `credentials.refresh` call while
+  the others wait for its result.
+  """
+
+  def __init__(self, refresh_margin_seconds: int = 300, retry_seconds: int = 30):
+    """Initializes a CredentialCache.
+
+    Args:
+        refresh_margin_seconds: How long before expiry a token is refreshed.
+        retry_seconds: How long to wait before retrying a failed background refresh.
+    """
+    self._refresh_margin = datetime.timedelta(seconds=refresh_margin_seconds)
+    self._credentials: Dict[Tuple[str, ...], Tuple[Any, Optional[str]]] = {}
+    self._locks: Dict[Tuple[str, ...], threading.Lock] = {}
+    self._timers: Dict[Tuple[str, ...], threading.Timer] = {}
+    self._retry_seconds = retry_seconds
+    self._lock = threading.Lock()
+
+  def _needs_refresh(self, credentials: Any) -> bool:
+    if not credentials.token:
+      return True
+    expiry = credentials.expiry
+    if expiry is None:
+      return False
+    # google-auth stores the expiry as a naive UTC datetime
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return expiry - self._refresh_margin <= now
+
+  def _get_entry(self, key: Tuple[str, ...]) -> Tuple[Any, Optional[str], threading.Lock]:
+    with self._lock:
+      if key not in self._credentials:
+        self._credentials[key] = google.auth.default(scopes=list(key))
+        self._locks[key] = threading.Lock()
+      credentials, project_id = self._credentials[key]
+      return credentials, project_id, self._locks[key]
+
+  def _refresh(self, key: Tuple[str, ...], credentials: Any, lock: threading.Lock):
+    with lock:
+      # Another caller may have refreshed the token while we were waiting
+      if not self._needs_refresh(credentials):
+        return
+      logger.info(f"Refreshing OAuth token for scopes: {list(key)}")
+      credentials.refresh(google.auth.transport.requests.Request())
+    self._schedule_refresh(key, credentials)
+
+  def _schedule_refresh(self, key: Tuple[str, ...], credentials: Any, delay: Optional[float] = None):
+    """Starts a timer that refreshes the token just before it is due."""
+    if delay is None:
+      if credentials.expiry is None:
+        return
+      now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+      delay = (credentials.expiry - self._refresh_margin - now).total_seconds() + 1
+    timer = threading.Timer(max(delay, 0), self._refresh_in_background, args=(key,))
+    timer.daemon = True
+    with self._lock:
+      previous = self._timers.get(key)
+      if previous is not None:
+        previous.cancel()
+      self._timers[key] = timer
+    timer.start()
+
+  def _refresh_in_background(self, key: Tuple[str, ...]):
+    credentials, _, lock = self._get_entry(key)
+    try:
+      if self._needs_refresh(credentials):
+        self._refresh(key, credentials, lock)
+      else:
+        self._schedule_refresh(key, credentials)
+    except Exception as e:
+      logger.warning(f"Background OAuth token refresh failed for scopes {list(key)}: {e}")
+      self._schedule_refresh(key, credentials, delay=self._retry_seconds)
+
+  def _headers(self, credentials: Any, project_id: Optional[str]) -> Dict[str, str]:
+    headers = {"Authorization": f"Bearer {credentials.token}"}
+    if project_id:
+      headers["x-goog-user-project"] = project_id
+    return headers
+
+  def get_headers(self, scopes: List[str]) -> Dict[str, str]:
+    """Returns fresh authorization headers for the given scopes (blocking)."""
+    key = tuple(sorted(scopes))
+    credentials, project_id, lock = self._get_entry(key)
+
+    if self._needs_refresh(credentials):
+      self._refresh(key, credentials, lock)
+    return self._headers(credentials, project_id)
+
+  def get_cached_headers(self, scopes: List[str]) -> Dict[str, str]:
+    """Returns authorization headers from the cached token without refreshing it.
+
+    Safe to call on an event loop once `get_headers` has fetched the first
+    token; the background timer keeps it refreshed ahead of expiry. Falls
+    back to `get_headers` only if no token was fetched yet.
+    """
+    key = tuple(sorted(scopes))
+    credentials, project_id, _ = self._get_entry(key)
+    if not credentials.token:
+      return self.get_headers(scopes)
+    return self._headers(credentials, project_id)
+
+
+credential_cache = CredentialCache()
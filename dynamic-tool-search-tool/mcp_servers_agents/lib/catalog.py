@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 1
+
+DEFAULT_CATALOG_PATH = os.path.join(
+  os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+  ".tool_catalog.json"
+)
+
+
+def compute_content_hash(entries: List[Dict[str, Any]]) -> str:
+  """Returns a stable hash over a list of tool entries."""
+  payload = json.dumps(
+    sorted(entries, key=lambda e: e["name"]),
+    sort_keys=True,
+    default=str
+  )
+  return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _index_settings(state: Optional[Dict[str, Any]]) -> tuple:
+  """Returns the tokenizer, ranking mode and tool order an exported index was built with."""
+  state = state or {}
+  return (
+    state.get("tokenizer", "whitespace"),
+    state.get("ranking", "bm25okapi"),
+    state.get("names"),
+  )
+
+
+def tool_to_entry(tool: Any) -> Dict[str, Any]:
+  """Converts an ADK/MCP tool into a JSON-serializable catalog entry."""
+  name = getattr(tool, 'name', None) or tool.__name__
+  description = getattr(tool, 'description', "") or ""
+
+  input_schema = None
+  mcp_tool = getattr(tool, 'raw_mcp_tool', None) or getattr(tool, '_mcp_tool', None)
+  if mcp_tool is not None:
+    input_schema = getattr(mcp_tool, 'inputSchema', None)
+
+  return {
+    "name": name,
+    "description": description,
+    "input_schema": input_schema,
+  }
+
+
+class ToolCatalogSnapshot:
+  """A persisted catalog of MCP tools keyed by server URL and content hash.
+
+  The snapshot stores, for every MCP server, the tool names, descriptions
+  and input schemas returned by its last listing, together with the
+  prebuilt search index of the registry. Loading it lets the agent answer
+  `search_available_tools` immediately on a cold start while the live
+  listings are refreshed in the background.
+  """
+
+  def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+    self.path = path
+    self._servers: Dict[str, Dict[str, Any]] = {}
+    self._index: Optional[Dict[str, Any]] = None
+    self._dirty = False
+
+  @property
+  def catalog_hash(self) -> str:
+    """A hash over all server content hashes, used to validate the index."""
+    payload = json.dumps(
+      {url: server["content_hash"] for url, server in self._servers.items()},
+      sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+  def load(self) -> bool:
+    """Loads the snapshot from disk. Returns True if a valid snapshot was found."""
+    try:
+      with open(self.path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    except FileNotFoundError:
+      return False
+    except (OSError, ValueError) as e:
+      logger.warning(f"Ignoring unreadable tool catalog at {self.path}: {e}")
+      return False
+
+    if data.get("version") != CATALOG_VERSION:
+      logger.warning(f"Ignoring tool catalog with unsupported version: {data.get('version')}")
+      return False
+
+    self._servers = data.get("servers", {})
+    self._index = data.get("index")
+    self._dirty = False
+    return bool(self._servers)
+
+  def save(self):
+    """Atomically writes the snapshot to disk if it has changed."""
+    if not self._dirty:
+      return
+
+    data = {
+      "version": CATALOG_VERSION,
+      "servers": self._servers,
+      "index": self._index,
+    }
+    directory = os.path.dirname(self.path) or "."
+    try:
+      fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+      with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, default=str)
+      os.replace(tmp_path, self.path)
+      self._dirty = False
+      logger.info(f"Saved tool catalog snapshot to {self.path}")
+    except OSError as e:
+      logger.warning(f"Failed to save tool catalog to {self.path}: {e}")
+
+  def update_server(self, url: str, entries: List[Dict[str, Any]]) -> bool:
+    """Replaces the entries of a server. Returns True if its content changed."""
+    content_hash = compute_content_hash(entries)
+    current = self._servers.get(url)
+    if current and current.get("content_hash") == content_hash:
+      return False
+
+    self._servers[url] = {
+      "content_hash": content_hash,
+      "tools": entries,
+    }
+    self._dirty = True
+    return True
+
+  def entries(self):
+    """Yields (server_url, entry) pairs for every tool in the snapshot."""
+    for url, server in self._servers.items():
+      for entry in server.get("tools", []):
+        yield url, entry
+
+  def get_index(self) -> Optional[Dict[str, Any]]:
+    """Returns the stored search index if it matches the current catalog."""
+    if self._index and self._index.get("catalog_hash") == self.catalog_hash:
+      return self._index.get("state")
+    return None
+
+  def set_index(self, state: Optional[Dict[str, Any]]):
+    """Stores the registry's search index for the current catalog and settings."""
+    if state is None:
+      return
+    catalog_hash = self.catalog_hash
+    # An index built with another tokenizer, ranking mode or tool order must be replaced
+    if (self._index
+        and self._index.get("catalog_hash") == catalog_hash
+        and _index_settings(self._index.get("state")) == _index_settings(state)):
+      return
+    self._index = {"catalog_hash": catalog_hash, "state": state}
+    self._dirty = True
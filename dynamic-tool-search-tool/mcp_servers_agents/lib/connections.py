@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MCPConnectionPool:
+  """Opens MCP toolsets lazily and closes idle connections.
+
+  Servers are registered with a factory that creates their `MCPToolset`.
+  Nothing is created or connected until a tool of the server is actually
+  requested. Materialized tools are cached per server; when a server has
+  not been used for `idle_timeout` seconds its MCP session is closed. The
+  cached tools stay valid and transparently reconnect on their next call.
+  """
+
+  def __init__(self, idle_timeout: float = 300.0):
+    self._idle_timeout = idle_timeout
+    self._factories: Dict[str, Callable[[], Any]] = {}
+    self._toolsets: Dict[str, Any] = {}
+    self._tools: Dict[str, Dict[str, Any]] = {}
+    self._last_used: Dict[str, float] = {}
+    self._locks: Dict[str, asyncio.Lock] = {}
+    self._reaper_task: Optional[asyncio.Task] = None
+
+  def add_server(self, url: str, factory: Callable[[], Any]):
+    """Registers a server URL with a factory returning its toolset (or None)."""
+    self._factories[url] = factory
+
+  def create_toolset(self, url: str) -> Any:
+    """Creates a new, unpooled toolset for a server (e.g. for a one-off listing)."""
+    factory = self._factories.get(url)
+    return factory() if factory else None
+
+  def touch(self, url: Optional[str]):
+    """Marks a server connection as in use so that it is not reaped."""
+    if url not in self._toolsets:
+      return
+    self._last_used[url] = time.monotonic()
+    try:
+      self._ensure_reaper()
+    except RuntimeError:
+      # No running event loop; idle connections are reaped on the next call.
+      pass
+
+  async def get_tool(self, url: str, name: str) -> Any:
+    """Returns a live tool of a server, opening or reusing its connection."""
+    if url not in self._factories:
+      return None
+
+    lock = self._locks.setdefault(url, asyncio.Lock())
+    async with lock:
+      tools = self._tools.get(url)
+      if tools is None:
+        toolset = self._toolsets.get(url)
+        if toolset is None:
+          toolset = self._factories[url]()
+          if toolset is None:
+            return None
+          self._toolsets[url] = toolset
+
+        logger.info(f"Opening MCP connection to {url}")
+        tools = {tool.name: tool for tool in await toolset.get_tools()}
+        self._tools[url] = tools
+
+    self.touch(url)
+    return tools.get(name)
+
+  def _ensure_reaper(self):
+    if self._reaper_task is None or self._reaper_task.done():
+      self._reaper_task = asyncio.get_running_loop().create_task(self._reap_idle())
+
+  async def _reap_idle(self):
+    """Periodically closes connections that have been idle for too long."""
+    while self._last_used:
+      await asyncio.sleep(max(self._idle_timeout / 2, 1.0))
+      now = time.monotonic()
+      for url, last_used in list(self._last_used.items()):
+        if now - last_used >= self._idle_timeout:
+          await self._close(url)
+
+  async def _close(self, url: str):
+    self._last_used.pop(url, None)
+    toolset = self._toolsets.get(url)
+    if toolset is not None:
+      logger.info(f"Closing idle MCP connection to {url}")
+      # The toolset and its cached tools stay usable; the MCP session is
+      # re-opened on the next call.
+      await toolset.close()
+
+  async def close(self):
+    """Closes all open MCP connections."""
+    if self._reaper_task is not None:
+      self._reaper_task.cancel()
+      self._reaper_task = None
+    for url in list(self._last_used):
+      await self._close(url)
@@ -4,18 +4,50 @@
 # This implementation is based on the source code and patterns described in the following article:
 # https://medium.com/google-cloud/implementing-anthropic-style-dynamic-tool-search-tool-f39d02a35139
 
+import os
+import re
 import inspect
-from typing import Dict, List, Any
-from rank_bm25 import BM25Okapi
+import threading
+from typing import Callable, Dict, List, Any, Optional
+from rank_bm25 import BM25Okapi, BM25L, BM25Plus
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Tokenizers available for indexing tool descriptions and queries
+TOKENIZERS: Dict[str, Callable[[str], List[str]]] = {
+  # Splits on single spaces (original behaviour)
+  "whitespace": lambda text: text.lower().split(" "),
+  # Splits on any non-alphanumeric character, including '_' in tool names
+  "word": lambda text: _WORD_RE.findall(text.lower()),
+}
+
+# BM25 variants available for ranking tools
+RANKING_MODES = {
+  "bm25okapi": BM25Okapi,
+  "bm25l": BM25L,
+  "bm25plus": BM25Plus,
+}
 
 class AdvancedToolRegistry:
-  def __init__(self):
+  def __init__(self, tokenizer: str = "whitespace", ranking: str = "bm25okapi"):
+    if tokenizer not in TOKENIZERS:
+      raise ValueError(f"Unknown tokenizer: {tokenizer}. Choose from {list(TOKENIZERS)}")
+    if ranking not in RANKING_MODES:
+      raise ValueError(f"Unknown ranking mode: {ranking}. Choose from {list(RANKING_MODES)}")
+    self._tokenizer_name = tokenizer
+    self._tokenize = TOKENIZERS[tokenizer]
+    self._ranking = ranking
     self._tools: Dict[str, Any] = {}
+    self._entries: Dict[str, Dict[str, Any]] = {}
     self._descriptions: List[str] = []
     self._tool_names: List[str] = []
+    self._positions: Dict[str, int] = {}
     self._bm25 = None
+    self._index_dirty = False
+    # Guards the index against concurrent background catalog refreshes
+    self._lock = threading.RLock()
 
-  def register(self, tool: Any):
+  def register(self, tool: Any, server_url: Optional[str] = None):
     """Registers an ADK BaseTool/MCPTool."""
     if hasattr(tool, 'name'):
       name = tool.name
@@ -24,31 +56,166 @@ class AdvancedToolRegistry:
       name = tool.__name__
       doc = inspect.getdoc(tool) or ""
 
+    with self._lock:
+      # Keep the descriptor metadata (e.g. the input schema from the catalog)
+      existing = self._entries.get(name, {})
+      self.register_entry(
+        name,
+        doc,
+        server_url=server_url or existing.get("server_url"),
+        input_schema=existing.get("input_schema")
+      )
+      self._tools[name] = tool
+
+  def register_entry(
+    self,
+    name: str,
+    doc: str,
+    server_url: Optional[str] = None,
+    input_schema: Optional[Dict[str, Any]] = None
+  ):
+    """Registers a searchable tool descriptor without a live tool object."""
     # Index a combination of name and docstring for better retrieval
     description = f"{name} {doc}"
-    self._tools[name] = tool
-    self._tool_names.append(name)
-    self._descriptions.append(description)
+    with self._lock:
+      self._entries[name] = {
+        "name": name,
+        "description": doc,
+        "server_url": server_url,
+        "input_schema": input_schema,
+      }
 
-    # Re-build the BM25 index
-    tokenized_corpus = [desc.lower().split(" ") for desc in self._descriptions]
-    self._bm25 = BM25Okapi(tokenized_corpus)
+      idx = self._positions.get(name)
+      if idx is not None:
+        if self._descriptions[idx] == description:
+          return
+        self._descriptions[idx] = description
+      else:
+        self._positions[name] = len(self._tool_names)
+        self._tool_names.append(name)
+        self._descriptions.append(description)
 
-  def search(self, query: str, n: int = 5) -> List[str]:
-    """Returns lightweight summaries (Name + Docstring snippet)."""
+      # Defer re-building the BM25 index until the next search
+      self._index_dirty = True
+
+  def replace_server_entries(self, server_url: str, entries: List[Dict[str, Any]]):
+    """Replaces all descriptors of a server with its latest tool listing.
+
+    Tools of the server that are missing from the listing are dropped. The
+    server's tools are kept together in listing order, matching the order of
+    the catalog snapshot, so that an exported index stays loadable.
+    """
+    new_names = [entry["name"] for entry in entries]
+    listed = set(new_names)
+    with self._lock:
+      names: List[str] = []
+      inserted = False
+      for name in self._tool_names:
+        if name in listed:
+          continue
+        if self._entries[name]["server_url"] == server_url:
+          if not inserted:
+            names.extend(new_names)
+            inserted = True
+          continue
+        names.append(name)
+      if not inserted:
+        names.extend(new_names)
+
+      for name in set(self._tool_names) - set(names):
+        self._entries.pop(name, None)
+        self._tools.pop(name, None)
+      for entry in entries:
+        self._entries[entry["name"]] = {
+          "name": entry["name"],
+          "description": entry["description"],
+          "server_url": server_url,
+          "input_schema": entry["input_schema"],
+        }
+
+      descriptions = [f"{name} {self._entries[name]['description']}" for name in names]
+      if names == self._tool_names and descriptions == self._descriptions:
+        return
+      self._tool_names = names
+      self._descriptions = descriptions
+      self._positions = {name: idx for idx, name in enumerate(names)}
+      self._index_dirty = True
+
+  def _build_index(self):
+    tokenized_corpus = [self._tokenize(desc) for desc in self._descriptions]
+    bm25_class = RANKING_MODES[self._ranking]
+    self._bm25 = bm25_class(tokenized_corpus) if tokenized_corpus else None
+    self._index_dirty = False
+
+  def export_index(self) -> Optional[Dict[str, Any]]:
+    """Returns the BM25 index state as a JSON-serializable dict."""
+    with self._lock:
+      if self._index_dirty or self._bm25 is None:
+        self._build_index()
+      if self._bm25 is None:
+        return None
+      state = {k: v for k, v in vars(self._bm25).items() if k != 'tokenizer'}
+      return {
+        "tokenizer": self._tokenizer_name,
+        "ranking": self._ranking,
+        "names": list(self._tool_names),
+        "bm25": state,
+      }
+
+  def load_index(self, state: Optional[Dict[str, Any]]) -> bool:
+    """Restores a BM25 index exported by `export_index`.
+
+    The index is only restored if it was built over the same tools, in the
+    same order, as the ones currently registered.
+    """
+    with self._lock:
+      if not state or state.get("names") != self._tool_names:
+        return False
+      if (state.get("tokenizer", "whitespace") != self._tokenizer_name
+          or state.get("ranking", "bm25okapi") != self._ranking):
+        return False
+      bm25_class = RANKING_MODES[self._ranking]
+      bm25 = bm25_class.__new__(bm25_class)
+      vars(bm25).update(state["bm25"])
+      bm25.tokenizer = None
+      self._bm25 = bm25
+      self._index_dirty = False
+      return True
+
+  def _top_indices(self, query: str, n: int) -> List[int]:
+    if self._index_dirty:
+      self._build_index()
     if not self._bm25:
       return []
-    tokenized_query = query.lower().split(" ")
-    top_docs = self._bm25.get_top_n(tokenized_query, self._descriptions, n=n)
-    results = []
-    for doc in top_docs:
-      idx = self._descriptions.index(doc)
-      name = self._tool_names[idx]
-      summary = doc.split('\n')[0][:150]
-      results.append(f"{name}: {summary}")
-    return results
+    tokenized_query = self._tokenize(query)
+    return self._bm25.get_top_n(
+      tokenized_query, list(range(len(self._descriptions))), n=n
+    )
+
+  def rank(self, query: str, n: int = 5) -> List[str]:
+    """Returns the names of the top-n tools for a query."""
+    with self._lock:
+      return [self._tool_names[idx] for idx in self._top_indices(query, n)]
+
+  def search(self, query: str, n: int = 5) -> List[str]:
+    """Returns lightweight summaries (Name + Docstring snippet)."""
+    with self._lock:
+      results = []
+      for idx in self._top_indices(query, n):
+        doc = self._descriptions[idx]
+        name = self._tool_names[idx]
+        summary = doc.split('\n')[0][:150]
+        results.append(f"{name}: {summary}")
+      return results
 
   def get_tool(self, name: str) -> Any:
     return self._tools.get(name)
 
-registry = AdvancedToolRegistry()
+  def get_server_url(self, name: str) -> Optional[str]:
+    entry = self._entries.get(name)
+    return entry["server_url"] if entry else None
+
+registry = AdvancedToolRegistry(
+  tokenizer=os.getenv("TOOL_SEARCH_TOKENIZER", "whitespace"),
+  ranking=os.getenv("TOOL_SEARCH_RANKING", "bm25okapi")
+)
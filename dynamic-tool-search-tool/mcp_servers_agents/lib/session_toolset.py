@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+from typing import Any, Awaitable, Callable, List, MutableMapping, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from typing_extensions import override
+
+# Session state key holding the names of the tools loaded in a session
+LOADED_TOOLS_STATE_KEY = "loaded_tools"
+
+
+def mark_tool_loaded(
+  state: MutableMapping[str, Any],
+  tool_name: str,
+  max_tools: int
+) -> List[str]:
+  """Records a tool as most recently used in the session state.
+
+  The list is kept in least-recently-used order and capped at `max_tools`,
+  so the oldest tool is evicted first. Returns the names that were evicted.
+  """
+  loaded = list(state.get(LOADED_TOOLS_STATE_KEY) or [])
+  if loaded and loaded[-1] == tool_name:
+    return []
+
+  if tool_name in loaded:
+    loaded.remove(tool_name)
+  loaded.append(tool_name)
+
+  evicted = loaded[:-max_tools] if len(loaded) > max_tools else []
+  # Re-assign the list so the change is recorded in the state delta
+  state[LOADED_TOOLS_STATE_KEY] = loaded[-max_tools:]
+  return evicted
+
+
+class SessionToolset(BaseToolset):
+  """Exposes only the tools loaded in the current session.
+
+  The toolset is resolved on every LLM request, so each session sees its
+  own bounded set of dynamically loaded tools instead of a process-wide
+  list shared by all users.
+  """
+
+  def __init__(self, resolver: Callable[[str], Awaitable[Optional[BaseTool]]]):
+    """Initializes a SessionToolset.
+
+    Args:
+        resolver: An async callable returning the live tool for a tool name.
+    """
+    super().__init__()
+    self._resolver = resolver
+
+  @override
+  async def get_tools(
+    self,
+    readonly_context: Optional[ReadonlyContext] = None
+  ) -> List[BaseTool]:
+    if readonly_context is None:
+      return []
+
+    tools = []
+    for name in readonly_context.state.get(LOADED_TOOLS_STATE_KEY) or []:
+      tool = await self._resolver(name)
+      if tool:
+        tools.append(tool)
+    return tools
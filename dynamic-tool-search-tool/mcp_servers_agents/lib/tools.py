@@ -7,13 +7,15 @@
 import os
 import asyncio
 import logging
-import google.auth
-import google.auth.transport.requests
+import threading
 from typing import List
 from dotenv import load_dotenv
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset
 from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPConnectionParams
+from .auth import credential_cache
 from .registry import registry
+from .connections import MCPConnectionPool
+from .catalog import DEFAULT_CATALOG_PATH, ToolCatalogSnapshot, tool_to_entry
 
 logger = logging.getLogger(__name__)
 
@@ -27,32 +29,42 @@ GKE_MCP_URL = "https://container.googleapis.com/mcp"
 
 MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "no_api_found")
 
-# Top-level toolset definitions
-google_maps_toolset = MCPToolset(
-  connection_params=StreamableHTTPConnectionParams(
-    url=MAPS_MCP_URL,
-    headers={"X-Goog-Api-Key": MAPS_API_KEY}
+# On-disk snapshot of the tool catalog used for fast cold starts
+TOOL_CATALOG_PATH = os.getenv("TOOL_CATALOG_PATH", DEFAULT_CATALOG_PATH)
+catalog_snapshot = ToolCatalogSnapshot(TOOL_CATALOG_PATH)
+
+# Seconds after which an unused MCP connection is closed
+MCP_IDLE_TIMEOUT_SECONDS = float(os.getenv("MCP_IDLE_TIMEOUT_SECONDS", "300"))
+
+# MCP connections are opened lazily, only when one of their tools is loaded
+connection_pool = MCPConnectionPool(idle_timeout=MCP_IDLE_TIMEOUT_SECONDS)
+
+BIGQUERY_SCOPES = ["https://www.googleapis.com/auth/bigquery"]
+CLOUD_PLATFORM_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+def get_maps_toolset():
+  """Initializes the Maps toolset with the Maps API key."""
+  return MCPToolset(
+    connection_params=StreamableHTTPConnectionParams(
+      url=MAPS_MCP_URL,
+      headers={"X-Goog-Api-Key": MAPS_API_KEY}
+    )
   )
-)
 
 def get_authenticated_toolset(url: str, scopes: List[str]):
   """Initializes a toolset with OAuth for Google Cloud MCP services."""
   try:
-    credentials, project_id = google.auth.default(scopes=scopes)
-    request = google.auth.transport.requests.Request()
-    credentials.refresh(request)
-    oauth_token = credentials.token
-
-    mcp_headers = {
-      "Authorization": f"Bearer {oauth_token}",
-      "x-goog-user-project": project_id
-    }
+    # Used for listing tools, which happens right after the toolset is created.
+    # Only blocks on the first token; later ones are refreshed in the background.
+    mcp_headers = credential_cache.get_headers(scopes)
 
     return MCPToolset(
       connection_params=StreamableHTTPConnectionParams(
         url=url,
         headers=mcp_headers
-      )
+      ),
+      # Supplies the cached token to every tool call without a blocking refresh
+      header_provider=lambda _: credential_cache.get_cached_headers(scopes)
     )
   except Exception as e:
     logger.error(f"Failed to initialize toolset for {url}: {e}")
@@ -67,69 +79,129 @@ def search_available_tools(query: str) -> List[str]:
   """
   return registry.search(query)
 
-def load_tool(tool_name: str) -> str:
+async def materialize_tool(tool_name: str):
+  """Returns the live tool for a registered descriptor, connecting its server on demand."""
+  tool = registry.get_tool(tool_name)
+  if tool:
+    return tool
+
+  server_url = registry.get_server_url(tool_name)
+  if not server_url:
+    return None
+
+  try:
+    tool = await connection_pool.get_tool(server_url, tool_name)
+  except Exception as e:
+    logger.error(f"Failed to connect to MCP server {server_url}: {e}")
+    return None
+
+  if tool:
+    registry.register(tool, server_url=server_url)
+  return tool
+
+async def load_tool(tool_name: str) -> str:
   """Loads a specific tool into your context. 
   Call this after finding a tool with 'search_available_tools'. 
   Args:
     tool_name: The exact name of the tool to load.
   """
   # This function is a signal for the callback.
-  tool = registry.get_tool(tool_name)
+  tool = await materialize_tool(tool_name)
   if tool:
     return f"Tool '{tool_name}' loaded successfully."
   return f"Error: Tool '{tool_name}' not found."
 
+def load_catalog_snapshot() -> bool:
+  """Populates the registry from the on-disk tool catalog snapshot."""
+  if not catalog_snapshot.load():
+    return False
+
+  count = 0
+  for server_url, entry in catalog_snapshot.entries():
+    registry.register_entry(
+      entry["name"],
+      entry.get("description", ""),
+      server_url=server_url,
+      input_schema=entry.get("input_schema")
+    )
+    count += 1
+
+  if not registry.load_index(catalog_snapshot.get_index()):
+    logger.info("Tool catalog index is stale; it will be rebuilt on first search.")
+  logger.info(f"Loaded {count} tools from catalog snapshot {TOOL_CATALOG_PATH}.")
+  return count > 0
+
+def _register_server_tools(url: str, tools: List) -> None:
+  """Registers lightweight descriptors of a server's tools and records them in the snapshot."""
+  entries = [tool_to_entry(tool) for tool in tools]
+  # Drop tools the server no longer lists, so the index matches the snapshot
+  registry.replace_server_entries(url, entries)
+  if catalog_snapshot.update_server(url, entries):
+    logger.info(f"Tool catalog changed for {url}.")
+
+# Toolset factories of the Google Managed MCP servers, keyed by URL
+if MAPS_API_KEY != "no_api_found":
+  connection_pool.add_server(MAPS_MCP_URL, get_maps_toolset)
+else:
+  logger.warning("Skipping Maps MCP: GOOGLE_MAPS_API_KEY not found.")
+connection_pool.add_server(
+  BIGQUERY_MCP_URL,
+  lambda: get_authenticated_toolset(BIGQUERY_MCP_URL, BIGQUERY_SCOPES)
+)
+connection_pool.add_server(
+  COMPUTE_MCP_URL,
+  lambda: get_authenticated_toolset(COMPUTE_MCP_URL, CLOUD_PLATFORM_SCOPES)
+)
+connection_pool.add_server(
+  GKE_MCP_URL,
+  lambda: get_authenticated_toolset(GKE_MCP_URL, CLOUD_PLATFORM_SCOPES)
+)
+
 async def initialize_mcp_tools():
-  """Fetches tools from Google Managed MCP servers and registers them."""
-
-  # 1. Maps MCP
-  if MAPS_API_KEY != "no_api_found":
-    try:
-      logger.info("--- Initializing Maps MCP Connection ---")
-      maps_tools = await google_maps_toolset.get_tools()
-      for tool in maps_tools:
-        registry.register(tool)
-      logger.info(f"Registered {len(maps_tools)} tools from Maps MCP.")
-    except Exception as e:
-      logger.error(f"Failed to load Maps MCP: {e}")
-  else:
-    logger.warning("Skipping Maps MCP: GOOGLE_MAPS_API_KEY not found.")
+  """Fetches tool listings from Google Managed MCP servers and registers their descriptors."""
 
-  # Helper for registering tools from an authenticated toolset
-  async def register_mcp_server(name: str, url: str, scopes: List[str]):
-    toolset = get_authenticated_toolset(url, scopes)
+  # Helper for listing the tools of a server on a short-lived connection
+  async def register_mcp_server(name: str, url: str):
+    toolset = connection_pool.create_toolset(url)
     if toolset:
       try:
         logger.info(f"--- Initializing {name} MCP Connection ---")
         tools = await toolset.get_tools()
-        for tool in tools:
-          registry.register(tool)
+        _register_server_tools(url, tools)
         logger.info(f"Registered {len(tools)} tools from {name} MCP.")
       except Exception as e:
         logger.error(f"Failed to load {name} MCP: {e}")
+      finally:
+        # Live tools are materialized later by `load_tool`
+        await toolset.close()
 
-  # Register authenticated MCP servers
-  await register_mcp_server(
-    "BigQuery", 
-    BIGQUERY_MCP_URL, 
-    ["https://www.googleapis.com/auth/bigquery"]
-  )
-  await register_mcp_server(
-    "Compute Engine", 
-    COMPUTE_MCP_URL, 
-    ["https://www.googleapis.com/auth/cloud-platform"]
-  )
-  await register_mcp_server(
-    "GKE", 
-    GKE_MCP_URL, 
-    ["https://www.googleapis.com/auth/cloud-platform"]
-  )
+  await register_mcp_server("Maps", MAPS_MCP_URL)
+  await register_mcp_server("BigQuery", BIGQUERY_MCP_URL)
+  await register_mcp_server("Compute Engine", COMPUTE_MCP_URL)
+  await register_mcp_server("GKE", GKE_MCP_URL)
+
+  # Persist the refreshed catalog and its search index for the next cold start
+  catalog_snapshot.set_index(registry.export_index())
+  catalog_snapshot.save()
+
+def _refresh_in_background():
+  """Refreshes the MCP tool listings on a daemon thread."""
+  try:
+    asyncio.run(initialize_mcp_tools())
+  except Exception as e:
+    logger.error(f"Failed to refresh MCP tools in background: {e}")
+
+# Load the catalog snapshot first so that tool search is available immediately
+_snapshot_loaded = load_catalog_snapshot()
 
 # Auto-initialize MCP tools to populate registry on import
 try:
   loop = asyncio.get_event_loop()
   if loop.is_running():
     loop.create_task(initialize_mcp_tools())
+  elif _snapshot_loaded:
+    # Do not block the cold start on remote listings when a snapshot exists
+    threading.Thread(target=_refresh_in_background, daemon=True).start()
   else:
     loop.run_until_complete(initialize_mcp_tools())
 except Exception as _:
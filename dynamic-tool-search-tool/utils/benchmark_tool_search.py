@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""Relevance and latency benchmark for the dynamic tool registry.
+
+Generates a synthetic, reproducible catalog of MCP-like tools together with
+a labeled set of natural-language queries (each query targets exactly one
+tool), then reports for every combination of catalog size, tokenizer and
+ranking mode:
+
+  - registration time and index build time
+  - p50/p99 search latency
+  - peak memory allocated while registering and indexing
+  - recall@k and MRR
+
+Example:
+  python utils/benchmark_tool_search.py --sizes 100 1000 10000 --queries 500
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+import importlib.util
+from typing import Dict, List, Tuple
+
+# Load the registry module directly so that importing it does not trigger the
+# agent package initialization (and its MCP server connections).
+_REGISTRY_PATH = os.path.join(
+  os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+  "mcp_servers_agents", "lib", "registry.py"
+)
+_spec = importlib.util.spec_from_file_location("tool_registry", _REGISTRY_PATH)
+tool_registry = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(tool_registry)
+
+SERVICES = [
+  ("bigquery", "BigQuery", ["bq", "data warehouse"]),
+  ("compute", "Compute Engine", ["gce", "virtual machines"]),
+  ("gke", "Google Kubernetes Engine", ["kubernetes", "k8s"]),
+  ("maps", "Google Maps Platform", ["maps", "geo"]),
+  ("storage", "Cloud Storage", ["gcs", "object storage"]),
+  ("pubsub", "Pub/Sub", ["messaging", "pub sub"]),
+  ("spanner", "Cloud Spanner", ["spanner", "distributed database"]),
+  ("sql", "Cloud SQL", ["cloudsql", "managed postgres"]),
+  ("logging", "Cloud Logging", ["logs", "stackdriver logging"]),
+  ("monitoring", "Cloud Monitoring", ["metrics", "stackdriver monitoring"]),
+  ("iam", "Identity and Access Management", ["permissions", "access control"]),
+  ("run", "Cloud Run", ["serverless containers", "cloud run"]),
+  ("functions", "Cloud Functions", ["serverless functions", "gcf"]),
+  ("dataflow", "Dataflow", ["beam pipelines", "stream processing"]),
+  ("dataproc", "Dataproc", ["spark", "hadoop"]),
+  ("firestore", "Firestore", ["document database", "nosql"]),
+  ("bigtable", "Bigtable", ["wide column store", "hbase"]),
+  ("vertex", "Vertex AI", ["machine learning", "ml platform"]),
+  ("dns", "Cloud DNS", ["domain names", "dns zones"]),
+  ("kms", "Cloud KMS", ["encryption keys", "key management"]),
+  ("secrets", "Secret Manager", ["secrets", "credentials store"]),
+  ("scheduler", "Cloud Scheduler", ["cron", "scheduled jobs"]),
+  ("tasks", "Cloud Tasks", ["task queues", "async tasks"]),
+  ("artifacts", "Artifact Registry", ["container images", "packages"]),
+  ("billing", "Cloud Billing", ["costs", "invoices"]),
+]
+
+RESOURCES = [
+  ("dataset", "datasets"), ("table", "tables"), ("instance", "instances"),
+  ("cluster", "clusters"), ("node_pool", "node pools"), ("bucket", "buckets"),
+  ("topic", "topics"), ("subscription", "subscriptions"), ("job", "jobs"),
+  ("snapshot", "snapshots"), ("disk", "disks"), ("network", "networks"),
+  ("firewall_rule", "firewall rules"), ("service_account", "service accounts"),
+  ("policy", "policies"), ("endpoint", "endpoints"), ("model", "models"),
+  ("backup", "backups"), ("operation", "operations"), ("place", "places"),
+]
+
+VERBS = [
+  ("list", "Lists all", ["show all", "enumerate", "what are the"]),
+  ("get", "Gets the details of a", ["describe", "show details of", "inspect"]),
+  ("create", "Creates a new", ["make a new", "provision", "add a"]),
+  ("delete", "Deletes a", ["remove", "destroy", "drop"]),
+  ("update", "Updates the configuration of a", ["modify", "change", "edit"]),
+  ("search", "Searches for", ["find", "look up", "query for"]),
+  ("start", "Starts a stopped", ["boot", "power on", "resume"]),
+  ("stop", "Stops a running", ["shut down", "halt", "pause"]),
+  ("export", "Exports the data of a", ["download", "dump", "back up"]),
+  ("import", "Imports data into a", ["load data into", "upload to", "ingest into"]),
+  ("copy", "Copies a", ["duplicate", "clone", "replicate"]),
+  ("move", "Moves a", ["relocate", "migrate", "transfer"]),
+  ("resize", "Resizes a", ["scale", "grow", "shrink"]),
+  ("restore", "Restores a", ["recover", "roll back", "revert"]),
+  ("label", "Sets labels on a", ["tag", "annotate", "add labels to"]),
+  ("audit", "Returns the audit log of a", ["audit trail of", "who changed", "history of"]),
+  ("validate", "Validates the configuration of a", ["check", "verify", "lint"]),
+  ("count", "Counts the", ["how many", "number of", "total"]),
+  ("watch", "Streams change events of a", ["subscribe to changes of", "follow", "tail"]),
+  ("estimate", "Estimates the cost of a", ["price of", "cost of", "quote for"]),
+]
+
+FILLER = [
+  "Supports pagination and filtering.",
+  "Requires the appropriate IAM permissions.",
+  "Returns a JSON object.",
+  "The operation is idempotent.",
+  "Results may be eventually consistent.",
+  "Use the project_id argument to select the project.",
+]
+
+
+def build_catalog(size: int, seed: int = 42) -> List[Tuple[str, str, Tuple[int, int, int]]]:
+  """Returns `size` synthetic tools as (name, description, (service, resource, verb))."""
+  rng = random.Random(seed)
+  combos = [
+    (s, r, v)
+    for s in range(len(SERVICES))
+    for r in range(len(RESOURCES))
+    for v in range(len(VERBS))
+  ]
+  if size > len(combos):
+    raise ValueError(f"At most {len(combos)} synthetic tools are supported.")
+  rng.shuffle(combos)
+
+  catalog = []
+  for s, r, v in combos[:size]:
+    service, display, _ = SERVICES[s]
+    resource, plural = RESOURCES[r]
+    verb, phrase, _ = VERBS[v]
+    noun = plural if verb in ("list", "search", "count") else resource.replace("_", " ")
+    name = f"{service}_{verb}_{resource}"
+    description = f"{phrase} {noun} in {display}. {rng.choice(FILLER)}"
+    catalog.append((name, description, (s, r, v)))
+  return catalog
+
+
+def build_queries(catalog, num_queries: int, seed: int = 7) -> List[Tuple[str, str]]:
+  """Returns labeled (query, expected tool name) pairs paraphrasing the catalog."""
+  rng = random.Random(seed)
+  queries = []
+  for _ in range(num_queries):
+    name, _, (s, r, v) = rng.choice(catalog)
+    _, display, aliases = SERVICES[s]
+    _, plural = RESOURCES[r]
+    _, _, synonyms = VERBS[v]
+    service_phrase = rng.choice(aliases + [display.lower()])
+    queries.append((f"{rng.choice(synonyms)} {plural} {service_phrase}", name))
+  return queries
+
+
+def _percentile(values: List[float], pct: float) -> float:
+  ordered = sorted(values)
+  idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+  return ordered[idx]
+
+
+def run_benchmark(size: int, tokenizer: str, ranking: str, num_queries: int, k: int) -> Dict:
+  catalog = build_catalog(size)
+  queries = build_queries(catalog, num_queries)
+
+  tracemalloc.start()
+  registry = tool_registry.AdvancedToolRegistry(tokenizer=tokenizer, ranking=ranking)
+  start = time.perf_counter()
+  for name, description, _ in catalog:
+    registry.register_entry(name, description)
+  register_s = time.perf_counter() - start
+
+  start = time.perf_counter()
+  registry.rank("warm up", n=1)
+  index_s = time.perf_counter() - start
+  _, peak_bytes = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  latencies = []
+  hits = 0
+  reciprocal_ranks = []
+  for query, expected in queries:
+    start = time.perf_counter()
+    names = registry.rank(query, n=k)
+    latencies.append((time.perf_counter() - start) * 1000.0)
+    if expected in names:
+      hits += 1
+      reciprocal_ranks.append(1.0 / (names.index(expected) + 1))
+    else:
+      reciprocal_ranks.append(0.0)
+
+  return {
+    "size": size,
+    "tokenizer": tokenizer,
+    "ranking": ranking,
+    "register_ms": register_s * 1000.0,
+    "index_ms": index_s * 1000.0,
+    "peak_mem_mb": peak_bytes / (1024 * 1024),
+    "p50_ms": _percentile(latencies, 50),
+    "p99_ms": _percentile(latencies, 99),
+    f"recall@{k}": hits / len(queries),
+    "mrr": statistics.mean(reciprocal_ranks),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Tool search relevance and latency benchmark")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Catalog sizes to benchmark (100-10000)")
+  parser.add_argument("--tokenizers", nargs="+", default=list(tool_registry.TOKENIZERS), help="Tokenizers to compare")
+  parser.add_argument("--rankings", nargs="+", default=list(tool_registry.RANKING_MODES), help="Ranking modes to compare")
+  parser.add_argument("--queries", type=int, default=200, help="Number of labeled queries per run")
+  parser.add_argument("--k", type=int, default=5, help="Cut-off for recall@k and MRR")
+  parser.add_argument("--json", dest="json_path", help="Optional path to write the results as JSON")
+  args = parser.parse_args()
+
+  results = []
+  header = f"{'size':>6} {'tokenizer':>10} {'ranking':>9} {'register':>9} {'index':>9} {'mem MB':>7} {'p50 ms':>7} {'p99 ms':>7} {'recall@' + str(args.k):>9} {'MRR':>6}"
+  print(header)
+  print("-" * len(header))
+  for size in args.sizes:
+    for tokenizer in args.tokenizers:
+      for ranking in args.rankings:
+        r = run_benchmark(size, tokenizer, ranking, args.queries, args.k)
+        results.append(r)
+        print(
+          f"{r['size']:>6} {r['tokenizer']:>10} {r['ranking']:>9} "
+          f"{r['register_ms']:>7.1f}ms {r['index_ms']:>7.1f}ms {r['peak_mem_mb']:>7.1f} "
+          f"{r['p50_ms']:>7.2f} {r['p99_ms']:>7.2f} {r[f'recall@{args.k}']:>9.3f} {r['mrr']:>6.3f}"
+        )
+
+  if args.json_path:
+    with open(args.json_path, "w", encoding="utf-8") as f:
+      json.dump(results, f, indent=2)
+    print(f"\nWrote results to {args.json_path}")
+
+
+if __name__ == "__main__":
+  main()